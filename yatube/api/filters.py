@@ -0,0 +1,12 @@
+import django_filters
+
+from posts.models import Post
+
+
+class PostFilter(django_filters.FilterSet):
+    author = django_filters.CharFilter(field_name='author__username')
+    group = django_filters.CharFilter(field_name='group__slug')
+
+    class Meta:
+        model = Post
+        fields = ('author', 'group')
@@ -0,0 +1,52 @@
+from collections import OrderedDict
+
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from posts.paginators import CursorPaginator
+
+
+class KeysetPagination(BasePagination):
+    """Курсорная пагинация API на основе CursorPaginator лент сайта.
+
+    Порядок задаётся атрибутом ordering представления; последнее поле
+    должно быть уникальным.
+    """
+    default_ordering = ('-pub_date', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = getattr(view, 'ordering', None) or self.default_ordering
+        paginator = CursorPaginator(
+            queryset, api_settings.PAGE_SIZE, ordering
+        )
+        self.request = request
+        self.page = paginator.get_page(
+            after=request.query_params.get('after'),
+            before=request.query_params.get('before'),
+        )
+        return list(self.page)
+
+    def _link(self, name, cursor):
+        url = self.request.build_absolute_uri()
+        for param in ('after', 'before'):
+            url = remove_query_param(url, param)
+        return replace_query_param(url, name, cursor)
+
+    def get_next_link(self):
+        if not self.page.has_next():
+            return None
+        return self._link('after', self.page.next_cursor)
+
+    def get_previous_link(self):
+        if not self.page.has_previous():
+            return None
+        return self._link('before', self.page.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Edward', password='pw')
+        cls.author = User.objects.create_user(username='Leo')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}'
+            )
+            for number in range(3)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.user, text='Комментарий'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_posts_are_paginated_by_cursor(self):
+        """Посты отдаются страницами по курсору без COUNT(*)."""
+        with override_settings(REST_FRAMEWORK={'PAGE_SIZE': 2}):
+            response = self.client.get(reverse('api:posts-list'))
+            ids = [post['id'] for post in response.data['results']]
+            response = self.client.get(response.data['next'])
+        ids += [post['id'] for post in response.data['results']]
+        self.assertEqual(ids, [post.id for post in reversed(self.posts)])
+        self.assertIsNone(response.data['next'])
+
+    def test_list_queries_do_not_grow(self):
+        """Авторы и группы постов не загружаются отдельными запросами."""
+        url = reverse('api:posts-list')
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        queries = len(context)
+        Post.objects.create(author=self.user, text='Ещё пост')
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['author'], 'Edward')
+
+    def test_sparse_fields_and_filters(self):
+        response = self.client.get(
+            reverse('api:posts-list'),
+            {'fields': 'id,group', 'author': 'Leo', 'group': 'group'},
+        )
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(
+            set(response.data['results'][0]), {'id', 'group'}
+        )
+
+    def test_etag_not_modified(self):
+        url = reverse('api:posts-detail', kwargs={'pk': self.posts[0].id})
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Comment.objects.create(
+            post=self.posts[0], author=self.user, text='Ещё комментарий'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_comments_of_post(self):
+        response = self.client.get(
+            reverse('api:comments-list', kwargs={'post_id': self.posts[0].id})
+        )
+        self.assertEqual(
+            [comment['text'] for comment in response.data['results']],
+            ['Комментарий']
+        )
+
+    def test_timeline_requires_jwt(self):
+        """Лента подписок доступна по JWT и содержит посты авторов."""
+        url = reverse('api:timeline')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        Follow.objects.create(user=self.user, author=self.author)
+        token = self.client.post(
+            reverse('api:jwt-create'),
+            {'username': 'Edward', 'password': 'pw'},
+        ).data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = self.client.get(url)
+        self.assertEqual(
+            [post['id'] for post in response.data['results']],
+            [post.id for post in reversed(self.posts)]
+        )
+        response = self.client.get(reverse('api:follow-list'))
+        self.assertEqual(response.data['results'][0]['author'], 'Leo')
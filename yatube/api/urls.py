@@ -0,0 +1,28 @@
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+from rest_framework_simplejwt.views import (
+    TokenObtainPairView, TokenRefreshView, TokenVerifyView,
+)
+
+from . import views
+
+
+app_name = 'api'
+
+router_v1 = DefaultRouter()
+router_v1.register('groups', views.GroupViewSet, basename='groups')
+router_v1.register('posts', views.PostViewSet, basename='posts')
+router_v1.register(
+    r'posts/(?P<post_id>\d+)/comments',
+    views.CommentViewSet,
+    basename='comments',
+)
+router_v1.register('follow', views.FollowViewSet, basename='follow')
+
+urlpatterns = [
+    path('v1/timeline/', views.TimelineView.as_view(), name='timeline'),
+    path('v1/jwt/create/', TokenObtainPairView.as_view(), name='jwt-create'),
+    path('v1/jwt/refresh/', TokenRefreshView.as_view(), name='jwt-refresh'),
+    path('v1/jwt/verify/', TokenVerifyView.as_view(), name='jwt-verify'),
+    path('v1/', include(router_v1.urls)),
+]
@@ -0,0 +1,105 @@
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponseNotModified
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import generics, permissions, viewsets
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from posts import graph, timeline
+from posts.models import Follow, Group, Post, User
+from .filters import PostFilter
+from .serializers import (
+    CommentSerializer, FollowSerializer, GroupSerializer, PostSerializer,
+)
+
+
+class ETagMixin:
+    """ETag по содержимому ответа и ответ 304 на совпавший If-None-Match.
+
+    Хеш считается по данным сериализатора до рендеринга, поэтому
+    неизменившийся ответ не рендерится и не передаётся клиенту.
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if (
+            request.method not in ('GET', 'HEAD')
+            or response.status_code != 200
+        ):
+            return response
+        payload = json.dumps(
+            response.data, cls=DjangoJSONEncoder, sort_keys=True
+        ).encode()
+        etag = quote_etag(hashlib.md5(payload).hexdigest())
+        patch_vary_headers(response, ('Authorization', 'Cookie'))
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            not_modified = HttpResponseNotModified()
+            not_modified['ETag'] = etag
+            not_modified['Vary'] = response['Vary']
+            return not_modified
+        response['ETag'] = etag
+        return response
+
+
+class GroupViewSet(ETagMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Group.objects.all()
+    serializer_class = GroupSerializer
+    lookup_field = 'slug'
+    ordering = ('title', 'id')
+
+
+class PostViewSet(ETagMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Post.objects.feed()
+    serializer_class = PostSerializer
+    filterset_class = PostFilter
+
+
+class CommentViewSet(ETagMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = CommentSerializer
+    ordering = ('-created', '-id')
+
+    def get_queryset(self):
+        post = get_object_or_404(Post, pk=self.kwargs['post_id'])
+        return post.comments.select_related('author')
+
+
+class FollowViewSet(ETagMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = FollowSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    ordering = ('-id',)
+
+    def get_queryset(self):
+        return Follow.objects.filter(
+            user=self.request.user
+        ).select_related('user', 'author')
+
+    @action(detail=False)
+    def suggestions(self, request):
+        """Авторы, на которых подписаны авторы текущего пользователя."""
+        ids = graph.suggestions(request.user.id)
+        users = User.objects.in_bulk(ids)
+        return Response([
+            {'username': users[user_id].username}
+            for user_id in ids if user_id in users
+        ])
+
+
+class TimelineView(ETagMixin, generics.ListAPIView):
+    """Лента подписок текущего пользователя."""
+    serializer_class = PostSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_queryset(self):
+        return timeline.source(self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        rows = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(timeline.posts_of(rows), many=True)
+        return self.get_paginated_response(serializer.data)
@@ -0,0 +1,210 @@
+"""Кеш с защитой от одновременного пересчёта горячих ключей.
+
+Значение хранится вместе со временем его вычисления и сроком годности.
+Ключ пересчитывается немного раньше срока с вероятностью, растущей по
+мере его приближения (probabilistic early expiration, XFetch), а
+пересчитывает его только процесс, захвативший блокировку в общем кеше.
+Остальные в это время отдают прежнее значение.
+
+invalidate() не переписывает значение, а увеличивает номер версии
+ключа. Значение хранит версию, прочитанную до его вычисления, и с другой
+версией считается устаревшим, поэтому пометка не теряется, даже если
+совпала с пересчётом в другом процессе.
+
+Блокировка снимается только её владельцем: в ней хранится случайный
+токен. У Redis и memcached add и incr атомарны. У файлового кеша
+(FileBasedCache) это чтение и запись двумя шагами, поэтому блокировкой
+для него служит файл в каталоге кеша, созданный с O_CREAT | O_EXCL, а
+номер версии увеличивается под такой же блокировкой. Имя файла
+включает номер интервала CACHE_LOCK_TIMEOUT, так что блокировка
+завершившегося процесса перестаёт действовать в следующем интервале.
+"""
+import hashlib
+import math
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+
+
+class CacheMetrics:
+    """Счётчики обращений к кешу по префиксу ключа (до первого ':').
+
+    Функции из listeners вызываются с ключом, событием и псевдонимом
+    кеша при каждом обращении, например для замеров отдельного запроса.
+    """
+    EVENTS = ('hit', 'stale', 'miss', 'recompute')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(lambda: dict.fromkeys(self.EVENTS, 0))
+        self.listeners = []
+
+    def record(self, key, event, alias='default'):
+        prefix = key.split(':', 1)[0]
+        with self._lock:
+            self._counters[prefix][event] += 1
+        for listener in self.listeners:
+            listener(key, event, alias)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                prefix: dict(counters)
+                for prefix, counters in self._counters.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+metrics = CacheMetrics()
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _lock_path(cache, name, window):
+    digest = hashlib.md5(name.encode()).hexdigest()
+    return os.path.join(cache._dir, f'{digest}.{window}.lock')
+
+
+def _acquire(cache, name, timeout):
+    """Захватывает блокировку; возвращает ключ для _release или None."""
+    if not isinstance(cache, FileBasedCache):
+        token = uuid4().hex
+        return (name, token) if cache.add(name, token, timeout) else None
+    window = int(time.time() // timeout)
+    path = _lock_path(cache, name, window)
+    os.makedirs(cache._dir, exist_ok=True)
+    try:
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return None
+    # Файл прошлого интервала остаётся, если его владелец завершился.
+    _remove(_lock_path(cache, name, window - 1))
+    return path
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _release(cache, lock):
+    if isinstance(lock, tuple):
+        name, token = lock
+        if cache.get(name) == token:
+            cache.delete(name)
+        return
+    _remove(lock)
+
+
+@contextmanager
+def _locked(cache, name):
+    """Ждёт блокировку name; не больше CACHE_LOCK_TIMEOUT секунд."""
+    deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT
+    lock = _acquire(cache, name, settings.CACHE_LOCK_TIMEOUT)
+    while lock is None and time.monotonic() < deadline:
+        time.sleep(0.005)
+        lock = _acquire(cache, name, settings.CACHE_LOCK_TIMEOUT)
+    try:
+        yield
+    finally:
+        if lock is not None:
+            _release(cache, lock)
+
+
+def _version_key(key):
+    return f'{key}:version'
+
+
+def _store(cache, key, value, delta, timeout, version):
+    cache.set(
+        key,
+        (value, delta, time.time() + timeout, version),
+        timeout + settings.CACHE_STALE_GRACE,
+    )
+
+
+def _is_fresh(envelope, version, beta):
+    _, delta, expires_at, stored_version = envelope
+    if stored_version != version:
+        return False
+    # 1 - random() лежит в (0, 1], поэтому логарифм определён.
+    early = delta * beta * math.log(1 - random.random())
+    return time.time() - early < expires_at
+
+
+def get_or_compute(key, compute, timeout, beta=1.0, alias='default'):
+    """Значение из кеша или результат compute() с защитой от stampede."""
+    cache = caches[alias]
+    found = cache.get_many([key, _version_key(key)])
+    envelope = found.get(key)
+    version = found.get(_version_key(key), 0)
+    if envelope is not None and _is_fresh(envelope, version, beta):
+        metrics.record(key, 'hit', alias)
+        return envelope[0]
+    lock = _acquire(cache, _lock_key(key), settings.CACHE_LOCK_TIMEOUT)
+    if lock is not None:
+        try:
+            if envelope is None:
+                metrics.record(key, 'miss', alias)
+            metrics.record(key, 'recompute', alias)
+            started = time.monotonic()
+            value = compute()
+            _store(
+                cache, key, value, time.monotonic() - started, timeout,
+                version,
+            )
+            return value
+        finally:
+            _release(cache, lock)
+    if envelope is not None:
+        metrics.record(key, 'stale', alias)
+        return envelope[0]
+    # Значения нет, а пересчитывает другой процесс: ждём его результата.
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.01)
+        envelope = cache.get(key)
+        if envelope is not None:
+            metrics.record(key, 'hit', alias)
+            return envelope[0]
+    metrics.record(key, 'miss', alias)
+    metrics.record(key, 'recompute', alias)
+    return compute()
+
+
+def invalidate(key, alias='default'):
+    """Помечает значение устаревшим, не удаляя его.
+
+    Следующий запрос пересчитает ключ, а параллельные запросы до конца
+    пересчёта получат прежнее значение.
+    """
+    cache = caches[alias]
+    if not isinstance(cache, FileBasedCache):
+        _bump(cache, _version_key(key))
+        return
+    with _locked(cache, _version_key(key)):
+        _bump(cache, _version_key(key))
+
+
+def _bump(cache, version_key):
+    cache.add(version_key, 0, None)
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        # Версию вытеснили между add и incr: новая тоже отлична от старой.
+        cache.add(version_key, 1, None)
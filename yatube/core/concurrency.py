@@ -0,0 +1,56 @@
+"""Параллельное выполнение независимых запросов к базе.
+
+gather() выполняет первый вызов в текущем потоке, остальные — в пуле
+из CONCURRENT_QUERIES_THREADS потоков, у каждого из которых своё
+соединение с базой. Время ответа страницы тогда определяет самый
+долгий запрос, а не их сумма. Соединения потоков пула закрываются
+по правилам CONN_MAX_AGE, как после обычного запроса.
+
+Без CONCURRENT_QUERIES вызовы выполняются по очереди. Так же нужно
+поступать в тестах: данные TestCase не зафиксированы и другим
+соединениям не видны.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.CONCURRENT_QUERIES_THREADS,
+                thread_name_prefix='queries',
+            )
+        return _executor
+
+
+def _call(function):
+    try:
+        return function()
+    finally:
+        close_old_connections()
+
+
+def gather(*functions):
+    """Результаты вызовов functions в том же порядке.
+
+    Исключение любого вызова (например, Http404) передаётся дальше
+    после завершения остальных.
+    """
+    if not settings.CONCURRENT_QUERIES or len(functions) < 2:
+        return [function() for function in functions]
+    first, *rest = functions
+    futures = [_get_executor().submit(_call, function) for function in rest]
+    try:
+        results = [first()]
+    finally:
+        for future in futures:
+            future.exception()
+    return results + [future.result() for future in futures]
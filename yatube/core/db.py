@@ -0,0 +1,92 @@
+"""Чтение с реплик базы данных с согласованностью «читаю свои записи».
+
+ReplicaRouter отправляет чтение на одну из реплик DATABASE_REPLICAS
+только внутри запросов, которые ReplicaMiddleware признал безопасными:
+GET и HEAD без недавних записей пользователя. Запись, сессии, а также
+чтение в фоновых потоках и командах управления всегда идут в 'default'.
+
+После запроса с записью (POST и другие небезопасные методы или
+представление, помеченное @primary) в сессии запоминается время, до
+которого чтение этого пользователя идёт в основную базу
+(REPLICA_STICKY_SECONDS). Так после перенаправления пользователь видит
+свой пост или комментарий, даже если реплика отстаёт. Чтение сессии
+добавляет к ответу Vary: Cookie, поэтому метка читается только при
+наличии cookie сессии и никогда для оболочек страниц общего кеша
+(core.fragments.shell_page): они одинаковы для всех.
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+STICKY_KEY = 'primary_until'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_local = threading.local()
+
+
+def primary(view):
+    """Помечает представление, которое пишет в базу при GET-запросе."""
+    view.use_primary = True
+    return view
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or not getattr(_local, 'replica', False):
+            return 'default'
+        if model._meta.app_label == 'sessions':
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.writes = request.method not in SAFE_METHODS
+        _local.replica = not request.writes
+        try:
+            response = self.get_response(request)
+        finally:
+            _local.replica = False
+        if request.writes:
+            request.session[STICKY_KEY] = (
+                time.time() + settings.REPLICA_STICKY_SECONDS
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'use_primary', False):
+            request.writes = True
+            _local.replica = False
+        elif _local.replica and self._sticky(request, view_func):
+            _local.replica = False
+
+    @staticmethod
+    def _sticky(request, view_func):
+        if settings.EDGE_CACHE_PAGES and getattr(
+            view_func, 'edge_shell', False
+        ):
+            return False
+        if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            return False
+        return request.session.get(STICKY_KEY, 0) > time.time()
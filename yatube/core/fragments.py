@@ -0,0 +1,93 @@
+"""Страницы-оболочки для общего кеша и персональные фрагменты.
+
+При settings.EDGE_CACHE_PAGES представления, обёрнутые в shell_page,
+рендерят страницу без данных о пользователе и разрешают хранить её в
+общем кеше (CDN, обратный прокси). Персональные части страницы — меню
+пользователя, кнопка подписки, правка поста, форма комментария с
+CSRF-токеном — выводятся тегом {% fragment %} как заглушки и
+загружаются отдельно: скриптом с /fragments/ или через ESI, если
+EDGE_FRAGMENTS = 'esi'. Без этой настройки фрагменты рендерятся сразу.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+
+_registry = {}
+
+
+class Fragment:
+    def __init__(self, name, template, context, lookup=None, key=None):
+        self.name = name
+        self.template = template
+        self.context = context
+        self.lookup = lookup
+        self.key = key
+
+    def render(self, request, obj=None):
+        args = () if obj is None else (obj,)
+        return render_to_string(
+            self.template, self.context(request, *args), request=request
+        )
+
+    def placeholder_key(self, obj=None):
+        if obj is None:
+            return self.name
+        return f'{self.name}:{self.key(obj)}'
+
+
+def register(name, template, lookup=None, key=None):
+    """Регистрирует фрагмент: функция возвращает контекст шаблона.
+
+    Фрагмент с объектом получает в key его строковый ключ для адреса
+    фрагмента, а в lookup — функцию, которая находит объект по ключу.
+    """
+    def decorator(context):
+        _registry[name] = Fragment(name, template, context, lookup, key)
+        return context
+    return decorator
+
+
+def get(name):
+    return _registry[name]
+
+
+def resolve(key):
+    """Фрагмент и его объект по ключу заглушки («имя» или «имя:ключ»)."""
+    name, _, arg = key.partition(':')
+    fragment = _registry[name]
+    obj = fragment.lookup(arg) if fragment.lookup else None
+    return fragment, obj
+
+
+def is_shell(request):
+    return getattr(request, 'edge_shell', False)
+
+
+def shell_page(view):
+    """Отдаёт страницу оболочкой для общего кеша, если это включено."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not settings.EDGE_CACHE_PAGES or request.method not in (
+            'GET', 'HEAD'
+        ):
+            return view(request, *args, **kwargs)
+        request.edge_shell = True
+        response = view(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            patch_cache_control(
+                response,
+                public=True,
+                max_age=0,
+                s_maxage=settings.EDGE_CACHE_TIMEOUT,
+            )
+        return response
+    # По этой отметке ReplicaMiddleware не читает сессию.
+    wrapper.edge_shell = True
+    return wrapper
+
+
+@register('nav', 'includes/fragments/nav.html')
+def nav(request):
+    return {}
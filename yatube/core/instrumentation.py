@@ -0,0 +1,192 @@
+"""Замеры запросов: SQL, шаблоны, кеш и миниатюры.
+
+InstrumentationMiddleware включается настройкой INSTRUMENTATION_ENABLED.
+Без неё Django исключает промежуточное ПО при запуске (MiddlewareNotUsed),
+и ни обёртки запросов к базе, ни замеры шаблонов не устанавливаются.
+
+Для каждого запроса собираются число и время SQL-запросов, повторы
+одинаковых запросов (признак N+1), время рендеринга шаблонов, попадания
+в кеш и время участков, отмеченных timed(). Итоги отдаются заголовком
+Server-Timing, а медленные запросы и запросы с повторами пишутся в лог
+yatube.slow_requests одной JSON-строкой.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import cache
+
+logger = logging.getLogger('yatube.slow_requests')
+
+_local = threading.local()
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache = Counter()
+        self.timers = defaultdict(float)
+
+    def duplicates(self):
+        """Запросы, выполненные больше одного раза, по убыванию повторов."""
+        return [
+            (sql, count) for sql, count in self.statements.most_common()
+            if count > 1
+        ]
+
+    def server_timing(self, total):
+        cache_events = ' '.join(
+            f'{event}={count}' for event, count in sorted(self.cache.items())
+        )
+        parts = [
+            f'total;dur={total * 1000:.1f}',
+            f'db;dur={self.db_time * 1000:.1f};'
+            f'desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+        ]
+        if cache_events:
+            parts.append(f'cache;desc="{cache_events}"')
+        for name, duration in sorted(self.timers.items()):
+            parts.append(f'{name};dur={duration * 1000:.1f}')
+        return ', '.join(parts)
+
+    def as_dict(self, total):
+        return {
+            'total_ms': round(total * 1000, 1),
+            'db': {
+                'queries': self.queries,
+                'ms': round(self.db_time * 1000, 1),
+                'duplicates': [
+                    {'sql': sql[:300], 'count': count}
+                    for sql, count in self.duplicates()[:5]
+                ],
+            },
+            'template_ms': round(self.template_time * 1000, 1),
+            'cache': dict(self.cache),
+            'timers_ms': {
+                name: round(duration * 1000, 1)
+                for name, duration in self.timers.items()
+            },
+        }
+
+
+def current():
+    """Замеры текущего запроса или None вне запроса и без замеров."""
+    return getattr(_local, 'stats', None)
+
+
+@contextmanager
+def timed(name):
+    """Добавляет время участка кода к замерам текущего запроса."""
+    stats = current()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.timers[name] += time.perf_counter() - started
+
+
+def _query(execute, sql, params, many, context):
+    stats = current()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - started
+        stats.queries += 1
+        stats.statements[sql] += 1
+
+
+def _cache_event(key, event, alias):
+    stats = current()
+    if stats is not None:
+        stats.cache[event] += 1
+
+
+def _install_template_timer():
+    """Оборачивает рендеринг шаблонов; вложенные шаблоны не считаются."""
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, 'instrumented', False):
+        return
+    original = Template.render
+
+    @wraps(original)
+    def render(self, context=None, request=None):
+        stats = current()
+        if stats is None or stats.template_depth:
+            return original(self, context, request)
+        stats.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            stats.template_depth -= 1
+            stats.template_time += time.perf_counter() - started
+
+    render.instrumented = True
+    Template.render = render
+
+
+class InstrumentationMiddleware:
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        _install_template_timer()
+        if _cache_event not in cache.metrics.listeners:
+            cache.metrics.listeners.append(_cache_event)
+
+    def __call__(self, request):
+        stats = RequestStats()
+        _local.stats = stats
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_query))
+                response = self.get_response(request)
+        finally:
+            _local.stats = None
+        total = time.perf_counter() - started
+        if settings.INSTRUMENTATION_SERVER_TIMING:
+            response['Server-Timing'] = stats.server_timing(total)
+        self.log(request, response, stats, total)
+        return response
+
+    def log(self, request, response, stats, total):
+        duplicates = stats.duplicates()
+        slow = total * 1000 >= settings.INSTRUMENTATION_SLOW_REQUEST_MS
+        repeated = bool(duplicates) and (
+            duplicates[0][1] >= settings.INSTRUMENTATION_DUPLICATE_QUERIES
+        )
+        if not (slow or repeated):
+            return
+        if random.random() >= settings.INSTRUMENTATION_SAMPLE_RATE:
+            return
+        record = {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'view': getattr(
+                getattr(request, 'resolver_match', None), 'view_name', None
+            ),
+            **stats.as_dict(total),
+        }
+        logger.warning(json.dumps(record, ensure_ascii=False))
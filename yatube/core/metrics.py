@@ -0,0 +1,324 @@
+"""Метрики в формате Prometheus, общие для всех процессов сервера.
+
+Каждый процесс пишет свои значения в собственный файл <pid>.db в
+каталоге METRICS_DIR, отображённый в память (mmap). Обновление метрики —
+поиск смещения в словаре и запись восьми байт под блокировкой своего
+процесса, без системных вызовов и межпроцессных блокировок. render()
+читает файлы всех процессов и складывает значения. Без METRICS_DIR
+значения хранятся в памяти, и /metrics показывает только свой процесс.
+
+Файлы завершившихся процессов остаются в каталоге, чтобы счётчики не
+убывали; при перезапуске сервера каталог нужно очищать.
+
+Формат файла: 8 байт — занятый размер, затем записи
+[длина ключа, int32][ключ в utf-8, выровненный до 8 байт][значение, double].
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import cache
+
+HEADER = struct.Struct('q')
+LENGTH = struct.Struct('i')
+VALUE = struct.Struct('d')
+INITIAL_SIZE = 1 << 16
+
+METRICS = {
+    'yatube_request_duration_seconds': (
+        'histogram', 'Время ответа страниц posts по имени адреса.'),
+    'yatube_request_queries': (
+        'histogram', 'Число SQL-запросов на страницу posts.'),
+    'yatube_cache_events_total': (
+        'counter', 'Обращения к кешу по псевдониму и событию.'),
+    'yatube_cache_hit_ratio': (
+        'gauge', 'Доля обращений к кешу, обслуженных без пересчёта.'),
+    'yatube_thumbnail_queue_depth': (
+        'gauge', 'Миниатюры, ожидающие генерации.'),
+    'yatube_thumbnail_seconds': (
+        'histogram', 'Время создания миниатюр одной картинки.'),
+    'yatube_created_total': (
+        'counter', 'Созданные посты, комментарии и подписки.'),
+    'yatube_write_behind_failed_total': (
+        'counter', 'Сегменты отложенной записи, отложенные после ошибок.'),
+}
+
+
+def _aligned(size):
+    return (size + 7) & ~7
+
+
+def _entries(data, used):
+    """Тройки (ключ, значение, смещение значения) из содержимого файла."""
+    position = HEADER.size
+    while position < used:
+        length = LENGTH.unpack_from(data, position)[0]
+        start = position + LENGTH.size
+        key = bytes(data[start:start + length]).decode()
+        offset = position + _aligned(LENGTH.size + length)
+        yield key, VALUE.unpack_from(data, offset)[0], offset
+        position = offset + VALUE.size
+
+
+class FileStore:
+    """Значения одного процесса в файле, отображённом в память."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < INITIAL_SIZE:
+            self._file.truncate(INITIAL_SIZE)
+            size = INITIAL_SIZE
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._used = HEADER.unpack_from(self._map, 0)[0] or HEADER.size
+        self._offsets = {
+            key: offset
+            for key, _, offset in _entries(self._map, self._used)
+        }
+
+    def __contains__(self, key):
+        return key in self._offsets
+
+    def _allocate(self, key):
+        encoded = key.encode()
+        offset = self._used + _aligned(LENGTH.size + len(encoded))
+        end = offset + VALUE.size
+        if end > len(self._map):
+            size = len(self._map)
+            while size < end:
+                size *= 2
+            self._map.close()
+            self._file.truncate(size)
+            self._map = mmap.mmap(self._file.fileno(), size)
+        LENGTH.pack_into(self._map, self._used, len(encoded))
+        start = self._used + LENGTH.size
+        self._map[start:start + len(encoded)] = encoded
+        VALUE.pack_into(self._map, offset, 0.0)
+        # Размер пишется последним: читатели не видят записей наполовину.
+        HEADER.pack_into(self._map, 0, end)
+        self._used = end
+        self._offsets[key] = offset
+        return offset
+
+    def add(self, key, amount):
+        offset = self._offsets.get(key) or self._allocate(key)
+        value = VALUE.unpack_from(self._map, offset)[0]
+        VALUE.pack_into(self._map, offset, value + amount)
+
+    def set(self, key, value):
+        offset = self._offsets.get(key) or self._allocate(key)
+        VALUE.pack_into(self._map, offset, value)
+
+
+class MemoryStore(dict):
+    """Значения одного процесса в памяти."""
+
+    def add(self, key, amount):
+        self[key] = self.get(key, 0.0) + amount
+
+    def set(self, key, value):
+        self[key] = value
+
+
+_lock = threading.Lock()
+_store = None
+_store_key = None
+
+
+def _get_store():
+    # Процесс, созданный fork, открывает собственный файл.
+    global _store, _store_key
+    key = (os.getpid(), settings.METRICS_DIR)
+    if _store_key != key:
+        if settings.METRICS_DIR:
+            os.makedirs(settings.METRICS_DIR, exist_ok=True)
+            _store = FileStore(
+                os.path.join(settings.METRICS_DIR, f'{os.getpid()}.db')
+            )
+        else:
+            _store = MemoryStore()
+        _store_key = key
+    return _store
+
+
+def _key(name, labels):
+    return json.dumps([name, sorted(labels.items())], ensure_ascii=False)
+
+
+def inc(name, amount=1, **labels):
+    if not settings.METRICS_ENABLED:
+        return
+    with _lock:
+        _get_store().add(_key(name, labels), amount)
+
+
+def set_gauge(name, value, **labels):
+    if not settings.METRICS_ENABLED:
+        return
+    with _lock:
+        _get_store().set(_key(name, labels), value)
+
+
+def observe(name, value, buckets, **labels):
+    """Добавляет наблюдение в гистограмму с границами buckets.
+
+    Хранится число наблюдений в каждом интервале, накопленные значения
+    считает render().
+    """
+    if not settings.METRICS_ENABLED:
+        return
+    bound = next((bound for bound in buckets if value <= bound), None)
+    count_key = _key(f'{name}_count', labels)
+    with _lock:
+        store = _get_store()
+        if count_key not in store:
+            # Все интервалы создаются сразу, чтобы в выводе были
+            # и пустые.
+            for edge in list(buckets) + [None]:
+                store.add(_key(f'{name}_bucket', {**labels, 'le': edge}), 0)
+        store.add(_key(f'{name}_bucket', {**labels, 'le': bound}), 1)
+        store.add(_key(f'{name}_sum', labels), value)
+        store.add(count_key, 1)
+
+
+def _read(path):
+    with open(path, 'rb') as file:
+        data = file.read()
+    if len(data) < HEADER.size:
+        return
+    for key, value, _ in _entries(data, HEADER.unpack_from(data, 0)[0]):
+        yield key, value
+
+
+def collect():
+    """Значения всех процессов: {(имя, метки): сумма}."""
+    with _lock:
+        store = _get_store()
+        own = None if settings.METRICS_DIR else dict(store)
+    if own is not None:
+        items = own.items()
+    else:
+        items = (
+            item for name in sorted(os.listdir(settings.METRICS_DIR))
+            if name.endswith('.db')
+            for item in _read(os.path.join(settings.METRICS_DIR, name))
+        )
+    totals = defaultdict(float)
+    for key, value in items:
+        name, labels = json.loads(key)
+        totals[name, tuple(map(tuple, labels))] += value
+    return totals
+
+
+def _hit_ratios(totals):
+    events = defaultdict(lambda: defaultdict(float))
+    for (name, labels), value in totals.items():
+        if name == 'yatube_cache_events_total':
+            labels = dict(labels)
+            events[labels['alias']][labels['event']] += value
+    for alias, counts in events.items():
+        served = counts['hit'] + counts['stale']
+        total = served + counts['miss']
+        if total:
+            totals['yatube_cache_hit_ratio', (('alias', alias),)] = (
+                served / total
+            )
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\')
+                         .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+def _bound(le):
+    return float('inf') if le is None else le
+
+
+def _histogram_lines(name, totals):
+    series = defaultdict(dict)
+    for (sample, labels), value in totals.items():
+        if sample == f'{name}_bucket':
+            other = tuple(item for item in labels if item[0] != 'le')
+            series[other][dict(labels)['le']] = value
+    for labels, buckets in sorted(series.items()):
+        cumulative = 0
+        for le in sorted(buckets, key=_bound):
+            cumulative += buckets[le]
+            edge = '+Inf' if le is None else repr(float(le))
+            bucket_labels = _format_labels(labels + (('le', edge),))
+            yield f'{name}_bucket{bucket_labels} {cumulative:g}'
+        for suffix in ('sum', 'count'):
+            value = totals.get((f'{name}_{suffix}', labels), 0)
+            yield f'{name}_{suffix}{_format_labels(labels)} {value:g}'
+
+
+def render():
+    """Текст для Prometheus (формат text/plain версии 0.0.4)."""
+    totals = collect()
+    _hit_ratios(totals)
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+        if kind == 'histogram':
+            lines += _histogram_lines(name, totals)
+            continue
+        samples = sorted(
+            (labels, value) for (sample, labels), value in totals.items()
+            if sample == name
+        )
+        for labels, value in samples:
+            lines.append(f'{name}{_format_labels(labels)} {value:g}')
+    return '\n'.join(lines) + '\n'
+
+
+def _cache_event(key, event, alias):
+    inc('yatube_cache_events_total', alias=alias, event=event)
+
+
+class MetricsMiddleware:
+    """Время ответа и число SQL-запросов страниц из пространства posts."""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if _cache_event not in cache.metrics.listeners:
+            cache.metrics.listeners.append(_cache_event)
+
+    def __call__(self, request):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and 'posts' in match.namespaces:
+            observe('yatube_request_duration_seconds', elapsed,
+                    settings.METRICS_LATENCY_BUCKETS, view=match.view_name)
+            observe('yatube_request_queries', queries,
+                    settings.METRICS_QUERY_BUCKETS, view=match.view_name)
+        return response
@@ -0,0 +1,37 @@
+from urllib.parse import urlencode
+
+from django import template
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from core import fragments
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def fragment(context, name, obj=None):
+    """Персональный фрагмент страницы или заглушка для его загрузки."""
+    request = context.get('request')
+    item = fragments.get(name)
+    if not fragments.is_shell(request):
+        return mark_safe(item.render(request, obj))
+    key = item.placeholder_key(obj)
+    if settings.EDGE_FRAGMENTS == 'esi':
+        query = urlencode({'f': key, 'format': 'html'})
+        return format_html(
+            '<esi:include src="{}?{}"/>', reverse('core:fragments'), query
+        )
+    return format_html('<template data-fragment="{}"></template>', key)
+
+
+@register.simple_tag(takes_context=True)
+def fragment_loader(context):
+    """Скрипт, подставляющий фрагменты в страницу-оболочку."""
+    request = context.get('request')
+    if not fragments.is_shell(request) or settings.EDGE_FRAGMENTS == 'esi':
+        return ''
+    return render_to_string('includes/fragments/loader.html')
@@ -1,6 +1,31 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
 from http import HTTPStatus
 
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.http import Http404, HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core import cache as cache_utils
+from core import metrics
+from core.asgi import ASGIHandler
+from core.concurrency import gather
+from core.db import STICKY_KEY, ReplicaMiddleware, ReplicaRouter, primary
+from core.instrumentation import InstrumentationMiddleware
+from posts.models import Comment, Follow, Post
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -8,3 +33,390 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class GetOrComputeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        cache_utils.metrics.reset()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def test_value_is_computed_once(self):
+        """Свежее значение берётся из кеша без пересчёта."""
+        for _ in range(3):
+            value = cache_utils.get_or_compute('feed:test', self.compute, 60)
+        self.assertEqual(value, 1)
+        self.assertEqual(
+            cache_utils.metrics.snapshot()['feed'],
+            {'hit': 2, 'stale': 0, 'miss': 1, 'recompute': 1}
+        )
+
+    def test_stale_value_served_while_locked(self):
+        """Пока ключ пересчитывает другой процесс, отдаётся старое значение."""
+        cache_utils.get_or_compute('feed:test', self.compute, 60)
+        cache_utils.invalidate('feed:test')
+        cache.add('feed:test:lock', 1)
+        value = cache_utils.get_or_compute('feed:test', self.compute, 60)
+        self.assertEqual(value, 1)
+        self.assertEqual(cache_utils.metrics.snapshot()['feed']['stale'], 1)
+
+    def test_invalidated_value_is_recomputed(self):
+        """После пометки устаревшим значение пересчитывается."""
+        cache_utils.get_or_compute('feed:test', self.compute, 60)
+        cache_utils.invalidate('feed:test')
+        value = cache_utils.get_or_compute('feed:test', self.compute, 60)
+        self.assertEqual(value, 2)
+        self.assertIsNone(cache.get('feed:test:lock'))
+
+    def test_invalidate_during_recompute_is_kept(self):
+        """Пометка во время пересчёта не теряется за его результатом."""
+        def compute():
+            cache_utils.invalidate('feed:test')
+            return self.compute()
+
+        cache_utils.get_or_compute('feed:test', compute, 60)
+        value = cache_utils.get_or_compute('feed:test', self.compute, 60)
+        self.assertEqual(value, 2)
+
+    def test_file_cache_lock_and_version(self):
+        """У файлового кеша блокировка и версия не теряются в потоках."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': directory,
+        }}):
+            file_cache = cache_utils.caches['default']
+            lock = cache_utils._acquire(file_cache, 'feed:test:lock', 10)
+            self.assertIsNotNone(lock)
+            self.assertIsNone(
+                cache_utils._acquire(file_cache, 'feed:test:lock', 10)
+            )
+            cache_utils._release(file_cache, lock)
+            self.assertIsNotNone(
+                cache_utils._acquire(file_cache, 'feed:test:lock', 10)
+            )
+
+            def bump():
+                for _ in range(20):
+                    cache_utils.invalidate('feed:test')
+
+            threads = [threading.Thread(target=bump) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(file_cache.get('feed:test:version'), 160)
+
+    def test_early_expiration_near_deadline(self):
+        """Ключ, дорогой в вычислении, пересчитывается до истечения срока."""
+        cache.set('feed:test', ('old', 3600, 10 ** 10, 0), 60)
+        self.assertEqual(
+            cache_utils.get_or_compute('feed:test', self.compute, 60), 'old'
+        )
+        cache.set('feed:test', ('old', 10 ** 9, 0, 0), 60)
+        self.assertEqual(
+            cache_utils.get_or_compute('feed:test', self.compute, 60), 1
+        )
+
+
+@override_settings(EDGE_CACHE_PAGES=True)
+class EdgeCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Edward')
+        cls.author = User.objects.create_user(username='Leo')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'Leo'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        ]
+
+    def test_shell_is_shared(self):
+        """Гость и пользователь получают одну и ту же оболочку страницы."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                guest = self.client.get(url)
+                user = self.authorized_client.get(url)
+                self.assertEqual(guest.content, user.content)
+                self.assertNotContains(user, 'Edward')
+                self.assertIn('public', user['Cache-Control'])
+                self.assertIn('s-maxage', user['Cache-Control'])
+                self.assertNotIn('Cookie', user.get('Vary', ''))
+                self.assertEqual(guest.get('ETag'), user.get('ETag'))
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_shell_with_replicas_has_no_vary_cookie(self):
+        """С репликами оболочка не читает сессию и остаётся общей."""
+        client = Client()
+        client.force_login(self.user)
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertNotIn('Cookie', response.get('Vary', ''))
+
+    def test_fragments_are_personal(self):
+        response = self.authorized_client.get(
+            reverse('core:fragments'),
+            {'f': ['nav', 'follow:Leo', f'post_actions:{self.post.id}',
+                   'post_actions:nope', 'unknown']},
+        )
+        fragments = response.json()
+        self.assertEqual(
+            set(fragments),
+            {'nav', 'follow:Leo', f'post_actions:{self.post.id}'}
+        )
+        self.assertIn('Edward', fragments['nav'])
+        self.assertIn('Отписаться', fragments['follow:Leo'])
+        self.assertIn('csrfmiddlewaretoken',
+                      fragments[f'post_actions:{self.post.id}'])
+        self.assertIn('private', response['Cache-Control'])
+
+    @override_settings(EDGE_FRAGMENTS='esi')
+    def test_esi_includes(self):
+        response = self.client.get(self.urls[1])
+        self.assertContains(
+            response, '<esi:include src="/fragments/?f=follow%3ALeo'
+        )
+
+
+@override_settings(INSTRUMENTATION_ENABLED=True)
+class InstrumentationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Leo')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_server_timing(self):
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for metric in ('total;dur=', 'db;dur=', 'queries', 'tpl;dur=',
+                       'cache;desc="miss='):
+            with self.subTest(metric=metric):
+                self.assertIn(metric, timing)
+
+    @override_settings(INSTRUMENTATION_SLOW_REQUEST_MS=0)
+    def test_slow_request_is_logged(self):
+        """Медленный запрос пишется в лог одной JSON-строкой."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        with self.assertLogs('yatube.slow_requests', 'WARNING') as logs:
+            self.client.get(url)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:post_detail')
+        self.assertGreater(record['db']['queries'], 0)
+
+    @override_settings(INSTRUMENTATION_DUPLICATE_QUERIES=3)
+    def test_repeated_queries_are_logged(self):
+        """Повторы одного запроса (N+1) попадают в лог."""
+        def view(request):
+            for post_id in range(3):
+                Post.objects.filter(pk=post_id).first()
+            return HttpResponse()
+
+        middleware = InstrumentationMiddleware(view)
+        with self.assertLogs('yatube.slow_requests', 'WARNING') as logs:
+            middleware(RequestFactory().get('/'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertGreaterEqual(record['db']['duplicates'][0]['count'], 3)
+
+    @override_settings(INSTRUMENTATION_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+@override_settings(METRICS_ENABLED=True)
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Leo')
+        cls.reader = User.objects.create_user(username='Mia')
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        overridden = override_settings(METRICS_DIR=self.directory)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        self.client = Client()
+
+    def test_endpoint(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        for line in (
+            '# TYPE yatube_request_duration_seconds histogram',
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"} 2',
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            'yatube_request_queries_count{view="posts:index"} 2',
+            'yatube_created_total{kind="post"} 1',
+            'yatube_created_total{kind="comment"} 1',
+            'yatube_created_total{kind="follow"} 1',
+            'yatube_cache_hit_ratio{alias="default"}',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, text)
+        # Сама страница метрик не из пространства posts.
+        self.assertNotIn('view="metrics"', text)
+
+    def test_processes_are_summed(self):
+        """Значения из файлов других процессов складываются."""
+        metrics.inc('yatube_created_total', kind='post')
+        other = metrics.FileStore(os.path.join(self.directory, '1.db'))
+        for _ in range(3):
+            other.add(metrics._key('yatube_created_total', {'kind': 'post'}),
+                      1)
+        other.set(metrics._key('yatube_thumbnail_queue_depth', {}), 5)
+        text = metrics.render()
+        self.assertIn('yatube_created_total{kind="post"} 4', text)
+        self.assertIn('yatube_thumbnail_queue_depth 5', text)
+
+    def test_store_grows(self):
+        store = metrics.FileStore(os.path.join(self.directory, '1.db'))
+        for number in range(5000):
+            store.add(metrics._key('yatube_created_total',
+                                   {'kind': f'kind{number}'}), number)
+        reopened = dict(metrics._read(store.path))
+        self.assertEqual(len(reopened), 5000)
+        self.assertEqual(
+            reopened[metrics._key('yatube_created_total',
+                                  {'kind': 'kind4999'})],
+            4999,
+        )
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'])
+    def test_allowed_ips(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class ASGITests(TestCase):
+    def request(self, application, path, body=b''):
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': path,
+            'query_string': b'',
+            'headers': [(b'host', b'localhost')],
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(application(scope, receive, send))
+        return messages
+
+    def test_page_through_asgi(self):
+        application = ASGIHandler(WSGIHandler(), threads=1)
+        self.addCleanup(application.executor.shutdown)
+        messages = self.request(application, reverse('about:author'))
+        self.assertEqual(messages[0]['type'], 'http.response.start')
+        self.assertEqual(messages[0]['status'], HTTPStatus.OK)
+        body = b''.join(message.get('body', b'') for message in messages)
+        self.assertIn(b'<html', body)
+        self.assertFalse(messages[-1].get('more_body', False))
+
+    @override_settings(CONCURRENT_QUERIES=True)
+    def test_gather(self):
+        self.assertEqual(gather(lambda: 1, lambda: 2, lambda: 3), [1, 2, 3])
+
+        def missing():
+            raise Http404
+
+        with self.assertRaises(Http404):
+            gather(lambda: 1, missing)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_STICKY_SECONDS=10)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.session = SessionStore()
+        self.seen = []
+
+    def view(self, request):
+        self.seen.append(self.router.db_for_read(Post))
+        return HttpResponse()
+
+    def call(self, method, view=None):
+        view = view or self.view
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaMiddleware(get_response)
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = 'key'
+        request.session = self.session
+        return middleware(request)
+
+    def test_outside_request_reads_primary(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_get_reads_replica(self):
+        self.call('get')
+        self.assertEqual(self.seen, ['replica1'])
+        self.assertNotIn(STICKY_KEY, self.session)
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_sessions_read_primary(self):
+        def view(request):
+            self.seen.append(self.router.db_for_read(Session))
+            return HttpResponse()
+
+        self.call('get', view)
+        self.assertEqual(self.seen, ['default'])
+
+    def test_reads_after_write_are_pinned(self):
+        """После записи пользователь читает из основной базы."""
+        self.call('post')
+        self.call('get')
+        self.session[STICKY_KEY] = time.time() - 1
+        self.call('get')
+        self.assertEqual(self.seen, ['default', 'default', 'replica1'])
+
+    def test_primary_view(self):
+        @primary
+        def follow(request):
+            return self.view(request)
+
+        self.call('get', follow)
+        self.call('get')
+        self.assertEqual(self.seen, ['default', 'default'])
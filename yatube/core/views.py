@@ -1,4 +1,10 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import render
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from . import fragments, metrics
 
 
 def page_not_found(request, exception):
@@ -15,3 +21,37 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def user_fragments(request):
+    """Персональные фрагменты страницы-оболочки по ключам из ?f=."""
+    keys = request.GET.getlist('f')[:settings.EDGE_FRAGMENTS_MAX]
+    rendered = {}
+    for key in keys:
+        try:
+            fragment, obj = fragments.resolve(key)
+        except (KeyError, ValueError, Http404):
+            continue
+        rendered[key] = fragment.render(request, obj)
+    if request.GET.get('format') == 'html':
+        response = HttpResponse(''.join(rendered.values()))
+    else:
+        response = JsonResponse(rendered)
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def metrics_export(request):
+    """Метрики всех процессов сервера в текстовом формате Prometheus."""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    allowed = settings.METRICS_ALLOWED_IPS
+    if allowed and request.META.get('REMOTE_ADDR') not in allowed:
+        raise PermissionDenied
+    response = HttpResponse(
+        metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+    patch_cache_control(response, no_store=True)
+    return response
@@ -1,6 +1,9 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, SEARCH_VAR
+from django.db.models import Case, IntegerField, Value, When
 
-from .models import Comment, Group, Post, Follow
+from . import search, thumbnails
+from .models import Comment, Group, Post, Follow, Profile
 
 
 @admin.register(Post)
@@ -11,6 +14,32 @@ class PostAdmin(admin.ModelAdmin):
     list_editable = ('group',)
     empty_value_display = '-пусто-'
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data:
+            thumbnails.schedule(obj)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE '%...%' по тексту ищем по полнотекстовому индексу.
+        if not search_term:
+            return queryset, False
+        ids = search.all_ranked_post_ids(search_term)
+        if not ids:
+            return queryset.none(), False
+        return queryset.filter(pk__in=ids).annotate(
+            search_rank=Case(
+                *(When(pk=post_id, then=Value(position))
+                  for position, post_id in enumerate(ids)),
+                output_field=IntegerField(),
+            )
+        ), False
+
+    def get_ordering(self, request):
+        # Без выбранной сортировки найденное идёт по релевантности.
+        if request.GET.get(SEARCH_VAR) and ORDER_VAR not in request.GET:
+            return ('search_rank',)
+        return super().get_ordering(request)
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -34,3 +63,13 @@ class FollowAdmin(admin.ModelAdmin):
     search_fields = ('user', 'author')
     list_filter = ('user',)
     empty_value_display = '-пусто-'
+
+
+@admin.register(Profile)
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = [
+        'user', 'posts_count', 'followers_count', 'following_count'
+    ]
+    search_fields = ('user__username',)
+    readonly_fields = ('posts_count', 'followers_count', 'following_count')
+    empty_value_display = '-пусто-'
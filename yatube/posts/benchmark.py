@@ -0,0 +1,406 @@
+"""Синтетические данные и замеры скорости страниц.
+
+generate() заполняет базу пользователями, группами, постами (часть с
+картинками), комментариями и подписками со степенным распределением
+популярности авторов. Данные пишутся загрузчиком из transfer, поэтому
+счётчики, ленты и поисковый индекс пересчитываются как после импорта.
+
+run() запрашивает страницы тестовым клиентом через весь стек
+промежуточного ПО и собирает перцентили времени ответа, число запросов
+к базе и пик выделенной памяти. Запросы на запись выполняются в
+транзакции, которая откатывается после замера, поэтому время фиксации
+в замер не входит, а данные не меняются. Отложенная запись на время
+замера выключена: записи журнала не откатываются вместе с транзакцией и
+попали бы в базу при следующем сбросе.
+
+concurrency() нагружает страницы на чтение параллельными клиентами
+через WSGI-обработчик с пулом потоков, как у многопоточного сервера,
+и через yatube.asgi с тем же числом потоков и параллельными запросами
+к базе. Потоки открывают свои соединения, поэтому замер нужно
+выполнять на зафиксированных данных, а не внутри теста.
+"""
+import asyncio
+import platform
+import random
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+import django
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from core import asgi
+from core import cache as shared_cache
+from . import transfer
+from .models import Comment, Follow, Group, Post, User
+
+IMAGE_VARIANTS = 5
+WORDS = (
+    'кошка собака город море лето зима книга музыка кофе утро вечер '
+    'работа отпуск дорога друг письмо сад река лес поезд'
+).split()
+
+
+class Rollback(Exception):
+    pass
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def _images(prefix):
+    names = []
+    for number in range(IMAGE_VARIANTS):
+        buffer = BytesIO()
+        color = tuple(random.Random(number).randrange(256) for _ in range(3))
+        Image.new('RGB', (1200, 800), color).save(buffer, 'JPEG')
+        names.append(default_storage.save(
+            f'posts/{prefix}-{number}.jpg', ContentFile(buffer.getvalue())
+        ))
+    return names
+
+
+def _follow_counts(rng, users, alpha):
+    """Число подписок каждого пользователя (распределение Парето)."""
+    return [
+        min(users - 1, int(rng.paretovariate(alpha))) for _ in range(users)
+    ]
+
+
+def dataset_rows(users=100, groups=10, posts=1000, comments=2000,
+                 image_ratio=0.1, alpha=1.2, seed=0, days=365):
+    """Записи синтетического набора данных в формате transfer."""
+    rng = random.Random(seed)
+    prefix = f'bench{seed}'
+    usernames = [f'{prefix}_user{number}' for number in range(users)]
+    slugs = [f'{prefix}-group{number}' for number in range(groups)]
+    # Популярность авторов убывает степенным законом: первые авторы
+    # пишут больше постов и собирают больше подписчиков.
+    weights = list(accumulate(
+        1 / (rank + 1) ** alpha for rank in range(users)
+    ))
+    post_base = (Post.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    comment_base = (
+        Comment.objects.aggregate(last=Max('id'))['last'] or 0
+    ) + 1
+    images = _images(prefix) if posts and image_ratio else []
+    now = timezone.now()
+
+    for slug in slugs:
+        yield 'groups', {
+            'slug': slug, 'title': slug, 'description': _text(rng, 12),
+        }
+    for username in usernames:
+        yield 'users', {'username': username}
+    for number in range(posts):
+        image = ''
+        if images and rng.random() < image_ratio:
+            image = rng.choice(images)
+        yield 'posts', {
+            'id': post_base + number,
+            'author': rng.choices(usernames, cum_weights=weights)[0],
+            'group': rng.choice(slugs) if slugs and rng.random() < 0.7
+            else None,
+            'text': _text(rng, rng.randint(5, 60)),
+            'pub_date': (
+                now - timedelta(seconds=rng.uniform(0, days * 86400))
+            ).isoformat(),
+            'image': image,
+        }
+    for number in range(comments if posts else 0):
+        yield 'comments', {
+            'id': comment_base + number,
+            'post': post_base + rng.randrange(posts),
+            'author': rng.choice(usernames),
+            'text': _text(rng, rng.randint(3, 20)),
+        }
+    for user, count in zip(usernames, _follow_counts(rng, users, alpha)):
+        authors = set(rng.choices(usernames, cum_weights=weights, k=count))
+        for author in authors - {user}:
+            yield 'follows', {'user': user, 'author': author}
+
+
+def generate(batch_size=1000, **options):
+    """Записывает синтетический набор данных; возвращает число записей."""
+    importer = transfer.Importer(batch_size)
+    for kind, row in dataset_rows(**options):
+        importer.add(kind, row)
+    importer.flush()
+    transfer.reset_sequences()
+    transfer.rebuild_derived()
+    return dict(importer.loaded)
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(share * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _summary(values):
+    return {
+        'min': min(values),
+        'p50': percentile(values, 0.5),
+        'p90': percentile(values, 0.9),
+        'p99': percentile(values, 0.99),
+        'max': max(values),
+        'mean': sum(values) / len(values),
+    }
+
+
+def scenarios(user):
+    """Измеряемые запросы: (имя, метод, адрес, данные)."""
+    post = Post.objects.order_by('-comments_count', '-id').first()
+    group = Group.objects.order_by('-id').first()
+    author = Follow.objects.filter(user=user).select_related('author').first()
+    reads = [('index', 'get', reverse('posts:index'), None)]
+    if group:
+        reads.append(('group_list', 'get', reverse(
+            'posts:group_list', kwargs={'slug': group.slug}
+        ), None))
+    if post:
+        reads += [
+            ('profile', 'get', reverse(
+                'posts:profile', kwargs={'username': post.author.username}
+            ), None),
+            ('post_detail', 'get', reverse(
+                'posts:post_detail', kwargs={'post_id': post.id}
+            ), None),
+        ]
+    reads.append(('follow_index', 'get', reverse('posts:follow_index'), None))
+    writes = [
+        ('post_create', 'post', reverse('posts:post_create'),
+         {'text': 'Замер скорости'}),
+    ]
+    if post:
+        writes.append(('add_comment', 'post', reverse(
+            'posts:add_comment', kwargs={'post_id': post.id}
+        ), {'text': 'Замер скорости'}))
+    if author:
+        username = author.author.username
+        writes += [
+            ('profile_unfollow', 'get', reverse(
+                'posts:profile_unfollow', kwargs={'username': username}
+            ), None),
+            ('profile_follow', 'get', reverse(
+                'posts:profile_follow', kwargs={'username': username}
+            ), None),
+        ]
+    return reads, writes
+
+
+def _measure(client, method, url, data, repeat, warmup, cold):
+    request = getattr(client, method)
+    for _ in range(warmup):
+        request(url, data)
+    latencies, queries = [], []
+    status = None
+    for _ in range(repeat):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = request(url, data)
+            latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(len(context))
+        status = response.status_code
+    tracemalloc.start()
+    request(url, data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'method': method.upper(),
+        'url': url,
+        'status': status,
+        'latency_ms': _summary(latencies),
+        'queries': _summary(queries),
+        'alloc_peak_kib': peak / 1024,
+    }
+
+
+def _user(username=None):
+    users = User.objects.filter(follower__isnull=False)
+    if username:
+        users = User.objects.filter(username=username)
+    user = users.order_by('id').first() or User.objects.order_by('id').first()
+    if user is None:
+        raise ValueError(
+            'В базе нет пользователей: запустите generate_dataset'
+        )
+    return user
+
+
+def run(repeat=20, warmup=2, cold=False, username=None):
+    """Замеряет страницы и запросы на запись; возвращает отчёт."""
+    user = _user(username)
+    client = Client()
+    client.force_login(user)
+    reads, writes = scenarios(user)
+    results = {}
+    for name, method, url, data in reads:
+        results[name] = _measure(
+            client, method, url, data, repeat, warmup, cold
+        )
+    try:
+        with override_settings(WRITE_BEHIND=False), transaction.atomic():
+            for name, method, url, data in writes:
+                results[name] = _measure(
+                    client, method, url, data, repeat, warmup, cold
+                )
+            raise Rollback
+    except Rollback:
+        # В кеше могли остаться ленты с откаченными постами.
+        shared_cache.invalidate('feed:index')
+    return {
+        'meta': {
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'user': user.username,
+            'repeat': repeat,
+            'warmup': warmup,
+            'cold_cache': cold,
+            'dataset': {
+                'users': User.objects.count(),
+                'groups': Group.objects.count(),
+                'posts': Post.objects.count(),
+                'comments': Comment.objects.count(),
+                'follows': Follow.objects.count(),
+            },
+        },
+        'results': results,
+    }
+
+
+def _scope(url, cookie):
+    path, _, query = url.partition('?')
+    return {
+        'type': 'http',
+        'method': 'GET',
+        'path': path,
+        'query_string': query.encode(),
+        'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+    }
+
+
+def _wsgi_request(application, scope):
+    """Код ответа WSGI-приложения; тело читается целиком."""
+    status = []
+
+    def start_response(line, headers, exc_info=None):
+        status.append(int(line.split(' ', 1)[0]))
+        return lambda data: None
+
+    result = application(asgi.environ(scope, BytesIO()), start_response)
+    try:
+        for _ in result:
+            pass
+    finally:
+        result.close()
+    return status[0]
+
+
+def _wsgi_load(application, batches, workers):
+    """Клиенты ждут ответа пула из workers потоков, как у WSGI-сервера."""
+    with ThreadPoolExecutor(workers) as server, \
+            ThreadPoolExecutor(len(batches)) as clients:
+        def client(batch):
+            results = []
+            for scope in batch:
+                started = time.perf_counter()
+                status = server.submit(
+                    _wsgi_request, application, scope
+                ).result()
+                results.append(
+                    ((time.perf_counter() - started) * 1000, status)
+                )
+            return results
+
+        return [
+            result for results in clients.map(client, batches)
+            for result in results
+        ]
+
+
+async def _asgi_request(application, scope):
+    status = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+def _asgi_load(application, batches):
+    async def client(batch):
+        results = []
+        for scope in batch:
+            started = time.perf_counter()
+            status = await _asgi_request(application, scope)
+            results.append(((time.perf_counter() - started) * 1000, status))
+        return results
+
+    async def main():
+        return await asyncio.gather(*(client(batch) for batch in batches))
+
+    return [result for results in asyncio.run(main()) for result in results]
+
+
+def _throughput(load):
+    started = time.perf_counter()
+    results = load()
+    elapsed = time.perf_counter() - started
+    return {
+        'requests_per_second': len(results) / elapsed,
+        'latency_ms': _summary([latency for latency, _ in results]),
+        'errors': sum(status >= 400 for _, status in results),
+    }
+
+
+def concurrency(workers=4, clients=16, total=200, username=None):
+    """Сравнивает WSGI и ASGI при одинаковом числе потоков-обработчиков."""
+    user = _user(username)
+    client = Client()
+    client.force_login(user)
+    cookie = '; '.join(
+        f'{morsel.key}={morsel.value}' for morsel in client.cookies.values()
+    )
+    reads, _ = scenarios(user)
+    urls = [url for _, _, url, _ in reads]
+    scopes = [_scope(urls[number % len(urls)], cookie)
+              for number in range(total)]
+    batches = [scopes[number::clients] for number in range(clients)]
+    handler = WSGIHandler()
+    report = {'workers': workers, 'clients': clients, 'requests': total}
+    report['wsgi'] = _throughput(
+        lambda: _wsgi_load(handler, batches, workers)
+    )
+    with override_settings(CONCURRENT_QUERIES=True):
+        application = asgi.ASGIHandler(handler, workers)
+        try:
+            report['asgi'] = _throughput(
+                lambda: _asgi_load(application, batches)
+            )
+        finally:
+            application.executor.shutdown()
+    return report
@@ -0,0 +1,97 @@
+"""Версии страниц для условных GET-запросов (ETag и Last-Modified).
+
+Версия страницы собирается без выборки постов и рендеринга шаблонов.
+Страницы профиля и группы читают одну строку: хранимые счётчики и номер
+версии (Profile.version, GroupStats.version), который сигналы сдвигают
+при каждом изменении постов, комментариев, имён авторов и групп на
+странице (см. counters.posts_changed). Страница поста берёт агрегаты по
+индексам одного поста. К версии добавляется состояние подписки того,
+кто смотрит страницу. Совпавший If-None-Match даёт ответ 304 до
+выполнения представления.
+
+Last-Modified отдаёт только страница поста: удаление поста из ленты не
+сдвигает ни одну дату, поэтому списки сравниваются только по ETag.
+Удаление комментария тоже не сдвигает дату страницы поста; его
+учитывает ETag, который клиент присылает вместе с If-Modified-Since.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db.models import Max
+
+from core import fragments
+
+from . import syndication, writebehind
+from .models import Follow, Group, Post, User
+
+
+def _etag(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def _viewer(request):
+    # Оболочка одинакова для всех, персональное вынесено во фрагменты.
+    if fragments.is_shell(request):
+        return 0
+    # Отложенные записи пользователя ещё не видны в агрегатах по базе.
+    pending = [entry['id'] for entry in writebehind.pending(request)]
+    return request.user.pk or 0, pending
+
+
+def _post_state(post_id):
+    return Post.objects.filter(pk=post_id).values(
+        'edited', 'comments_count',
+        'author__username', 'author__first_name', 'author__last_name',
+        'author__profile__posts_count', 'group__title', 'group__slug',
+    ).annotate(last_comment=Max('comments__id')).first()
+
+
+def post_detail_etag(request, post_id):
+    state = _post_state(post_id)
+    if state is None:
+        return None
+    return _etag(sorted(state.items()), _viewer(request))
+
+
+def post_detail_last_modified(request, post_id):
+    state = Post.objects.filter(pk=post_id).values('edited').annotate(
+        last_comment=Max('comments__created')
+    ).first()
+    if state is None:
+        return None
+    return max(filter(None, state.values()))
+
+
+def profile_etag(request, username):
+    author = User.objects.filter(username=username).values(
+        'id', 'first_name', 'last_name', 'profile__posts_count',
+        'profile__followers_count', 'profile__following_count',
+        'profile__version',
+    ).first()
+    if author is None or author['profile__version'] is None:
+        return None
+    following = (
+        not fragments.is_shell(request)
+        and request.user.is_authenticated
+        and Follow.objects.filter(
+            user=request.user, author_id=author['id']
+        ).exists()
+    )
+    return _etag(sorted(author.items()), _viewer(request), following)
+
+
+def group_list_etag(request, slug):
+    group = Group.objects.filter(slug=slug).values(
+        'id', 'title', 'description', 'stats__posts_count', 'stats__version'
+    ).first()
+    if group is None or group['stats__version'] is None:
+        return None
+    return _etag(sorted(group.items()), _viewer(request))
+
+
+def syndication_etag(request, kind, slug=None, username=None):
+    # Лента одинакова для всех: зритель в версию не входит.
+    rows = syndication.posts(slug, username).values_list('id', 'edited')
+    return _etag(kind, slug, username, list(
+        rows[:settings.SYNDICATION_ITEMS]
+    ))
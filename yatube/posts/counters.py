@@ -0,0 +1,121 @@
+"""Хранимые счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарным UPDATE ... SET x = x + 1 в той же транзакции,
+что и запись, которую они считают. reconcile() пересчитывает их по
+таблицам и исправляет расхождения.
+
+Версии страниц профиля и группы (поле version) растут так же при каждом
+изменении того, что на этих страницах видно; вместе со счётчиками они
+дают ETag без агрегатов по постам и комментариям.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import (
+    Comment, Follow, GroupAuthor, GroupStats, Post, Profile, User
+)
+
+
+def _shift(queryset, field, delta):
+    queryset.update(**{field: F(field) + delta})
+
+
+def ensure_profile(user):
+    Profile.objects.get_or_create(user=user)
+
+
+def post_added(author_id, delta=1):
+    _shift(Profile.objects.filter(user_id=author_id), 'posts_count', delta)
+
+
+def comment_added(post_id, delta=1):
+    _shift(Post.objects.filter(id=post_id), 'comments_count', delta)
+
+
+def follow_added(user_id, author_id, delta=1):
+    _shift(Profile.objects.filter(user_id=user_id), 'following_count', delta)
+    _shift(Profile.objects.filter(user_id=author_id), 'followers_count', delta)
+
+
+def posts_changed(author_ids, group_ids):
+    """Сдвигает версии страниц авторов и групп изменившихся постов."""
+    _shift(Profile.objects.filter(user_id__in=set(author_ids)), 'version', 1)
+    group_ids = set(group_ids) - {None}
+    if group_ids:
+        _shift(
+            GroupStats.objects.filter(group_id__in=group_ids), 'version', 1
+        )
+
+
+def posts_touched(post_ids):
+    """То же по id постов: правка поста, комментарии, миниатюры."""
+    posts = list(Post.objects.filter(id__in=set(post_ids)).values_list(
+        'author_id', 'group_id'
+    ))
+    posts_changed(
+        (author_id for author_id, _ in posts),
+        (group_id for _, group_id in posts),
+    )
+
+
+def group_changed(group_id):
+    """Название и адрес группы видны в постах на страницах её авторов."""
+    _shift(Profile.objects.filter(user_id__in=GroupAuthor.objects.filter(
+        group_id=group_id
+    ).values('author_id')), 'version', 1)
+
+
+def author_changed(author_id):
+    """Имя автора видно в его постах на страницах групп."""
+    _shift(GroupStats.objects.filter(group_id__in=GroupAuthor.objects.filter(
+        author_id=author_id
+    ).values('group_id')), 'version', 1)
+
+
+def _count(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def reconcile():
+    """Пересчитывает счётчики и возвращает число исправленных строк."""
+    missing = User.objects.filter(profile__isnull=True)
+    Profile.objects.bulk_create(Profile(user=user) for user in missing)
+    drifted_profiles = list(
+        Profile.objects.annotate(
+            actual_posts=_count(Post.objects, 'author'),
+            actual_followers=_count(Follow.objects, 'author'),
+            actual_following=_count(Follow.objects, 'user'),
+        ).exclude(
+            posts_count=F('actual_posts'),
+            followers_count=F('actual_followers'),
+            following_count=F('actual_following'),
+        ).values_list(
+            'pk', 'actual_posts', 'actual_followers', 'actual_following'
+        )
+    )
+    for pk, posts, followers, following in drifted_profiles:
+        Profile.objects.filter(pk=pk).update(
+            posts_count=posts,
+            followers_count=followers,
+            following_count=following,
+        )
+    drifted_posts = list(
+        Post.objects.annotate(
+            actual_comments=_count(Comment.objects, 'post')
+        ).exclude(
+            comments_count=F('actual_comments')
+        ).values_list('pk', 'actual_comments')
+    )
+    for pk, comments in drifted_posts:
+        Post.objects.filter(pk=pk).update(comments_count=comments)
+    return len(drifted_profiles) + len(drifted_posts)
@@ -0,0 +1,116 @@
+"""Каталог групп с хранимой статистикой.
+
+Для каждой группы в GroupStats хранятся число постов, время последнего
+поста и самые активные авторы, а в GroupAuthor — число постов каждого
+автора группы. Сигналы сохранения и удаления поста меняют только
+строки затронутых групп: создание поста и перенос в другую группу
+(post_create, post_edit, правка группы в списке постов админки) — это
+атомарные UPDATE ... SET x = x + 1 и выборка первых авторов группы по
+индексу. Поэтому страница каталога читает одну таблицу одним запросом
+и листается по курсору в любой сортировке из ORDERINGS.
+
+Смена имени пользователя обновляет списки авторов его групп. Время
+активности при удалении поста не откатывается. rebuild()
+пересчитывает каталог целиком после импорта и при расхождениях.
+"""
+import json
+
+from django.conf import settings
+from django.db.models import Count, DateTimeField, F, Max, Value
+from django.db.models.functions import Greatest
+
+from .models import Group, GroupAuthor, GroupStats, Post
+
+# Сортировки каталога: последнее поле ключа уникально.
+ORDERINGS = {
+    'title': ('title', 'group'),
+    'posts': ('-posts_count', 'group'),
+    'activity': ('-last_activity', 'group'),
+}
+
+
+def ensure_stats(group):
+    """Создаёт строку каталога группы или обновляет её название."""
+    GroupStats.objects.update_or_create(
+        group=group, defaults={'title': group.title}
+    )
+
+
+def _top_authors(group_id):
+    authors = GroupAuthor.objects.filter(
+        group_id=group_id, posts_count__gt=0
+    ).order_by('-posts_count', 'author_id').values_list(
+        'author__username', 'posts_count'
+    )[:settings.GROUP_TOP_AUTHORS]
+    return json.dumps(
+        [{'username': name, 'posts': posts} for name, posts in authors],
+        ensure_ascii=False,
+    )
+
+
+def post_added(group_id, author_id, delta=1, when=None):
+    """Учитывает пост автора в группе; delta=-1 — пост ушёл из группы."""
+    if group_id is None:
+        return
+    if delta > 0:
+        GroupAuthor.objects.bulk_create(
+            [GroupAuthor(group_id=group_id, author_id=author_id)],
+            ignore_conflicts=True,
+        )
+    GroupAuthor.objects.filter(
+        group_id=group_id, author_id=author_id
+    ).update(posts_count=F('posts_count') + delta)
+    changes = {
+        'posts_count': F('posts_count') + delta,
+        'top_authors': _top_authors(group_id),
+    }
+    if when is not None:
+        changes['last_activity'] = Greatest(
+            'last_activity', Value(when, output_field=DateTimeField())
+        )
+    GroupStats.objects.filter(group_id=group_id).update(**changes)
+
+
+def author_renamed(author_id):
+    """Обновляет имена в списках активных авторов групп автора."""
+    groups = GroupAuthor.objects.filter(
+        author_id=author_id, posts_count__gt=0
+    ).values_list('group_id', flat=True)
+    for group_id in groups:
+        GroupStats.objects.filter(group_id=group_id).update(
+            top_authors=_top_authors(group_id)
+        )
+
+
+def post_moved(author_id, old_group_id, new_group_id, when):
+    if old_group_id == new_group_id:
+        return
+    post_added(old_group_id, author_id, -1)
+    post_added(new_group_id, author_id, when=when)
+
+
+def rebuild():
+    """Пересчитывает каталог по таблице постов; возвращает число групп."""
+    GroupAuthor.objects.all().delete()
+    GroupAuthor.objects.bulk_create(
+        GroupAuthor(
+            group_id=row['group'], author_id=row['author'],
+            posts_count=row['total'],
+        )
+        for row in Post.objects.filter(group__isnull=False).order_by()
+        .values('group', 'author').annotate(total=Count('pk')).iterator()
+    )
+    groups = Group.objects.annotate(
+        total=Count('posts'), last=Max('posts__pub_date')
+    ).select_related('stats')
+    rebuilt = 0
+    for group in groups.iterator():
+        stats = getattr(group, 'stats', None) or GroupStats(group=group)
+        stats.title = group.title
+        stats.posts_count = group.total
+        if group.last is not None:
+            stats.last_activity = group.last
+        stats.top_authors = _top_authors(group.pk)
+        stats.save()
+        rebuilt += 1
+    return rebuilt
@@ -0,0 +1,38 @@
+"""Персональные фрагменты страниц постов и профилей."""
+from django.shortcuts import get_object_or_404
+
+from core import fragments
+from . import graph, writebehind
+from .forms import CommentForm
+from .models import Follow, Post, User
+
+
+@fragments.register(
+    'follow',
+    'includes/fragments/follow.html',
+    lookup=lambda username: get_object_or_404(User, username=username),
+    key=lambda author: author.username,
+)
+def follow(request, author):
+    following = writebehind.pending_following(request, author.id)
+    if following is None:
+        following = request.user.is_authenticated and Follow.objects.filter(
+            user=request.user, author=author
+        ).exists()
+    mutual = following and graph.is_mutual(request.user.id, author.id)
+    return {'author': author, 'following': following, 'mutual': mutual}
+
+
+@fragments.register(
+    'post_actions',
+    'includes/fragments/post_actions.html',
+    lookup=lambda post_id: get_object_or_404(Post, pk=post_id),
+    key=lambda post: post.pk,
+)
+def post_actions(request, post):
+    return {'post': post, 'form': CommentForm()}
+
+
+@fragments.register('switcher', 'includes/switcher.html')
+def switcher(request):
+    return {}
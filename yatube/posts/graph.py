@@ -0,0 +1,295 @@
+"""Граф подписок в памяти процесса.
+
+Подписки хранятся сжатыми списками смежности (CSR) в массивах модуля
+array: для пользователя u его авторы — targets[offsets[u]:offsets[u+1]]
+в порядке возрастания id, так что проверка подписки — двоичный поиск, а
+весь граф занимает около 8 байт на подписку в каждую сторону. Граф
+строится двумя выборками пар из Follow, упорядоченными индексами
+(user, author) и (author, user).
+
+Изменения после построения копятся в небольшом наложении поверх
+массивов; когда оно превышает FOLLOW_GRAPH_OVERLAY, массивы
+пересобираются в памяти. Чтобы графы всех процессов сходились, каждая
+подписка и отписка после фиксации транзакции записывается в журнал в
+общем кеше: счётчик graph:version и записи graph:log:<n>. Перед ответом
+процесс применяет записи, которых ещё не видел. Если записи уже
+вытеснены из кеша или кеш очищен, граф строится заново из базы; так же
+раз в FOLLOW_GRAPH_REBUILD секунд, на случай потерянных записей (у
+файлового кеша incr не атомарен).
+"""
+import heapq
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Follow
+
+VERSION_KEY = 'graph:version'
+LOG_KEY = 'graph:log'
+
+_lock = threading.Lock()
+_graph = None
+_graph_key = None
+_seen = 0
+_built = 0
+
+
+class Adjacency:
+    """Списки смежности в формате CSR."""
+
+    def __init__(self, pairs, size):
+        """pairs — пары (вершина, сосед), упорядоченные по обоим полям."""
+        nodes = array('q', map(itemgetter(0), pairs))
+        self.targets = array('q', map(itemgetter(1), pairs))
+        self.offsets = array(
+            'q', (bisect_left(nodes, node) for node in range(size + 1))
+        )
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def row(self, node):
+        if not 0 <= node < len(self):
+            return self.targets[0:0]
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def degree(self, node):
+        if not 0 <= node < len(self):
+            return 0
+        return self.offsets[node + 1] - self.offsets[node]
+
+    def __contains__(self, pair):
+        node, target = pair
+        if not 0 <= node < len(self):
+            return False
+        start, end = self.offsets[node], self.offsets[node + 1]
+        position = bisect_left(self.targets, target, start, end)
+        return position < end and self.targets[position] == target
+
+
+class FollowGraph:
+    """Подписки: following — авторы пользователя, followers — подписчики."""
+
+    def __init__(self, following, followers):
+        """Упорядоченные пары (user, author) и (author, user)."""
+        size = 1 + max(
+            (pairs[-1][0] for pairs in (following, followers) if pairs),
+            default=0,
+        )
+        self.following = Adjacency(following, size)
+        self.followers = Adjacency(followers, size)
+        self.added = set()
+        self.removed = set()
+        self.added_following = defaultdict(set)
+        self.added_followers = defaultdict(set)
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        return cls(
+            sorted(pairs), sorted((author, user) for user, author in pairs)
+        )
+
+    @classmethod
+    def load(cls):
+        """Граф из базы; порядок пар дают индексы Follow."""
+        follows = Follow.objects.all()
+        return cls(
+            list(follows.order_by('user', 'author').values_list(
+                'user', 'author'
+            )),
+            list(follows.order_by('author', 'user').values_list(
+                'author', 'user'
+            )),
+        )
+
+    def pairs(self):
+        for user in range(len(self.following)):
+            for author in self.following.row(user):
+                if (user, author) not in self.removed:
+                    yield user, author
+        yield from self.added
+
+    def is_following(self, user, author):
+        pair = (user, author)
+        if pair in self.added:
+            return True
+        return pair not in self.removed and pair in self.following
+
+    def is_mutual(self, user, author):
+        return (
+            self.is_following(user, author)
+            and self.is_following(author, user)
+        )
+
+    def _neighbours(self, adjacency, added, node, reverse):
+        result = [
+            other for other in adjacency.row(node)
+            if ((other, node) if reverse else (node, other))
+            not in self.removed
+        ]
+        if added.get(node):
+            result = sorted(set(result) | added[node])
+        return result
+
+    def following_of(self, user):
+        return self._neighbours(
+            self.following, self.added_following, user, reverse=False
+        )
+
+    def followers_of(self, author):
+        return self._neighbours(
+            self.followers, self.added_followers, author, reverse=True
+        )
+
+    def followers_count(self, author):
+        removed = sum(
+            1 for user in self.followers.row(author)
+            if (user, author) in self.removed
+        ) if self.removed else 0
+        return (
+            self.followers.degree(author) - removed
+            + len(self.added_followers.get(author, ()))
+        )
+
+    def add(self, user, author):
+        pair = (user, author)
+        if pair in self.removed:
+            self.removed.discard(pair)
+        elif pair not in self.following:
+            self.added.add(pair)
+            self.added_following[user].add(author)
+            self.added_followers[author].add(user)
+
+    def remove(self, user, author):
+        pair = (user, author)
+        if pair in self.added:
+            self.added.discard(pair)
+            self.added_following[user].discard(author)
+            self.added_followers[author].discard(user)
+        elif pair in self.following:
+            self.removed.add(pair)
+
+    @property
+    def overlay(self):
+        return len(self.added) + len(self.removed)
+
+    def compact(self):
+        """Новый граф с наложением, перенесённым в массивы."""
+        return FollowGraph.from_pairs(list(self.pairs()))
+
+    def suggestions(self, user, limit):
+        """Авторы, на которых подписаны авторы пользователя.
+
+        Чем больше общих знакомых, тем выше; при равенстве — у кого
+        больше подписчиков.
+        """
+        following = self.following_of(user)
+        seen = set(following)
+        seen.add(user)
+        votes = Counter()
+        for author in following[:settings.FOLLOW_GRAPH_FANOUT]:
+            votes.update(
+                other for other in self.following_of(author)
+                if other not in seen
+            )
+        return heapq.nsmallest(
+            limit,
+            votes,
+            key=lambda other: (
+                -votes[other], -self.followers_count(other), other
+            ),
+        )
+
+
+def _build():
+    global _graph, _graph_key, _seen, _built
+    cache.add(VERSION_KEY, 0, None)
+    # Версия читается до выборки: записи до неё уже в базе.
+    _seen = cache.get(VERSION_KEY) or 0
+    _graph = FollowGraph.load()
+    _graph_key = (os.getpid(), settings.DATABASES['default']['NAME'])
+    _built = time.monotonic()
+
+
+def _sync():
+    """Граф процесса с применёнными записями журнала."""
+    global _graph, _seen
+    version = cache.get(VERSION_KEY)
+    if (
+        _graph is None
+        or _graph_key != (os.getpid(), settings.DATABASES['default']['NAME'])
+        or version is None
+        or version < _seen
+        or time.monotonic() - _built > settings.FOLLOW_GRAPH_REBUILD
+    ):
+        _build()
+        return _graph
+    if version > _seen:
+        numbers = range(_seen + 1, version + 1)
+        keys = [f'{LOG_KEY}:{number}' for number in numbers]
+        entries = cache.get_many(keys)
+        if len(entries) != len(keys):
+            _build()
+            return _graph
+        for key in keys:
+            op, user, author = entries[key]
+            if op == 'follow':
+                _graph.add(user, author)
+            else:
+                _graph.remove(user, author)
+        _seen = version
+        if _graph.overlay > settings.FOLLOW_GRAPH_OVERLAY:
+            _graph = _graph.compact()
+    return _graph
+
+
+def _publish(op, user_id, author_id):
+    cache.add(VERSION_KEY, 0, None)
+    try:
+        number = cache.incr(VERSION_KEY)
+    except ValueError:
+        # Счётчик вытеснен: процессы заметят это и перестроят граф.
+        return
+    cache.set(
+        f'{LOG_KEY}:{number}',
+        (op, user_id, author_id),
+        settings.FOLLOW_GRAPH_LOG_TIMEOUT,
+    )
+
+
+def follow_added(user_id, author_id):
+    transaction.on_commit(lambda: _publish('follow', user_id, author_id))
+
+
+def follow_removed(user_id, author_id):
+    transaction.on_commit(lambda: _publish('unfollow', user_id, author_id))
+
+
+def following(user_id):
+    with _lock:
+        return _sync().following_of(user_id)
+
+
+def followers(author_id):
+    with _lock:
+        return _sync().followers_of(author_id)
+
+
+def is_mutual(user_id, author_id):
+    with _lock:
+        return _sync().is_mutual(user_id, author_id)
+
+
+def suggestions(user_id, limit=None):
+    with _lock:
+        return _sync().suggestions(
+            user_id, limit or settings.FOLLOW_SUGGESTIONS
+        )
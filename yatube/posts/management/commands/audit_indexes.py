@@ -0,0 +1,77 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+
+# Признаки плана без подходящего индекса для разных СУБД.
+WARNINGS = {
+    'sqlite': [
+        (re.compile(r'\bSCAN (TABLE )?\w+(?!.*\bUSING\b)'),
+         'полный просмотр таблицы'),
+        (re.compile(r'USE TEMP B-TREE'), 'сортировка во временном B-дереве'),
+    ],
+    'postgresql': [
+        (re.compile(r'Seq Scan'), 'полный просмотр таблицы'),
+        (re.compile(r'^\s*(->\s*)?Sort\b', re.M), 'сортировка без индекса'),
+    ],
+    'mysql': [
+        (re.compile(r'\bALL\b'), 'полный просмотр таблицы'),
+        (re.compile(r'Using filesort'), 'сортировка без индекса'),
+    ],
+}
+
+
+def hot_queries():
+    """Запросы горячих путей представлений с образцами параметров."""
+    user = User.objects.order_by('id').first()
+    group = Group.objects.order_by('id').first()
+    post = Post.objects.order_by('id').first()
+    user_id = user.id if user else 1
+    group_id = group.id if group else 1
+    post_id = post.id if post else 1
+    return {
+        'index': Post.objects.feed()[:10],
+        'group_list': Post.objects.feed().filter(group_id=group_id)[:10],
+        'profile': Post.objects.feed().filter(author_id=user_id)[:10],
+        'follow_index': TimelineEntry.objects.filter(
+            user_id=user_id
+        ).order_by('-pub_date', '-id')[:10],
+        'post_detail:comments': Comment.objects.filter(
+            post_id=post_id
+        ).order_by('-created', '-id')[:10],
+        'profile:following': Follow.objects.filter(
+            user_id=user_id, author_id=user_id
+        ),
+        'profile:followers': Follow.objects.filter(author_id=user_id),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN для запросов представлений и сообщает '
+        'о полных просмотрах таблиц и сортировках без индекса.'
+    )
+
+    def handle(self, *args, **options):
+        warnings = WARNINGS.get(connection.vendor, [])
+        problems = 0
+        for name, queryset in hot_queries().items():
+            plan = queryset.explain()
+            found = [
+                message for pattern, message in warnings
+                if pattern.search(plan)
+            ]
+            if found:
+                problems += 1
+                self.stdout.write(self.style.WARNING(
+                    f'{name}: {", ".join(found)}'
+                ))
+            else:
+                self.stdout.write(f'{name}: OK')
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+        if problems:
+            raise CommandError(f'Запросов с проблемным планом: {problems}')
+        self.stdout.write(self.style.SUCCESS('Все запросы используют индексы'))
@@ -0,0 +1,73 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа, число запросов к базе и память для лент, '
+        'страниц постов и запросов на запись; отчёт пишется в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым запросом.'
+        )
+        parser.add_argument(
+            '--user', help='От чьего имени выполнять запросы.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=0,
+            help='Число параллельных клиентов для сравнения WSGI и ASGI '
+                 '(0 — не сравнивать).'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Число потоков-обработчиков сервера при сравнении.'
+        )
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл отчёта, «-» — стандартный вывод.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            report = benchmark.run(
+                repeat=options['repeat'],
+                warmup=options['warmup'],
+                cold=options['cold'],
+                username=options['user'],
+            )
+            if options['concurrency']:
+                report['concurrency'] = benchmark.concurrency(
+                    workers=options['workers'],
+                    clients=options['concurrency'],
+                    total=options['requests'],
+                    username=options['user'],
+                )
+        except ValueError as error:
+            raise CommandError(error)
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+        with open(options['output'], 'w', encoding='utf-8') as stream:
+            json.dump(report, stream, ensure_ascii=False, indent=2)
+        for name, result in report['results'].items():
+            self.stdout.write(
+                f"{name}: p50 {result['latency_ms']['p50']:.1f} мс, "
+                f"p99 {result['latency_ms']['p99']:.1f} мс, "
+                f"запросов {result['queries']['max']}"
+            )
+        if 'concurrency' in report:
+            for name in ('wsgi', 'asgi'):
+                result = report['concurrency'][name]
+                self.stdout.write(
+                    f"{name}: {result['requests_per_second']:.1f} запр./с, "
+                    f"p99 {result['latency_ms']['p99']:.1f} мс"
+                )
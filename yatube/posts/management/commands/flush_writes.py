@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import writebehind
+
+
+class Command(BaseCommand):
+    help = (
+        'Применяет отложенные комментарии и подписки из журналов '
+        'завершившихся процессов (например, после сбоя сервера).'
+    )
+
+    def handle(self, *args, **options):
+        total = writebehind.recover() + writebehind.flush()
+        self.stdout.write(self.style.SUCCESS(f'Применено журналов: {total}'))
@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает выгрузку export_posts пачками через bulk_create и '
+        'пересчитывает счётчики, ленты и поисковый индекс.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл выгрузки, «-» — стандартный ввод.'
+        )
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'),
+            help='По умолчанию определяется по расширению файла.'
+        )
+        parser.add_argument(
+            '--kind', choices=transfer.KINDS,
+            help='Вид записей в CSV-файле.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--skip-rebuild', action='store_true',
+            help=(
+                'Не пересчитывать счётчики, ленты и поисковый индекс; '
+                'профили и каталог групп создаются всегда.'
+            )
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'ndjson'
+        )
+        if file_format == 'csv' and not options['kind']:
+            raise CommandError('Для CSV укажите --kind.')
+        if path != '-' and not os.path.exists(path):
+            raise CommandError(f'Файл не найден: {path}')
+        stream = sys.stdin if path == '-' else open(
+            path, encoding='utf-8', newline=''
+        )
+        importer = transfer.Importer(options['batch_size'])
+        started = time.monotonic()
+        try:
+            if file_format == 'csv':
+                rows = transfer.read_csv(stream, options['kind'])
+            else:
+                rows = transfer.read_ndjson(stream)
+            for kind, row in rows:
+                importer.add(kind, row)
+            importer.flush()
+        except (ValueError, KeyError) as error:
+            raise CommandError(f'Неверная запись в выгрузке: {error}')
+        except IntegrityError as error:
+            raise CommandError(f'Запись появилась в базе во время загрузки: '
+                               f'{error}')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        transfer.reset_sequences()
+        elapsed = max(time.monotonic() - started, 1e-6)
+        for kind in transfer.KINDS:
+            if importer.loaded[kind] or importer.skipped[kind]:
+                conflicts = importer.conflicts[kind]
+                self.stdout.write(
+                    f'{kind}: {importer.loaded[kind]} '
+                    f'(пропущено {importer.skipped[kind]}'
+                    + (f', уже есть в базе {conflicts}' if conflicts else '')
+                    + ')'
+                )
+        total = sum(importer.loaded.values())
+        self.stdout.write(
+            f'Загружено записей: {total} за {elapsed:.1f} с '
+            f'({total / elapsed:.0f} в секунду)'
+        )
+        if not options['skip_rebuild']:
+            started = time.monotonic()
+            transfer.rebuild_derived()
+            self.stdout.write(
+                f'Счётчики, ленты и поиск пересчитаны за '
+                f'{time.monotonic() - started:.1f} с'
+            )
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена'))
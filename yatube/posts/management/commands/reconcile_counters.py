@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters, directory
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает хранимые счётчики постов, комментариев и подписок '
+        'и каталог групп.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = counters.reconcile()
+            groups = directory.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Исправлено счётчиков: {fixed}'))
+        self.stdout.write(self.style.SUCCESS(f'Групп в каталоге: {groups}'))
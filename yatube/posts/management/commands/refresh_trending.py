@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рейтинг популярных постов и групп в общем кеше; '
+        'запускается по расписанию, например из cron.'
+    )
+
+    def handle(self, *args, **options):
+        ranking = trending.refresh()
+        self.stdout.write(self.style.SUCCESS(
+            f"Постов: {len(ranking['posts'])}, "
+            f"групп: {len(ranking['groups'])}"
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='renditions',
+            field=models.TextField(blank=True, editable=False, help_text='JSON с источниками srcset для тега picture', verbose_name='Варианты картинки'),
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+SQLITE_FTS = [
+    """CREATE VIRTUAL TABLE posts_searchdocument_fts USING fts5(
+        body, content='posts_searchdocument', content_rowid='id'
+    )""",
+    """CREATE TRIGGER posts_searchdocument_ai
+    AFTER INSERT ON posts_searchdocument BEGIN
+        INSERT INTO posts_searchdocument_fts(rowid, body)
+        VALUES (new.id, new.body);
+    END""",
+    """CREATE TRIGGER posts_searchdocument_ad
+    AFTER DELETE ON posts_searchdocument BEGIN
+        INSERT INTO posts_searchdocument_fts(
+            posts_searchdocument_fts, rowid, body
+        ) VALUES ('delete', old.id, old.body);
+    END""",
+    """CREATE TRIGGER posts_searchdocument_au
+    AFTER UPDATE ON posts_searchdocument BEGIN
+        INSERT INTO posts_searchdocument_fts(
+            posts_searchdocument_fts, rowid, body
+        ) VALUES ('delete', old.id, old.body);
+        INSERT INTO posts_searchdocument_fts(rowid, body)
+        VALUES (new.id, new.body);
+    END""",
+]
+
+SQLITE_FTS_DROP = [
+    'DROP TRIGGER IF EXISTS posts_searchdocument_au',
+    'DROP TRIGGER IF EXISTS posts_searchdocument_ad',
+    'DROP TRIGGER IF EXISTS posts_searchdocument_ai',
+    'DROP TABLE IF EXISTS posts_searchdocument_fts',
+]
+
+POSTGRESQL_FTS = [
+    """CREATE INDEX posts_searchdocument_tsv
+    ON posts_searchdocument
+    USING GIN (to_tsvector('simple', body))""",
+]
+
+POSTGRESQL_FTS_DROP = [
+    'DROP INDEX IF EXISTS posts_searchdocument_tsv',
+]
+
+
+def sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        options = {row[0] for row in cursor.fetchall()}
+    return 'ENABLE_FTS5' in options
+
+
+def create_fulltext_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite' and sqlite_has_fts5(connection):
+        statements = SQLITE_FTS
+    elif connection.vendor == 'postgresql':
+        statements = POSTGRESQL_FTS
+    else:
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    statements = {
+        'sqlite': SQLITE_FTS_DROP,
+        'postgresql': POSTGRESQL_FTS_DROP,
+    }.get(schema_editor.connection.vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('comment', 'Комментарий')], max_length=10, verbose_name='Тип')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Идентификатор объекта')),
+                ('body', models.TextField(verbose_name='Основы слов')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Поисковый документ',
+                'verbose_name_plural': 'Поисковые документы',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchdocument',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='one_search_document'),
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
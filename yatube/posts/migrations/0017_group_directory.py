@@ -0,0 +1,109 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:46
+
+import json
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def fill_directory(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    GroupAuthor = apps.get_model('posts', 'GroupAuthor')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    Post = apps.get_model('posts', 'Post')
+    GroupAuthor.objects.bulk_create(
+        GroupAuthor(
+            group_id=row['group'], author_id=row['author'],
+            posts_count=row['total'],
+        )
+        for row in Post.objects.filter(group__isnull=False).order_by()
+        .values('group', 'author').annotate(total=models.Count('pk'))
+    )
+    for group in Group.objects.annotate(
+        total=models.Count('posts'), last=models.Max('posts__pub_date')
+    ).iterator():
+        authors = GroupAuthor.objects.filter(group=group).order_by(
+            '-posts_count', 'author_id'
+        ).values_list('author__username', 'posts_count')
+        GroupStats.objects.create(
+            group=group,
+            title=group.title,
+            posts_count=group.total,
+            last_activity=group.last or django.utils.timezone.now(),
+            top_authors=json.dumps(
+                [
+                    {'username': name, 'posts': posts}
+                    for name, posts in authors[:settings.GROUP_TOP_AUTHORS]
+                ],
+                ensure_ascii=False,
+            ),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0016_searchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupAuthor',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+            ],
+            options={
+                'verbose_name': 'Автор группы',
+                'verbose_name_plural': 'Авторы групп',
+            },
+        ),
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Group', verbose_name='Группа')),
+                ('title', models.CharField(max_length=200, verbose_name='Название')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('last_activity', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Последняя активность')),
+                ('top_authors', models.TextField(default='[]', editable=False, verbose_name='Активные авторы')),
+            ],
+            options={
+                'verbose_name': 'Статистика группы',
+                'verbose_name_plural': 'Статистика групп',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='groupstats',
+            index=models.Index(fields=['title', 'group'], name='groupstats_title'),
+        ),
+        migrations.AddIndex(
+            model_name='groupstats',
+            index=models.Index(fields=['-posts_count', 'group'], name='groupstats_posts'),
+        ),
+        migrations.AddIndex(
+            model_name='groupstats',
+            index=models.Index(fields=['-last_activity', 'group'], name='groupstats_activity'),
+        ),
+        migrations.AddField(
+            model_name='groupauthor',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.AddField(
+            model_name='groupauthor',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='author_stats', to='posts.Group', verbose_name='Группа'),
+        ),
+        migrations.AddIndex(
+            model_name='groupauthor',
+            index=models.Index(fields=['group', '-posts_count'], name='groupauthor_posts'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupauthor',
+            constraint=models.UniqueConstraint(fields=('group', 'author'), name='unique_group_author'),
+        ),
+        migrations.RunPython(fill_directory, migrations.RunPython.noop),
+    ]
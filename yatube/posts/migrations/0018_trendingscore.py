@@ -0,0 +1,35 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_group_directory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('author', 'Автор'), ('group', 'Группа')], max_length=10, verbose_name='Тип')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Идентификатор объекта')),
+                ('era', models.PositiveIntegerField(default=0, verbose_name='Эпоха')),
+                ('score', models.FloatField(default=0, verbose_name='Счёт')),
+            ],
+            options={
+                'verbose_name': 'Счёт популярности',
+                'verbose_name_plural': 'Счета популярности',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trendingscore',
+            index=models.Index(fields=['kind', 'era', '-score'], name='trending_kind_score'),
+        ),
+        migrations.AddConstraint(
+            model_name='trendingscore',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='one_trending_score'),
+        ),
+    ]
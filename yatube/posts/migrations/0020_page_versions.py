@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_explicit_dates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupstats',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия страницы'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия страницы'),
+        ),
+    ]
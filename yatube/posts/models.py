@@ -1,5 +1,10 @@
+import hashlib
+import json
+
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.functional import cached_property
 
 User = get_user_model()
 
@@ -22,9 +27,140 @@ class Group(models.Model):
         return self.title
 
 
+class Profile(models.Model):
+    """Профиль автора с хранимыми счётчиками."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    # Растёт при каждом изменении постов и комментариев на странице автора.
+    version = models.PositiveIntegerField(
+        'Версия страницы', default=0, editable=False
+    )
+
+    class Meta:
+        verbose_name = 'Профиль'
+        verbose_name_plural = 'Профили'
+
+    def __str__(self):
+        return f'Профиль: {self.user}'
+
+
+class GroupStats(models.Model):
+    """Строка каталога групп с хранимой статистикой.
+
+    Название копируется из группы, чтобы каталог сортировался и
+    листался по индексам одной таблицы.
+    """
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Группа',
+    )
+    title = models.CharField('Название', max_length=200)
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    last_activity = models.DateTimeField(
+        'Последняя активность', default=timezone.now
+    )
+    top_authors = models.TextField(
+        'Активные авторы', default='[]', editable=False
+    )
+    # Растёт при каждом изменении постов, комментариев и авторов группы.
+    version = models.PositiveIntegerField(
+        'Версия страницы', default=0, editable=False
+    )
+
+    class Meta:
+        verbose_name = 'Статистика группы'
+        verbose_name_plural = 'Статистика групп'
+        indexes = [
+            models.Index(
+                fields=['title', 'group'],
+                name='groupstats_title',
+            ),
+            models.Index(
+                fields=['-posts_count', 'group'],
+                name='groupstats_posts',
+            ),
+            models.Index(
+                fields=['-last_activity', 'group'],
+                name='groupstats_activity',
+            ),
+        ]
+
+    def __str__(self):
+        return f'Статистика: {self.title}'
+
+    @cached_property
+    def authors(self):
+        """Самые активные авторы группы: [{'username', 'posts'}, ...]."""
+        return json.loads(self.top_authors)
+
+
+class GroupAuthor(models.Model):
+    """Число постов автора в группе для выбора активных авторов."""
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='author_stats',
+        verbose_name='Группа',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+
+    class Meta:
+        verbose_name = 'Автор группы'
+        verbose_name_plural = 'Авторы групп'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['group', 'author'],
+                name='unique_group_author',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['group', '-posts_count'],
+                name='groupauthor_posts',
+            ),
+        ]
+
+
+class PostQuerySet(models.QuerySet):
+    # Поля, которые выводит карточка поста в лентах.
+    FEED_FIELDS = (
+        'id', 'text', 'pub_date', 'edited', 'image', 'comments_count',
+        'thumbnail_url', 'thumbnail_width', 'thumbnail_height', 'renditions',
+        'author__id', 'author__username',
+        'author__first_name', 'author__last_name',
+        'group__id', 'group__title', 'group__slug',
+    )
+
+    def feed(self):
+        """Посты для лент: автор и группа одним JOIN, только нужные поля."""
+        return self.select_related('author', 'group').only(
+            *self.FEED_FIELDS
+        ).order_by('-pub_date', '-id')
+
+
 class Post(models.Model):
     text = models.TextField('Текст', help_text='Введите текст поста')
-    pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    # Не auto_now_add: загрузка и отложенная запись задают дату сами.
+    pub_date = models.DateTimeField(
+        'Дата публикации', default=timezone.now, editable=False
+    )
+    edited = models.DateTimeField('Дата изменения', auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -46,14 +182,81 @@ class Post(models.Model):
         blank=True
     )
 
+    thumbnail_url = models.CharField(
+        'Адрес миниатюры',
+        max_length=255,
+        blank=True,
+        editable=False,
+    )
+    thumbnail_width = models.PositiveIntegerField(
+        'Ширина миниатюры',
+        null=True,
+        editable=False,
+    )
+    thumbnail_height = models.PositiveIntegerField(
+        'Высота миниатюры',
+        null=True,
+        editable=False,
+    )
+    renditions = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        editable=False,
+        help_text='JSON с источниками srcset для тега picture',
+    )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False,
+    )
+
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date',
+            ),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
     def __str__(self):
         return self.text[:15]
 
+    @cached_property
+    def picture(self):
+        """Источники тега picture, подготовленные при загрузке картинки."""
+        if not self.renditions:
+            return None
+        return json.loads(self.renditions)
+
+    @property
+    def cache_version(self):
+        """Версия карточки поста: меняется вместе с любыми её данными."""
+        related = (
+            self.author.username,
+            self.author.first_name,
+            self.author.last_name,
+            self.group.title if self.group else '',
+            self.group.slug if self.group else '',
+        )
+        digest = hashlib.md5('\n'.join(related).encode()).hexdigest()
+        return (
+            f'{self.pk}.{self.edited.timestamp()}.'
+            f'{self.comments_count}.{digest}'
+        )
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -74,11 +277,18 @@ class Comment(models.Model):
     )
     created = models.DateTimeField(
         'Дата и время публикации комментария',
-        auto_now_add=True
+        default=timezone.now,
+        editable=False,
     )
 
     class Meta:
         ordering = ('-created',)
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created',
+            ),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -111,8 +321,136 @@ class Follow(models.Model):
                 name='user_not_author',
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user',
+            ),
+        ]
         verbose_name = 'Подписчик'
         verbose_name_plural = 'Подписчики'
 
     def __str__(self):
         return f'Подписчик: {self.user}, автор:{self.author}'
+
+
+class TimelineEntry(models.Model):
+    """Запись ленты подписок, разложенная подписчику при публикации."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-id')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='one_timeline_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-id'],
+                name='timeline_user_pub_date',
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author',
+            ),
+        ]
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Ленты подписок'
+
+    def __str__(self):
+        return f'Лента: {self.user}, пост:{self.post_id}'
+
+
+class SearchDocument(models.Model):
+    """Текст поста или комментария в виде основ слов для поиска."""
+    POST = 'post'
+    COMMENT = 'comment'
+    KINDS = (
+        (POST, 'Пост'),
+        (COMMENT, 'Комментарий'),
+    )
+
+    kind = models.CharField('Тип', max_length=10, choices=KINDS)
+    object_id = models.PositiveIntegerField('Идентификатор объекта')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_documents',
+        verbose_name='Пост',
+    )
+    body = models.TextField('Основы слов')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'],
+                name='one_search_document',
+            ),
+        ]
+        verbose_name = 'Поисковый документ'
+        verbose_name_plural = 'Поисковые документы'
+
+    def __str__(self):
+        return f'{self.kind}:{self.object_id}'
+
+
+class TrendingScore(models.Model):
+    """Накопленный с прямым затуханием счёт поста, автора или группы.
+
+    Счёт растёт на вес события, умноженный на 2 ** (t / период
+    полураспада), где t отсчитывается от начала эпохи era. Поэтому
+    старые значения не нужно уменьшать: сравнение счетов одной эпохи
+    равносильно сравнению затухающих во времени сумм.
+    """
+    POST = 'post'
+    AUTHOR = 'author'
+    GROUP = 'group'
+    KINDS = (
+        (POST, 'Пост'),
+        (AUTHOR, 'Автор'),
+        (GROUP, 'Группа'),
+    )
+
+    kind = models.CharField('Тип', max_length=10, choices=KINDS)
+    object_id = models.PositiveIntegerField('Идентификатор объекта')
+    era = models.PositiveIntegerField('Эпоха', default=0)
+    score = models.FloatField('Счёт', default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['kind', 'object_id'],
+                name='one_trending_score',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['kind', 'era', '-score'],
+                name='trending_kind_score',
+            ),
+        ]
+        verbose_name = 'Счёт популярности'
+        verbose_name_plural = 'Счета популярности'
+
+    def __str__(self):
+        return f'{self.kind}:{self.object_id}'
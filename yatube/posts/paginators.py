@@ -0,0 +1,140 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage:
+    """Страница ленты, полученная по курсору (keyset-пагинация).
+
+    Курсоры соседних страниц вычисляются при построении страницы,
+    поэтому object_list можно заменить, например, связанными объектами.
+    """
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage ({len(self)} objects)>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Пагинатор по ключу сортировки без COUNT(*) и OFFSET.
+
+    Страница выбирается условием на значения ключа последней
+    (или первой) записи предыдущей страницы, поэтому время выборки
+    не зависит от глубины страницы при наличии подходящего индекса.
+    Последнее поле ключа должно быть уникальным.
+    """
+    is_cursor = True
+
+    def __init__(self, queryset, per_page, ordering=('-pub_date', '-id')):
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.queryset = queryset.order_by(*self.ordering)
+
+    def encode_cursor(self, obj):
+        values = []
+        for name in self.fields:
+            field = self.queryset.model._meta.get_field(name)
+            values.append(field.value_to_string(obj))
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+            if len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            return [
+                self.queryset.model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (ValueError, TypeError, ValidationError):
+            raise InvalidCursor(cursor)
+
+    def _seek(self, values, forward):
+        """Условие «строго после» (или «строго до») значений ключа."""
+        condition = Q()
+        for position, name in enumerate(self.fields):
+            descending = self.ordering[position].startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            branch = Q(**{f'{name}__{lookup}': values[position]})
+            for prev_name, prev_value in zip(self.fields, values[:position]):
+                branch &= Q(**{prev_name: prev_value})
+            condition |= branch
+        return condition
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ]
+
+    def build_page(self, rows, has_next, has_previous):
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(rows[0])
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+    def page(self, after=None, before=None):
+        """Возвращает страницу после курсора after или до курсора before."""
+        if before:
+            values = self.decode_cursor(before)
+            queryset = self.queryset.filter(
+                self._seek(values, forward=False)
+            ).order_by(*self._reversed_ordering())
+            rows = list(queryset[:self.per_page + 1])
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            rows.reverse()
+            return self.build_page(rows, True, has_previous)
+        queryset = self.queryset
+        if after:
+            queryset = queryset.filter(
+                self._seek(self.decode_cursor(after), forward=True)
+            )
+        rows = list(queryset[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return self.build_page(rows[:self.per_page], has_next, bool(after))
+
+    def get_page(self, after=None, before=None):
+        """Как page(), но при неверном курсоре отдаёт первую страницу."""
+        try:
+            return self.page(after=after, before=before)
+        except InvalidCursor:
+            return self.page()
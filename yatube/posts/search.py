@@ -0,0 +1,383 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Тексты хранятся в SearchDocument в виде основ слов (стеммер Snowball
+для русского языка) и обновляются при сохранении и удалении постов и
+комментариев. Поиск выполняет один из движков:
+
+* 'sqlite' — таблица FTS5 с ранжированием bm25;
+* 'postgresql' — GIN-индекс по tsvector с ранжированием ts_rank;
+* 'memory' — обратный индекс в памяти процесса с ранжированием BM25.
+
+Результат — посты, упорядоченные по релевансу лучшего документа
+(самого поста или комментария к нему), с курсорной пагинацией.
+
+Индекс в памяти обновляется по изменениям: каждое сохранение и
+удаление документа записывается в журнал в общем кеше (счётчик
+search:generation и записи search:log:<n>), и перед поиском процесс
+применяет к индексу записи, которых ещё не видел. Целиком индекс
+читается из базы только при первом поиске, после rebuild(), если записи
+журнала вытеснены из кеша или кеш очищен, и раз в
+SEARCH_MEMORY_REBUILD секунд на случай потерянных записей.
+"""
+import base64
+import json
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from . import stemmer
+from .models import Comment, Post, SearchDocument
+from .paginators import CursorPage
+
+GENERATION_KEY = 'search:generation'
+LOG_KEY = 'search:log'
+
+
+def _index(kind, object_id, post_id, text):
+    body = ' '.join(stemmer.terms(text))
+    SearchDocument.objects.update_or_create(
+        kind=kind,
+        object_id=object_id,
+        defaults={'post_id': post_id, 'body': body},
+    )
+    _publish([('set', kind, object_id, post_id, body)])
+
+
+def index_post(post):
+    _index(SearchDocument.POST, post.id, post.id, post.text)
+
+
+def index_comment(comment):
+    _index(SearchDocument.COMMENT, comment.id, comment.post_id, comment.text)
+
+
+def index_comments(comments):
+    """Добавляет в индекс пачку новых комментариев одним запросом."""
+    documents = [
+        SearchDocument(
+            kind=SearchDocument.COMMENT,
+            object_id=comment.id,
+            post_id=comment.post_id,
+            body=' '.join(stemmer.terms(comment.text)),
+        )
+        for comment in comments
+    ]
+    SearchDocument.objects.bulk_create(documents)
+    _publish([
+        ('set', document.kind, document.object_id, document.post_id,
+         document.body)
+        for document in documents
+    ])
+
+
+def remove(kind, object_id):
+    SearchDocument.objects.filter(kind=kind, object_id=object_id).delete()
+    _publish([('remove', kind, object_id)])
+
+
+def rebuild(batch_size=1000):
+    """Пересобирает поисковые документы по всем постам и комментариям."""
+    SearchDocument.objects.all().delete()
+    sources = [
+        (SearchDocument.POST, Post.objects.values_list('id', 'id', 'text')),
+        (SearchDocument.COMMENT,
+         Comment.objects.values_list('id', 'post_id', 'text')),
+    ]
+    total = 0
+    for kind, rows in sources:
+        batch = []
+        for object_id, post_id, text in rows.iterator():
+            batch.append(SearchDocument(
+                kind=kind,
+                object_id=object_id,
+                post_id=post_id,
+                body=' '.join(stemmer.terms(text)),
+            ))
+            if len(batch) >= batch_size:
+                SearchDocument.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        SearchDocument.objects.bulk_create(batch)
+        total += len(batch)
+    _publish([('reload',)])
+    return total
+
+
+def _publish(entries):
+    """Записывает изменения документов в журнал для индексов в памяти."""
+    if not entries:
+        return
+    cache.add(GENERATION_KEY, 0, None)
+    try:
+        last = cache.incr(GENERATION_KEY, len(entries))
+    except ValueError:
+        # Счётчик вытеснен: процессы заметят это и перечитают индекс.
+        return
+    first = last - len(entries) + 1
+    cache.set_many(
+        {
+            f'{LOG_KEY}:{number}': entry
+            for number, entry in enumerate(entries, first)
+        },
+        settings.SEARCH_LOG_TIMEOUT,
+    )
+
+
+class SqliteBackend:
+    """Поиск по таблице FTS5, которую ведут триггеры на SearchDocument."""
+
+    def search(self, terms, after, limit):
+        query = ' '.join(f'"{term}"' for term in terms)
+        having, params = '', [query]
+        if after:
+            having = 'HAVING score < %s OR (score = %s AND post_id < %s)'
+            params += [after[0], after[0], after[1]]
+        sql = f'''
+            SELECT post_id, MAX(rank) AS score FROM (
+                SELECT d.post_id AS post_id,
+                       -bm25(posts_searchdocument_fts) AS rank
+                FROM posts_searchdocument_fts
+                JOIN posts_searchdocument d
+                  ON d.id = posts_searchdocument_fts.rowid
+                WHERE posts_searchdocument_fts MATCH %s
+                -- LIMIT не даёт SQLite развернуть подзапрос: bm25()
+                -- нельзя вызывать внутри агрегации.
+                LIMIT -1
+            )
+            GROUP BY post_id {having}
+            ORDER BY score DESC, post_id DESC
+            LIMIT %s
+        '''
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            return [(score, post_id) for post_id, score in cursor.fetchall()]
+
+
+class PostgresqlBackend:
+    """Поиск по GIN-индексу to_tsvector('simple', body)."""
+
+    def search(self, terms, after, limit):
+        having, params = '', [' & '.join(terms)]
+        if after:
+            having = (
+                'HAVING MAX(ts_rank(to_tsvector(\'simple\', body), q)) < %s '
+                'OR (MAX(ts_rank(to_tsvector(\'simple\', body), q)) = %s '
+                'AND post_id < %s)'
+            )
+            params += [after[0], after[0], after[1]]
+        sql = f'''
+            SELECT post_id,
+                   MAX(ts_rank(to_tsvector('simple', body), q)) AS score
+            FROM posts_searchdocument, to_tsquery('simple', %s) q
+            WHERE to_tsvector('simple', body) @@ q
+            GROUP BY post_id {having}
+            ORDER BY score DESC, post_id DESC
+            LIMIT %s
+        '''
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            return [(score, post_id) for post_id, score in cursor.fetchall()]
+
+
+class MemoryBackend:
+    """Обратный индекс в памяти процесса с ранжированием BM25.
+
+    Документы хранятся по ключу (вид, id объекта): журнал изменений
+    ссылается на них так же, а bulk_create не возвращает id строк.
+    """
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key = None
+        self._seen = 0
+        self._built = 0
+        self._postings = {}
+        self._documents = {}
+        self._total_length = 0
+
+    def _add(self, key, post_id, body):
+        words = body.split()
+        counts = Counter(words)
+        self._documents[key] = (post_id, len(words), tuple(counts))
+        self._total_length += len(words)
+        for term, count in counts.items():
+            self._postings.setdefault(term, {})[key] = count
+
+    def _discard(self, key):
+        document = self._documents.pop(key, None)
+        if document is None:
+            return
+        _, length, terms = document
+        self._total_length -= length
+        for term in terms:
+            postings = self._postings[term]
+            del postings[key]
+            if not postings:
+                del self._postings[term]
+
+    def _load(self):
+        cache.add(GENERATION_KEY, 0, None)
+        # Поколение читается до выборки: изменения до него уже в базе.
+        self._seen = cache.get(GENERATION_KEY) or 0
+        self._postings = {}
+        self._documents = {}
+        self._total_length = 0
+        rows = SearchDocument.objects.values_list(
+            'kind', 'object_id', 'post_id', 'body'
+        )
+        for kind, object_id, post_id, body in rows.iterator():
+            self._add((kind, object_id), post_id, body)
+        self._key = settings.DATABASES['default']['NAME']
+        self._built = time.monotonic()
+
+    def _apply(self, entry):
+        op, kind, object_id, *document = entry
+        self._discard((kind, object_id))
+        if op == 'set':
+            self._add((kind, object_id), *document)
+
+    def _sync(self):
+        version = cache.get(GENERATION_KEY)
+        if (
+            self._key != settings.DATABASES['default']['NAME']
+            or version is None
+            or version < self._seen
+            or time.monotonic() - self._built > settings.SEARCH_MEMORY_REBUILD
+        ):
+            self._load()
+            return
+        if version == self._seen:
+            return
+        keys = [
+            f'{LOG_KEY}:{number}'
+            for number in range(self._seen + 1, version + 1)
+        ]
+        entries = cache.get_many(keys)
+        if len(entries) != len(keys) or ('reload',) in entries.values():
+            self._load()
+            return
+        for key in keys:
+            self._apply(entries[key])
+        self._seen = version
+
+    def search(self, terms, after, limit):
+        with self._lock:
+            self._sync()
+            return self._rank(set(terms), after, limit)
+
+    def _rank(self, terms, after, limit):
+        postings, documents = self._postings, self._documents
+        if not documents:
+            return []
+        average = self._total_length / len(documents) or 1
+        matches = None
+        for term in terms:
+            found = set(postings.get(term, ()))
+            matches = found if matches is None else matches & found
+        best = {}
+        for key in matches or ():
+            post_id, length, _ = documents[key]
+            score = 0.0
+            for term in terms:
+                frequency = postings[term][key]
+                idf = math.log(
+                    1 + (len(documents) - len(postings[term]) + 0.5)
+                    / (len(postings[term]) + 0.5)
+                )
+                score += idf * frequency * (self.K1 + 1) / (
+                    frequency + self.K1 * (
+                        1 - self.B + self.B * length / average
+                    )
+                )
+            best[post_id] = max(score, best.get(post_id, score))
+        ranked = sorted(
+            ((score, post_id) for post_id, score in best.items()),
+            reverse=True,
+        )
+        if after:
+            ranked = [item for item in ranked if item < tuple(after)]
+        return ranked[:limit]
+
+
+_memory_backend = MemoryBackend()
+
+
+def get_backend():
+    name = settings.SEARCH_BACKEND
+    if name == 'auto':
+        name = connection.vendor
+    if name == 'sqlite' and _sqlite_has_index():
+        return SqliteBackend()
+    if name == 'postgresql':
+        return PostgresqlBackend()
+    return _memory_backend
+
+
+def _sqlite_has_index():
+    return 'posts_searchdocument_fts' in connection.introspection.table_names()
+
+
+def encode_cursor(score, post_id):
+    raw = json.dumps([score, post_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        score, post_id = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        return float(score), int(post_id)
+    except (ValueError, TypeError):
+        return None
+
+
+class SearchPaginator:
+    """Пагинатор результатов: курсор — пара (релевантность, id поста)."""
+    is_cursor = True
+
+    def __init__(self, per_page):
+        self.per_page = per_page
+
+
+def ranked_post_ids(query, after=None, limit=None):
+    """Пары (релевантность, id поста) по убыванию релевантности."""
+    terms = stemmer.terms(query)
+    if not terms:
+        return []
+    limit = limit or settings.SEARCH_MAX_RESULTS
+    return get_backend().search(terms, after, limit)
+
+
+def all_ranked_post_ids(query):
+    """Id всех найденных постов по убыванию релевантности."""
+    ids = []
+    after = None
+    while True:
+        ranked = ranked_post_ids(query, after)
+        ids.extend(post_id for _, post_id in ranked)
+        if len(ranked) < settings.SEARCH_MAX_RESULTS:
+            return ids
+        after = ranked[-1]
+
+
+def search_page(query, after=None):
+    """Страница результатов поиска с курсором следующей страницы."""
+    per_page = settings.NUMBER_OF_POSTS
+    cursor = decode_cursor(after) if after else None
+    ranked = ranked_post_ids(query, cursor, per_page + 1)
+    has_next = len(ranked) > per_page
+    ranked = ranked[:per_page]
+    posts = Post.objects.feed().in_bulk([post_id for _, post_id in ranked])
+    next_cursor = encode_cursor(*ranked[-1]) if has_next else None
+    return CursorPage(
+        [posts[post_id] for _, post_id in ranked if post_id in posts],
+        SearchPaginator(per_page),
+        next_cursor=next_cursor,
+    )
@@ -0,0 +1,154 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import cache, metrics
+from . import counters, directory, graph, search, timeline, trending
+from .models import (
+    Comment, Follow, Group, Post, SearchDocument, TrendingScore, User
+)
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.ensure_profile(instance)
+
+
+@receiver(post_save, sender=User)
+def user_renamed(sender, instance, created, raw=False, update_fields=None,
+                 **kwargs):
+    names = {'username', 'first_name', 'last_name'}
+    if created or raw or (update_fields and not names & set(update_fields)):
+        return
+    directory.author_renamed(instance.id)
+    counters.author_changed(instance.id)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        directory.ensure_stats(instance)
+        if not created:
+            counters.group_changed(instance.id)
+
+
+@receiver(pre_save, sender=Post)
+def post_group_before(sender, instance, raw=False, **kwargs):
+    # Группа до сохранения нужна каталогу, чтобы перенести пост.
+    if instance.pk is not None and not raw:
+        instance.previous_group_id = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.post_added(instance.author_id)
+        directory.post_added(
+            instance.group_id, instance.author_id, when=instance.pub_date
+        )
+        timeline.fan_out_post(instance)
+        trending.post_created(instance)
+        metrics.inc('yatube_created_total', kind='post')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def feed_changed(sender, **kwargs):
+    cache.invalidate('feed:index')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_versioned(sender, instance, raw=False, **kwargs):
+    if not raw:
+        counters.posts_changed(
+            [instance.author_id],
+            [instance.group_id,
+             getattr(instance, 'previous_group_id', None)],
+        )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_versioned(sender, instance, raw=False, **kwargs):
+    if not raw:
+        counters.posts_touched([instance.post_id])
+
+
+@receiver(post_save, sender=Post)
+def post_regrouped(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    directory.post_moved(
+        instance.author_id,
+        getattr(instance, 'previous_group_id', instance.group_id),
+        instance.group_id,
+        instance.pub_date,
+    )
+    instance.previous_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.post_added(instance.author_id, -1)
+    directory.post_added(instance.group_id, instance.author_id, -1)
+    trending.remove(TrendingScore.POST, instance.id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.comment_added(instance.post_id)
+        trending.comments_added([instance])
+        metrics.inc('yatube_created_total', kind='comment')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.comment_added(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def post_indexed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_unindexed(sender, instance, **kwargs):
+    # Документы поста и комментариев удаляет каскад, здесь только
+    # сообщаем процессам об изменении индекса.
+    search.remove(SearchDocument.POST, instance.id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_indexed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_unindexed(sender, instance, **kwargs):
+    search.remove(SearchDocument.COMMENT, instance.id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.follow_added(instance.user_id, instance.author_id)
+        timeline.add_follow(instance.user_id, instance.author_id)
+        graph.follow_added(instance.user_id, instance.author_id)
+        trending.follow_added(instance.author_id)
+        metrics.inc('yatube_created_total', kind='follow')
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.follow_added(instance.user_id, instance.author_id, -1)
+    timeline.remove_follow(instance.user_id, instance.author_id)
+    graph.follow_removed(instance.user_id, instance.author_id)
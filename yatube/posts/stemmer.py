@@ -0,0 +1,138 @@
+"""Стеммер русского языка по алгоритму Snowball (Портер).
+
+Описание алгоритма: https://snowballstem.org/algorithms/russian/stemmer.html
+Слова не на кириллице возвращаются в нижнем регистре без изменений,
+служебные слова из STOP_WORDS в поисковые термы не попадают.
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile(r'^[а-я]+$')
+STOP_WORDS = frozenset(
+    'а без в во да для до же за и из или к ко ли на над не ни но о об '
+    'от по под при про с со то у что'.split()
+)
+
+
+def _suffixes(*groups):
+    return sorted(
+        (suffix for group in groups for suffix in group.split()),
+        key=len,
+        reverse=True,
+    )
+
+
+# Окончания первой группы допустимы только после «а» или «я».
+PERFECTIVE_GERUND_1 = _suffixes('в вши вшись')
+PERFECTIVE_GERUND_2 = _suffixes('ив ивши ившись ыв ывши ывшись')
+ADJECTIVE = _suffixes(
+    'ее ие ые ое ими ыми ей ий ый ой ем им ым ом его ого ему ому '
+    'их ых ую юю ая яя ою ею'
+)
+PARTICIPLE_1 = _suffixes('ем нн вш ющ щ')
+PARTICIPLE_2 = _suffixes('ивш ывш ующ')
+REFLEXIVE = _suffixes('ся сь')
+VERB_1 = _suffixes('ла на ете йте ли й л ем н ло но ет ют ны ть ешь нно')
+VERB_2 = _suffixes(
+    'ила ыла ена ейте уйте ите или ыли ей уй ил ыл им ым ен ило ыло ено '
+    'ят ует уют ит ыт ены ить ыть ишь ую ю'
+)
+NOUN = _suffixes(
+    'а ев ов ие ье е иями ями ами еи ии и ией ей ой ий й иям ям ием ем '
+    'ам ом о у ах иях ях ы ь ию ью ю ия ья я'
+)
+SUPERLATIVE = _suffixes('ейш ейше')
+DERIVATIONAL = _suffixes('ост ость')
+
+
+def _strip(word, suffixes, after_a=()):
+    """Удаляет самое длинное подходящее окончание или возвращает None."""
+    candidates = sorted(
+        [(suffix, False) for suffix in suffixes]
+        + [(suffix, True) for suffix in after_a],
+        key=lambda item: len(item[0]),
+        reverse=True,
+    )
+    for suffix, needs_a in candidates:
+        if not word.endswith(suffix):
+            continue
+        stem = word[:-len(suffix)]
+        if needs_a and not stem.endswith(('а', 'я')):
+            continue
+        return stem
+    return None
+
+
+def _regions(word):
+    """Начала областей RV и R2 в слове."""
+    rv = r1 = r2 = len(word)
+    for position, letter in enumerate(word):
+        if letter in VOWELS:
+            rv = position + 1
+            break
+    for position in range(1, len(word)):
+        if word[position] not in VOWELS and word[position - 1] in VOWELS:
+            r1 = position + 1
+            break
+    for position in range(r1 + 1, len(word)):
+        if word[position] not in VOWELS and word[position - 1] in VOWELS:
+            r2 = position + 1
+            break
+    return rv, r2
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC_RE.match(word):
+        return word
+    rv_start, r2_start = _regions(word)
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    # Шаг 1: деепричастия, иначе возвратность и окончания частей речи.
+    stripped = _strip(rv, PERFECTIVE_GERUND_2, PERFECTIVE_GERUND_1)
+    if stripped is not None:
+        rv = stripped
+    else:
+        stripped = _strip(rv, REFLEXIVE)
+        if stripped is not None:
+            rv = stripped
+        stripped = _strip(rv, ADJECTIVE)
+        if stripped is not None:
+            participle = _strip(stripped, PARTICIPLE_2, PARTICIPLE_1)
+            rv = stripped if participle is None else participle
+        else:
+            stripped = _strip(rv, VERB_2, VERB_1)
+            if stripped is None:
+                stripped = _strip(rv, NOUN)
+            if stripped is not None:
+                rv = stripped
+
+    # Шаг 2.
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    # Шаг 3: словообразовательные окончания в области R2.
+    r2 = (prefix + rv)[r2_start:]
+    for suffix in DERIVATIONAL:
+        if r2.endswith(suffix):
+            rv = rv[:-len(suffix)]
+            break
+
+    # Шаг 4.
+    stripped = _strip(rv, SUPERLATIVE)
+    if stripped is not None:
+        rv = stripped
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    elif stripped is None and rv.endswith('ь'):
+        rv = rv[:-1]
+    return prefix + rv
+
+
+def terms(text):
+    """Основы слов текста в порядке следования."""
+    return [
+        stem(word) for word in WORD_RE.findall(text.lower())
+        if word not in STOP_WORDS
+    ]
@@ -0,0 +1,206 @@
+"""Ленты для агрегаторов: RSS 2.0, Atom и JSON Feed 1.1.
+
+Ответ собирается по ходу чтения курсора: шапка ленты, затем по одной
+записи на каждый пост из Post.objects.feed().iterator(), без
+Paginator, шаблонов и списка постов в памяти. Условный GET
+(conditional.syndication_etag) сравнивает id и время правки последних
+SYNDICATION_ITEMS постов одной выборкой по индексу ленты, а
+Cache-Control разрешает общим кешам хранить ленту
+SYNDICATION_CACHE_TIMEOUT секунд.
+"""
+import io
+import json
+from itertools import chain
+
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.feedgenerator import rfc2822_date, rfc3339_date
+from django.utils.text import Truncator
+from django.utils.xmlutils import SimplerXMLGenerator
+
+from .models import Group, Post, User
+
+ATOM_NS = 'http://www.w3.org/2005/Atom'
+DC_NS = 'http://purl.org/dc/elements/1.1/'
+JSON_FEED_VERSION = 'https://jsonfeed.org/version/1.1'
+
+
+def posts(slug=None, username=None):
+    """Посты ленты, отобранные по slug группы или имени автора."""
+    queryset = Post.objects.feed()
+    if slug is not None:
+        queryset = queryset.filter(group__slug=slug)
+    if username is not None:
+        queryset = queryset.filter(author__username=username)
+    return queryset
+
+
+class Feed:
+    """Описание ленты и адреса её страниц."""
+
+    def __init__(self, request, kind, slug=None, username=None):
+        self.request = request
+        if slug is not None:
+            group = get_object_or_404(Group, slug=slug)
+            self.title = f'Yatube: {group.title}'
+            self.description = group.description
+            self.link = self.absolute('posts:group_list', slug=slug)
+            self.url = self.absolute(
+                'posts:group_feed', slug=slug, kind=kind
+            )
+        elif username is not None:
+            author = get_object_or_404(User, username=username)
+            self.title = f'Yatube: {author.get_full_name() or username}'
+            self.description = f'Посты пользователя {username}'
+            self.link = self.absolute('posts:profile', username=username)
+            self.url = self.absolute(
+                'posts:profile_feed', username=username, kind=kind
+            )
+        else:
+            self.title = 'Yatube'
+            self.description = 'Последние обновления на сайте'
+            self.link = self.absolute('posts:index')
+            self.url = self.absolute('posts:feed', kind=kind)
+        self.posts = posts(slug, username)[:settings.SYNDICATION_ITEMS]
+
+    def absolute(self, name, **kwargs):
+        return self.request.build_absolute_uri(reverse(name, kwargs=kwargs))
+
+    def post_url(self, post):
+        return self.absolute('posts:post_detail', post_id=post.id)
+
+    def rows(self):
+        return self.posts.iterator(chunk_size=settings.SYNDICATION_ITEMS)
+
+
+def _title(post):
+    return Truncator(post.text.split('\n', 1)[0]).chars(80)
+
+
+def _author(post):
+    return post.author.get_full_name() or post.author.username
+
+
+class _Buffer(io.StringIO):
+    def drain(self):
+        value = self.getvalue()
+        self.seek(0)
+        self.truncate()
+        return value.encode()
+
+
+def rss(feed):
+    out = _Buffer()
+    xml = SimplerXMLGenerator(out, 'utf-8')
+    xml.startDocument()
+    xml.startElement(
+        'rss', {'version': '2.0', 'xmlns:atom': ATOM_NS, 'xmlns:dc': DC_NS}
+    )
+    xml.startElement('channel', {})
+    xml.addQuickElement('title', feed.title)
+    xml.addQuickElement('link', feed.link)
+    xml.addQuickElement('description', feed.description)
+    xml.addQuickElement('atom:link', None, {
+        'rel': 'self', 'href': feed.url, 'type': 'application/rss+xml',
+    })
+    xml.addQuickElement('language', 'ru')
+    yield out.drain()
+    for post in feed.rows():
+        url = feed.post_url(post)
+        xml.startElement('item', {})
+        xml.addQuickElement('title', _title(post))
+        xml.addQuickElement('link', url)
+        xml.addQuickElement('guid', url, {'isPermaLink': 'true'})
+        xml.addQuickElement('dc:creator', _author(post))
+        xml.addQuickElement('pubDate', rfc2822_date(post.pub_date))
+        if post.group:
+            xml.addQuickElement('category', post.group.title)
+        xml.addQuickElement('description', post.text)
+        xml.endElement('item')
+        yield out.drain()
+    xml.endElement('channel')
+    xml.endElement('rss')
+    yield out.drain()
+
+
+def atom(feed):
+    rows = feed.rows()
+    first = next(rows, None)
+    # Свежий пост идёт первым; его правка — время обновления ленты.
+    updated = first.edited if first else timezone.now()
+    out = _Buffer()
+    xml = SimplerXMLGenerator(out, 'utf-8')
+    xml.startDocument()
+    xml.startElement('feed', {'xmlns': ATOM_NS, 'xml:lang': 'ru'})
+    xml.addQuickElement('title', feed.title)
+    xml.addQuickElement('subtitle', feed.description)
+    xml.addQuickElement('link', None, {
+        'rel': 'alternate', 'href': feed.link,
+    })
+    xml.addQuickElement('link', None, {'rel': 'self', 'href': feed.url})
+    xml.addQuickElement('id', feed.link)
+    xml.addQuickElement('updated', rfc3339_date(updated))
+    yield out.drain()
+    for post in chain([first] if first else [], rows):
+        url = feed.post_url(post)
+        xml.startElement('entry', {})
+        xml.addQuickElement('title', _title(post))
+        xml.addQuickElement('link', None, {
+            'rel': 'alternate', 'href': url,
+        })
+        xml.addQuickElement('id', url)
+        xml.addQuickElement('published', rfc3339_date(post.pub_date))
+        xml.addQuickElement('updated', rfc3339_date(post.edited))
+        xml.startElement('author', {})
+        xml.addQuickElement('name', _author(post))
+        xml.endElement('author')
+        if post.group:
+            xml.addQuickElement('category', None, {
+                'term': post.group.slug, 'label': post.group.title,
+            })
+        xml.addQuickElement('content', post.text, {'type': 'text'})
+        xml.endElement('entry')
+        yield out.drain()
+    xml.endElement('feed')
+    yield out.drain()
+
+
+def json_feed(feed):
+    head = json.dumps({
+        'version': JSON_FEED_VERSION,
+        'title': feed.title,
+        'description': feed.description,
+        'home_page_url': feed.link,
+        'feed_url': feed.url,
+        'language': 'ru',
+    }, ensure_ascii=False)
+    yield f'{head[:-1]}, "items": ['.encode()
+    for number, post in enumerate(feed.rows()):
+        item = {
+            'id': str(post.id),
+            'url': feed.post_url(post),
+            'title': _title(post),
+            'content_text': post.text,
+            'date_published': post.pub_date.isoformat(),
+            'date_modified': post.edited.isoformat(),
+            'authors': [{
+                'name': _author(post),
+                'url': feed.absolute(
+                    'posts:profile', username=post.author.username
+                ),
+            }],
+        }
+        if post.group:
+            item['tags'] = [post.group.title]
+        separator = ', ' if number else ''
+        yield (separator + json.dumps(item, ensure_ascii=False)).encode()
+    yield b']}'
+
+
+FORMATS = {
+    'rss': ('application/rss+xml; charset=utf-8', rss),
+    'atom': ('application/atom+xml; charset=utf-8', atom),
+    'json': ('application/feed+json; charset=utf-8', json_feed),
+}
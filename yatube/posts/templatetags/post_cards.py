@@ -0,0 +1,26 @@
+from django import template
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core.cache import get_or_compute
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_card(post, variant='feed'):
+    """Карточка поста из кеша фрагментов.
+
+    Ключ включает версию поста, поэтому правка поста, новый комментарий
+    или изменение группы и автора дают новый ключ, а одна и та же
+    карточка используется всеми лентами с одинаковым вариантом.
+    """
+    html = get_or_compute(
+        f'post_card:{variant}:{post.cache_version}',
+        lambda: render_to_string(
+            'includes/post_card.html', {'post': post, 'variant': variant}
+        ),
+        settings.POST_CARD_CACHE_TIMEOUT,
+    )
+    return mark_safe(html)
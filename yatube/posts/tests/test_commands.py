@@ -0,0 +1,221 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import search
+from posts.models import (
+    Comment, Follow, Group, GroupStats, Post, Profile, TimelineEntry
+)
+
+User = get_user_model()
+
+
+class AuditIndexesCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Edward')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Тестовый текст',
+        )
+        Comment.objects.create(author=cls.user, post=cls.post, text='Текст')
+
+    def test_hot_queries_use_indexes(self):
+        """Запросы представлений выполняются по индексам."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('Планы запросов проверяются на SQLite.')
+        out = StringIO()
+        call_command('audit_indexes', stdout=out)
+        self.assertIn('Все запросы используют индексы', out.getvalue())
+
+
+class TransferCommandsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Edward')
+        cls.author = User.objects.create_user(
+            username='Leo', first_name='Лев'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='slug', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Кошки и собаки'
+        )
+        Post.objects.create(author=cls.author, text='Второй пост')
+        Comment.objects.create(author=cls.user, post=cls.post, text='Мяу')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def export(self, name, *args):
+        path = os.path.join(self.directory, name)
+        call_command('export_posts', '--output', path, *args,
+                     stderr=StringIO())
+        return path
+
+    def wipe(self):
+        for model in (Follow, Comment, Post, Group, Profile):
+            model.objects.all().delete()
+        User.objects.all().delete()
+
+    def test_ndjson_round_trip(self):
+        """Выгрузка загружается обратно вместе с производными данными."""
+        pub_date = self.post.pub_date
+        path = self.export('dump.ndjson')
+        self.wipe()
+        out = StringIO()
+        call_command('import_posts', path, '--batch-size', '2', stdout=out)
+        self.assertIn('в секунду', out.getvalue())
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.pub_date, pub_date)
+        self.assertEqual(post.group.slug, 'slug')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.author.first_name, 'Лев')
+        self.assertEqual(Profile.objects.get(user=post.author).posts_count, 2)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user__username='Edward').count(), 2
+        )
+        self.assertEqual(
+            [post_id for _, post_id in search.ranked_post_ids('мяу')],
+            [self.post.pk]
+        )
+
+    def test_csv_import_skips_unknown_authors(self):
+        path = self.export('posts.csv', '--format', 'csv', '--kind', 'posts')
+        Post.objects.all().delete()
+        User.objects.filter(username='Leo').delete()
+        out = StringIO()
+        call_command('import_posts', path, '--kind', 'posts',
+                     '--skip-rebuild', stdout=out)
+        self.assertIn('posts: 0 (пропущено 2)', out.getvalue())
+
+    def test_import_refuses_colliding_post_ids(self):
+        """Пост с занятым id и его комментарии не загружаются."""
+        path = self.export('dump.ndjson')
+        Post.objects.all().delete()
+        stranger = Post.objects.create(
+            id=self.post.pk, author=self.user, text='Чужой пост'
+        )
+        out = StringIO()
+        call_command('import_posts', path, stdout=out)
+        self.assertIn(
+            'posts: 1 (пропущено 1, уже есть в базе 1)', out.getvalue()
+        )
+        self.assertIn('comments: 0 (пропущено 1)', out.getvalue())
+        stranger.refresh_from_db()
+        self.assertEqual(stranger.text, 'Чужой пост')
+        self.assertFalse(stranger.comments.exists())
+
+    def test_csv_import_refuses_colliding_post_ids(self):
+        """В CSV занятый id тоже отклоняется, остальные посты загружаются."""
+        path = self.export('posts.csv', '--format', 'csv', '--kind', 'posts')
+        Post.objects.all().delete()
+        Post.objects.create(
+            id=self.post.pk, author=self.user, text='Чужой пост'
+        )
+        out = StringIO()
+        call_command('import_posts', path, '--kind', 'posts',
+                     '--skip-rebuild', stdout=out)
+        self.assertIn(
+            'posts: 1 (пропущено 1, уже есть в базе 1)', out.getvalue()
+        )
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).text, 'Чужой пост'
+        )
+        self.assertTrue(Post.objects.filter(text='Второй пост').exists())
+
+    def test_skip_rebuild_creates_profiles_and_stats(self):
+        """Без пересчёта страницы новых авторов и групп всё равно работают."""
+        path = self.export('dump.ndjson')
+        self.wipe()
+        call_command('import_posts', path, '--skip-rebuild', stdout=StringIO())
+        self.assertTrue(Profile.objects.filter(user__username='Leo').exists())
+        self.assertTrue(GroupStats.objects.filter(group__slug='slug').exists())
+        client = Client()
+        for url in (
+            reverse('posts:profile', args=['Leo']),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:group_list', args=['slug']),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(client.get(url).status_code, 200)
+
+    def test_csv_keeps_empty_text(self):
+        """Пустая строка в текстовой колонке CSV остаётся пустой строкой."""
+        Group.objects.create(title='Без описания', slug='empty')
+        path = self.export('groups.csv', '--format', 'csv', '--kind', 'groups')
+        Group.objects.filter(slug='empty').delete()
+        call_command('import_posts', path, '--kind', 'groups',
+                     stdout=StringIO())
+        self.assertEqual(Group.objects.get(slug='empty').description, '')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class BenchmarkCommandsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_dataset_and_report(self):
+        """Набор данных создаётся, а отчёт содержит все сценарии."""
+        call_command(
+            'generate_dataset', '--users', '20', '--posts', '50',
+            '--comments', '30', '--image-ratio', '0.5', stdout=StringIO()
+        )
+        self.assertEqual(Post.objects.count(), 50)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertTrue(Follow.objects.exists())
+        posts = Post.objects.count()
+        path = os.path.join(settings.MEDIA_ROOT, 'report.json')
+        call_command(
+            'benchmark', '--repeat', '3', '--warmup', '0',
+            '--output', path, stdout=StringIO()
+        )
+        with open(path, encoding='utf-8') as stream:
+            report = json.load(stream)
+        self.assertEqual(
+            set(report['results']),
+            {'index', 'group_list', 'profile', 'post_detail',
+             'follow_index', 'post_create', 'add_comment',
+             'profile_unfollow', 'profile_follow'}
+        )
+        for name, result in report['results'].items():
+            with self.subTest(name=name):
+                self.assertLess(result['status'], 400)
+                self.assertGreater(result['latency_ms']['p50'], 0)
+        self.assertEqual(Post.objects.count(), posts)
+
+    def test_benchmark_bypasses_write_behind(self):
+        """Замер записи не оставляет записей в журнале отложенной записи."""
+        call_command(
+            'generate_dataset', '--users', '10', '--posts', '10',
+            '--comments', '5', '--image-ratio', '0', stdout=StringIO()
+        )
+        journal = os.path.join(settings.MEDIA_ROOT, 'journal')
+        with override_settings(WRITE_BEHIND=True, WRITE_BEHIND_DIR=journal):
+            call_command(
+                'benchmark', '--repeat', '1', '--warmup', '0',
+                stdout=StringIO()
+            )
+        self.assertFalse(os.path.exists(journal) and os.listdir(journal))
@@ -0,0 +1,83 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, Profile
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Edward')
+        cls.author = User.objects.create_user(username='Leo')
+        cls.post = Post.objects.create(author=cls.author, text='Текст')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def profile(self, user):
+        return Profile.objects.get(user=user)
+
+    def test_write_paths_update_counters(self):
+        """Создание поста, комментария и подписки обновляет счётчики."""
+        self.authorized_client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'Комментарий'}
+        )
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'Leo'})
+        )
+        self.assertEqual(self.profile(self.user).posts_count, 1)
+        self.assertEqual(self.profile(self.user).following_count, 1)
+        self.assertEqual(self.profile(self.author).followers_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'Leo'})
+        )
+        self.assertEqual(self.profile(self.user).following_count, 0)
+        self.assertEqual(self.profile(self.author).followers_count, 0)
+
+    def test_pages_do_not_aggregate(self):
+        """Страницы поста и профиля читают счётчики без COUNT."""
+        urls = [
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:profile', kwargs={'username': 'Leo'}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as context:
+                    response = self.authorized_client.get(url)
+                self.assertContains(response, 'Всего постов')
+                self.assertFalse(
+                    [q for q in context if 'COUNT(' in q['sql'].upper()]
+                )
+
+    def test_reconcile_command_repairs_drift(self):
+        """Команда reconcile_counters исправляет расхождения."""
+        Follow.objects.create(user=self.user, author=self.author)
+        Comment.objects.create(author=self.user, post=self.post, text='Текст')
+        Profile.objects.update(
+            posts_count=7, followers_count=7, following_count=7
+        )
+        Post.objects.update(comments_count=7)
+        call_command('reconcile_counters', stdout=StringIO())
+        author = self.profile(self.author)
+        self.assertEqual(author.posts_count, 1)
+        self.assertEqual(author.followers_count, 1)
+        self.assertEqual(author.following_count, 0)
+        self.assertEqual(self.profile(self.user).following_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
@@ -0,0 +1,114 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import directory
+from posts.models import Group, GroupAuthor, GroupStats, Post
+
+User = get_user_model()
+
+
+class GroupDirectoryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Leo')
+        cls.other = User.objects.create_user(username='Edward')
+        cls.cats = Group.objects.create(
+            title='Кошки', slug='cats', description='Про кошек'
+        )
+        cls.dogs = Group.objects.create(
+            title='Собаки', slug='dogs', description='Про собак'
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def stats(self, group):
+        return GroupStats.objects.get(group=group)
+
+    def test_rename_updates_top_authors(self):
+        """Переименованный автор ведёт на новую страницу профиля."""
+        Post.objects.create(author=self.author, text='Пост', group=self.cats)
+        author = User.objects.get(pk=self.author.pk)
+        author.username = 'Tolstoy'
+        author.save()
+        self.assertEqual(self.stats(self.cats).authors, [
+            {'username': 'Tolstoy', 'posts': 1},
+        ])
+        response = self.client.get(reverse('posts:groups'))
+        self.assertContains(
+            response, reverse('posts:profile', args=['Tolstoy'])
+        )
+        self.assertNotContains(
+            response, reverse('posts:profile', args=['Leo'])
+        )
+
+    def test_write_paths_update_directory(self):
+        """Создание, перенос и удаление поста обновляют каталог."""
+        self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'Пост', 'group': self.cats.id},
+        )
+        Post.objects.create(author=self.other, text='Ещё', group=self.cats)
+        Post.objects.create(author=self.other, text='Ещё', group=self.cats)
+        cats = self.stats(self.cats)
+        self.assertEqual(cats.posts_count, 3)
+        self.assertEqual(cats.authors, [
+            {'username': 'Edward', 'posts': 2},
+            {'username': 'Leo', 'posts': 1},
+        ])
+
+        post = Post.objects.get(author=self.author)
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+            {'text': 'Пост', 'group': self.dogs.id},
+        )
+        self.assertEqual(self.stats(self.cats).posts_count, 2)
+        self.assertEqual(self.stats(self.cats).authors, [
+            {'username': 'Edward', 'posts': 2},
+        ])
+        dogs = self.stats(self.dogs)
+        self.assertEqual(dogs.posts_count, 1)
+        self.assertEqual(dogs.last_activity, post.pub_date)
+
+        Post.objects.filter(author=self.other).first().delete()
+        self.assertEqual(self.stats(self.cats).posts_count, 1)
+
+        # Пересчёт с нуля даёт те же значения.
+        before = list(GroupStats.objects.values_list(
+            'group', 'posts_count', 'top_authors'
+        ))
+        GroupAuthor.objects.all().delete()
+        GroupStats.objects.update(posts_count=0, top_authors='[]')
+        self.assertEqual(directory.rebuild(), 2)
+        self.assertEqual(list(GroupStats.objects.values_list(
+            'group', 'posts_count', 'top_authors'
+        )), before)
+
+    def test_group_rename_updates_directory(self):
+        """Новое название группы попадает в каталог."""
+        self.cats.title = 'Коты'
+        self.cats.save()
+        self.assertEqual(self.stats(self.cats).title, 'Коты')
+
+    @override_settings(GROUPS_PER_PAGE=1)
+    def test_groups_page_is_sorted_and_paginated(self):
+        """Каталог листается по курсору одним запросом в любой сортировке."""
+        Post.objects.create(author=self.author, text='Пост', group=self.dogs)
+        url = reverse('posts:groups')
+        with self.assertNumQueries(1):
+            response = Client().get(url)
+        self.assertEqual(
+            [stats.group for stats in response.context['page_obj']],
+            [self.cats],
+        )
+        response = Client().get(url, {'sort': 'posts'})
+        self.assertEqual(response.context['page_obj'][0].group, self.dogs)
+        self.assertContains(response, 'Leo')
+        cursor = response.context['page_obj'].next_cursor
+        response = Client().get(url, {'sort': 'posts', 'after': cursor})
+        page_obj = response.context['page_obj']
+        self.assertEqual([stats.group for stats in page_obj], [self.cats])
+        self.assertFalse(page_obj.has_next())
@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import graph
+from posts.graph import FollowGraph
+from posts.models import Follow
+
+User = get_user_model()
+
+
+class FollowGraphTests(TestCase):
+    def test_adjacency_and_overlay(self):
+        """Массивы и наложение изменений дают одинаковые ответы."""
+        follows = FollowGraph.from_pairs([(1, 2), (1, 3), (2, 1), (3, 4)])
+        self.assertEqual(follows.following_of(1), [2, 3])
+        self.assertEqual(follows.followers_of(1), [2])
+        self.assertTrue(follows.is_mutual(1, 2))
+        self.assertFalse(follows.is_mutual(1, 3))
+        self.assertEqual(follows.following_of(10), [])
+
+        follows.remove(1, 3)
+        follows.add(1, 5)
+        follows.add(3, 4)
+        self.assertEqual(follows.following_of(1), [2, 5])
+        self.assertEqual(follows.followers_of(5), [1])
+        self.assertEqual(follows.followers_count(3), 0)
+        self.assertEqual(follows.overlay, 2)
+        compacted = follows.compact()
+        self.assertEqual(compacted.overlay, 0)
+        self.assertEqual(
+            sorted(compacted.pairs()), [(1, 2), (1, 5), (2, 1), (3, 4)]
+        )
+
+    def test_suggestions_rank_by_common_follows(self):
+        """Рекомендации: авторы авторов, сначала с большим числом общих."""
+        follows = FollowGraph.from_pairs([
+            (1, 2), (1, 3), (2, 4), (3, 4), (2, 5), (3, 1), (6, 5), (6, 7),
+            (2, 7),
+        ])
+        self.assertEqual(follows.suggestions(1, 2), [4, 5])
+        self.assertEqual(follows.suggestions(1, 5), [4, 5, 7])
+        self.assertEqual(follows.suggestions(4, 5), [])
+
+
+class GraphSyncTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Edward')
+        cls.friend = User.objects.create_user(username='Leo')
+        cls.author = User.objects.create_user(username='Sam')
+        Follow.objects.create(user=cls.user, author=cls.friend)
+        Follow.objects.create(user=cls.friend, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_processes_apply_published_changes(self):
+        """Граф процесса применяет записи журнала из общего кеша."""
+        self.assertEqual(graph.following(self.user.id), [self.friend.id])
+        graph._publish('follow', self.user.id, self.author.id)
+        graph._publish('unfollow', self.user.id, self.friend.id)
+        self.assertEqual(graph.following(self.user.id), [self.author.id])
+        self.assertEqual(graph.followers(self.friend.id), [])
+
+        # Записи вытеснены из кеша: граф строится заново из базы.
+        graph._publish('follow', self.author.id, self.user.id)
+        cache.delete(f'{graph.LOG_KEY}:3')
+        self.assertEqual(graph.following(self.user.id), [self.friend.id])
+
+    def test_follow_page_suggests_authors(self):
+        """Лента подписок и API предлагают авторов знакомых."""
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['suggestions'], [self.author])
+        response = client.get(reverse('api:follow-suggestions'))
+        self.assertEqual(response.json(), [{'username': 'Sam'}])
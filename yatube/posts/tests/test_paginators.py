@@ -0,0 +1,100 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Group, Post
+from posts.paginators import CursorPaginator
+
+User = get_user_model()
+
+CURSOR_PAGINATION = {
+    'index': 'cursor',
+    'group_list': 'cursor',
+    'profile': 'cursor',
+    'follow_index': 'cursor',
+}
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Edward')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.user, group=cls.group, text=f'Пост {i}')
+            for i in range(25)
+        )
+        # Одинаковая дата у части постов проверяет разрешение по id.
+        Post.objects.filter(text__in=['Пост 3', 'Пост 4', 'Пост 5']).update(
+            pub_date=timezone.now()
+        )
+        cls.ordered = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def setUp(self):
+        self.guest_client = Client()
+        cache.clear()
+
+    def test_pages_cover_feed_without_gaps(self):
+        """Страницы по курсору проходят ленту без пропусков и повторов."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        page = paginator.page()
+        collected = list(page)
+        while page.has_next():
+            page = paginator.page(after=page.next_cursor)
+            collected.extend(page)
+        self.assertEqual(collected, self.ordered)
+        self.assertEqual(len(page), 5)
+        self.assertFalse(page.has_next())
+
+    def test_previous_page(self):
+        """Курсор before возвращает предыдущую страницу."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        first = paginator.page()
+        second = paginator.page(after=first.next_cursor)
+        self.assertTrue(second.has_previous())
+        back = paginator.page(before=second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Неверный курсор не ломает страницу."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        page = paginator.get_page(after='не-курсор')
+        self.assertEqual(list(page), self.ordered[:10])
+
+    def test_deep_page_has_constant_query_count(self):
+        """Глубокая страница выбирается одним запросом без COUNT."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        cursor = paginator.encode_cursor(self.ordered[19])
+        with self.assertNumQueries(1):
+            page = paginator.page(after=cursor)
+            self.assertEqual(list(page), self.ordered[20:])
+
+    @override_settings(FEED_PAGINATION=CURSOR_PAGINATION)
+    def test_views_use_cursor_pagination(self):
+        """Ленты переключаются на курсорную пагинацию настройкой."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'slug'}),
+            reverse('posts:profile', kwargs={'username': 'Edward'}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                page_obj = response.context['page_obj']
+                self.assertEqual(list(page_obj), self.ordered[:10])
+                response = self.guest_client.get(
+                    url, {'after': page_obj.next_cursor}
+                )
+                self.assertEqual(
+                    list(response.context['page_obj']), self.ordered[10:20]
+                )
+                self.assertContains(response, '?before=')
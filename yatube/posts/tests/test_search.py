@@ -0,0 +1,131 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import search, stemmer
+from posts.models import Comment, Post, SearchDocument
+
+User = get_user_model()
+
+
+class StemmerTests(TestCase):
+    def test_word_forms_share_stem(self):
+        """Формы одного слова приводятся к одной основе."""
+        for forms in (
+            ('кошка', 'кошки', 'кошкой', 'кошку'),
+            ('бежать', 'бежал', 'бежала'),
+            ('красивый', 'красивая', 'красивыми'),
+        ):
+            with self.subTest(forms=forms):
+                self.assertEqual(
+                    len({stemmer.stem(word) for word in forms}), 1
+                )
+
+    def test_terms_skip_stop_words(self):
+        self.assertEqual(stemmer.terms('Django и ЁЖИК'), ['django', 'ежик'])
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Edward')
+        cls.cats = Post.objects.create(
+            author=cls.user, text='Кошки, кошки и ещё раз кошки'
+        )
+        cls.dogs = Post.objects.create(
+            author=cls.user, text='Собака лает, караван идёт'
+        )
+        Comment.objects.create(
+            post=cls.dogs, author=cls.user, text='А у меня кошка'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def found(self, query):
+        return [post_id for _, post_id in search.ranked_post_ids(query)]
+
+    def test_documents_follow_changes(self):
+        """Индекс обновляется при изменении и удалении записей."""
+        self.assertEqual(
+            SearchDocument.objects.filter(post=self.dogs).count(), 2
+        )
+        cats = Post.objects.get(pk=self.cats.pk)
+        cats.text = 'Про попугаев'
+        cats.save()
+        self.assertEqual(self.found('кошкой'), [self.dogs.id])
+        Comment.objects.filter(post=self.dogs).delete()
+        self.assertEqual(self.found('кошкой'), [])
+
+    def test_backends_agree(self):
+        """Все движки находят посты по словоформам и тексту комментариев."""
+        for backend in ('auto', 'memory'):
+            with self.subTest(backend=backend):
+                with self.settings(SEARCH_BACKEND=backend):
+                    self.assertEqual(
+                        self.found('кошкой'), [self.cats.id, self.dogs.id]
+                    )
+                    self.assertEqual(self.found('собаки и караван'),
+                                     [self.dogs.id])
+                    self.assertEqual(self.found('попугай'), [])
+
+    @override_settings(SEARCH_BACKEND='memory')
+    def test_memory_index_applies_changes(self):
+        """Индекс в памяти применяет изменения, не перечитывая базу."""
+        backend = search.get_backend()
+        self.assertEqual(self.found('кошкой'), [self.cats.id, self.dogs.id])
+        with mock.patch.object(
+            backend, '_load', wraps=backend._load
+        ) as load:
+            parrot = Post.objects.create(author=self.user, text='Попугай')
+            self.assertEqual(self.found('попугаи'), [parrot.id])
+            Comment.objects.filter(post=self.dogs).delete()
+            self.assertEqual(self.found('кошкой'), [self.cats.id])
+            load.assert_not_called()
+            cache.delete(search.GENERATION_KEY)
+            self.found('кошкой')
+            self.found('кошкой')
+            self.assertEqual(load.call_count, 1)
+
+    @override_settings(NUMBER_OF_POSTS=1)
+    def test_view_paginates_by_cursor(self):
+        """Страница поиска выводит результаты и ссылку со строкой запроса."""
+        response = self.client.get(reverse('posts:search'), {'q': 'кошки'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj), [self.cats])
+        self.assertContains(response, 'q=%D0%BA%D0%BE%D1%88%D0%BA%D0%B8')
+        response = self.client.get(
+            reverse('posts:search'),
+            {'q': 'кошки', 'after': page_obj.next_cursor},
+        )
+        self.assertEqual(list(response.context['page_obj']), [self.dogs])
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    def test_admin_uses_index(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собаку'}
+        )
+        self.assertEqual(list(response.context['cl'].result_list), [self.dogs])
+
+    @override_settings(SEARCH_MAX_RESULTS=1)
+    def test_admin_keeps_all_results_in_rank_order(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'кошка'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.cats, self.dogs]
+        )
@@ -0,0 +1,110 @@
+import json
+from xml.etree import ElementTree
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+@override_settings(SYNDICATION_ITEMS=2)
+class SyndicationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Leo')
+        cls.other = User.objects.create_user(username='Edward')
+        cls.group = Group.objects.create(
+            title='Кошки', slug='cats', description='Про кошек'
+        )
+        cls.old = Post.objects.create(
+            author=cls.author, text='Старый пост', group=cls.group
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост <b>&</b>\nвторая строка',
+            group=cls.group,
+        )
+        cls.foreign = Post.objects.create(author=cls.other, text='Чужой')
+
+    def setUp(self):
+        self.client = Client()
+
+    def body(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_formats(self):
+        """Общая лента отдаётся в RSS, Atom и JSON Feed."""
+        response = self.client.get(reverse('posts:feed', args=['rss']))
+        self.assertEqual(
+            response['Content-Type'], 'application/rss+xml; charset=utf-8'
+        )
+        self.assertIn('public', response['Cache-Control'])
+        channel = ElementTree.fromstring(self.body(response)).find('channel')
+        self.assertEqual(
+            [item.findtext('title') for item in channel.iter('item')],
+            ['Чужой', 'Пост <b>&</b>'],
+        )
+
+        response = self.client.get(reverse('posts:feed', args=['atom']))
+        feed = ElementTree.fromstring(self.body(response))
+        entries = feed.findall(f'{ATOM}entry')
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(
+            entries[1].findtext(f'{ATOM}content'),
+            'Пост <b>&</b>\nвторая строка',
+        )
+
+        response = self.client.get(reverse('posts:feed', args=['json']))
+        feed = json.loads(self.body(response))
+        self.assertEqual(
+            [item['id'] for item in feed['items']],
+            [str(self.foreign.id), str(self.post.id)],
+        )
+        self.assertEqual(feed['items'][1]['tags'], ['Кошки'])
+
+    def test_group_and_profile_feeds(self):
+        """Ленты группы и автора содержат только их посты."""
+        response = self.client.get(
+            reverse('posts:group_feed', args=['cats', 'json'])
+        )
+        feed = json.loads(self.body(response))
+        self.assertEqual(feed['title'], 'Yatube: Кошки')
+        self.assertEqual(
+            [item['id'] for item in feed['items']],
+            [str(self.post.id), str(self.old.id)],
+        )
+        response = self.client.get(
+            reverse('posts:profile_feed', args=['Edward', 'json'])
+        )
+        feed = json.loads(self.body(response))
+        self.assertEqual(
+            [item['id'] for item in feed['items']], [str(self.foreign.id)]
+        )
+
+    def test_unknown_feed_is_404(self):
+        """Неизвестный формат, группа или автор дают 404."""
+        for url in (
+            reverse('posts:feed', args=['xml']),
+            reverse('posts:group_feed', args=['dogs', 'rss']),
+            reverse('posts:profile_feed', args=['Nobody', 'rss']),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_conditional_get(self):
+        """Повторный опрос неизменной ленты стоит одного запроса."""
+        url = reverse('posts:feed', args=['rss'])
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,124 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Edward')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый текст',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def test_generate_stores_rendition(self):
+        """Миниатюра сохраняется в посте вместе с размерами."""
+        thumbnails.generate(self.post.id)
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.thumbnail_url)
+        self.assertEqual(
+            (self.post.thumbnail_width, self.post.thumbnail_height),
+            (960, 339)
+        )
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, self.post.thumbnail_url)
+
+    @override_settings(
+        POST_IMAGE_WIDTHS=(320, 960), POST_IMAGE_FORMATS=('WEBP', 'JPEG')
+    )
+    def test_generate_stores_responsive_sources(self):
+        """Для картинки готовятся srcset по ширинам и форматам."""
+        thumbnails.generate(self.post.id)
+        self.post.refresh_from_db()
+        picture = self.post.picture
+        self.assertEqual(len(picture['files']), 4)
+        self.assertEqual(picture['sources'][0]['type'], 'image/webp')
+        self.assertIn('320w', picture['sources'][0]['srcset'])
+        self.assertIn('960w', picture['srcset'])
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, 'sizes="(max-width: 992px)')
+        old_files = picture['files']
+        thumbnails.generate(self.post.id)
+        for name in old_files:
+            with self.subTest(name=name):
+                self.assertFalse(default_storage.exists(name))
+
+    def test_pages_do_not_touch_pillow(self):
+        """Страницы с картинками отдаются без обращения к Pillow."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'Edward'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        ]
+        with mock.patch('PIL.Image.open') as image_open:
+            for url in urls:
+                with self.subTest(url=url):
+                    response = self.authorized_client.get(url)
+                    self.assertContains(response, self.post.image.url)
+        image_open.assert_not_called()
+
+    def test_upload_schedules_thumbnail(self):
+        """Загрузка картинки ставит миниатюру в очередь."""
+        with mock.patch('posts.thumbnails.schedule') as schedule:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                {
+                    'text': 'Пост с картинкой',
+                    'image': SimpleUploadedFile(
+                        'other.gif', SMALL_GIF, 'image/gif'
+                    ),
+                }
+            )
+            self.authorized_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+                {'text': 'Без новой картинки'}
+            )
+        schedule.assert_called_once()
+        self.assertEqual(schedule.call_args[0][0].text, 'Пост с картинкой')
+
+    def test_command_generates_missing_thumbnails(self):
+        """Команда generate_thumbnails создаёт недостающие миниатюры."""
+        call_command('generate_thumbnails', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.thumbnail_url)
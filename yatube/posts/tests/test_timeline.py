@@ -0,0 +1,109 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.follower = User.objects.create_user(username='Pushkin')
+        cls.author = User.objects.create_user(username='Leo')
+        cls.other = User.objects.create_user(username='Edward')
+        cls.old_post = Post.objects.create(author=cls.author, text='Старый')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.follower)
+
+    def feed(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_timeline(self):
+        """Подписка добавляет в ленту уже опубликованные посты автора."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.follower, post=self.old_post
+            ).exists()
+        )
+        self.assertEqual(self.feed(), [self.old_post])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост раскладывается в ленты подписчиков автора."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            TimelineEntry.objects.get(user=self.follower, post=post).pub_date,
+            post.pub_date
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.other))
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    def test_unfollow_clears_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.filter(user=self.follower, author=self.author).delete()
+        self.assertFalse(TimelineEntry.objects.filter(user=self.follower))
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_posts_read_on_demand(self):
+        """Посты популярных авторов не раскладываются, а читаются напрямую."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый')
+        self.assertFalse(TimelineEntry.objects.filter(post=post))
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_follow_to_celebrity_backfills_timeline(self):
+        """Подписка на популярного автора тоже заполняет ленту."""
+        Follow.objects.create(user=self.other, author=self.author)
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.follower, post=self.old_post
+            ).exists()
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_below_limit_fans_out_missed_posts(self):
+        """Посты, опубликованные без раскладки, остаются в ленте."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый')
+        self.assertFalse(TimelineEntry.objects.filter(post=post))
+        Follow.objects.filter(user=self.other, author=self.author).delete()
+        self.assertEqual(timeline.celebrity_ids(self.follower), [])
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.follower, post=post
+            ).exists()
+        )
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_celebrity_ids_count_all_followers(self):
+        """Популярность автора считается по всем его подписчикам."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertEqual(timeline.celebrity_ids(self.follower), [])
+        Follow.objects.create(user=self.other, author=self.author)
+        self.assertEqual(
+            timeline.celebrity_ids(self.follower), [self.author.id]
+        )
+
+    def test_backfill_command_rebuilds_timelines(self):
+        """Команда backfill_timelines восстанавливает ленты."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('backfill_timelines', stdout=StringIO())
+        self.assertEqual(self.feed(), [self.old_post])
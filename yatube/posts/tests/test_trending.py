@@ -0,0 +1,90 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import trending
+from posts.models import Comment, Follow, Group, Post, TrendingScore
+
+User = get_user_model()
+
+
+@override_settings(TRENDING_SIZE=2)
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Leo')
+        cls.reader = User.objects.create_user(username='Edward')
+        cls.group = Group.objects.create(
+            title='Кошки', slug='cats', description='Про кошек'
+        )
+        cls.quiet = Post.objects.create(author=cls.author, text='Тихий')
+        cls.busy = Post.objects.create(
+            author=cls.author, text='Обсуждаемый', group=cls.group
+        )
+        cls.fresh = Post.objects.create(author=cls.author, text='Новый')
+
+    def setUp(self):
+        cache.clear()
+
+    def score(self, kind, object_id):
+        return TrendingScore.objects.get(
+            kind=kind, object_id=object_id
+        ).score
+
+    def test_comments_raise_post_and_group(self):
+        """Комментарии поднимают пост и его группу в рейтинге."""
+        for _ in range(3):
+            Comment.objects.create(
+                post=self.busy, author=self.reader, text='Комментарий'
+            )
+        ranking = trending.refresh()
+        self.assertEqual(ranking['posts'][0], self.busy)
+        self.assertEqual(len(ranking['posts']), 2)
+        self.assertEqual(
+            [stats.group for stats in ranking['groups']], [self.group]
+        )
+
+    def test_recent_events_outweigh_old_ones(self):
+        """Вклад события уменьшается вдвое за период полураспада."""
+        era = trending._era(1e9)
+        half_life = 6 * 60 * 60
+        old = trending._decayed(1, 1e9, era)
+        new = trending._decayed(1, 1e9 + half_life, era)
+        self.assertAlmostEqual(new / old, 2)
+
+    def test_follow_adds_author_reach(self):
+        """Подписка увеличивает охват автора."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertGreater(
+            self.score(TrendingScore.AUTHOR, self.author.id), 0
+        )
+
+    def test_previous_era_is_rescaled(self):
+        """Счета прошлой эпохи переводятся в единицы текущей."""
+        now = 1e9
+        era = trending._era(now)
+        with mock.patch('time.time', return_value=now):
+            Follow.objects.create(user=self.reader, author=self.author)
+        before = self.score(TrendingScore.AUTHOR, self.author.id)
+        trending._rescale(era + 1)
+        self.assertAlmostEqual(
+            self.score(TrendingScore.AUTHOR, self.author.id),
+            before * 2.0 ** -trending.ERA_HALF_LIVES,
+        )
+
+    def test_page_is_a_cached_read(self):
+        """Страница популярного читает готовый рейтинг из кеша."""
+        call_command('refresh_trending', stdout=StringIO())
+        url = reverse('posts:trending')
+        with self.assertNumQueries(0):
+            response = Client().get(url)
+        self.assertContains(response, 'Новый')
+        self.assertNotIn(
+            self.quiet, response.context['posts']
+        )
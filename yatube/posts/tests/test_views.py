@@ -4,8 +4,11 @@ from http import HTTPStatus
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
 
@@ -285,17 +288,53 @@ class PostCacheTests(TestCase):
         self.authorized_client.force_login(self.user)
 
     def test_index_page_cache(self):
-        """Проверка кеширования главной страницы."""
+        """Карточки постов берутся из кеша до изменения поста."""
+        cache.clear()
         urls = ['', 'index']
+        self.authorized_client.get(reverse('posts:index'))
+        # Обновление в обход save() не меняет версию поста.
+        Post.objects.filter(id=self.post.id).update(text='Изменённый текст')
         for url in urls:
-            response = self.authorized_client.get(
-                reverse(f'posts:{url}')
-            )
-            Post.objects.filter(id=self.post.id).delete()
-            response_cached = self.authorized_client.get(
-                reverse(f'posts:{url}')
-            )
-            self.assertEqual(response.content, response_cached.content)
+            with self.subTest(url=url):
+                response = self.authorized_client.get(reverse(f'posts:{url}'))
+                self.assertContains(response, 'Тестовый текст')
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            {'text': 'Новый текст', 'group': self.group.id}
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(reverse(f'posts:{url}'))
+                self.assertContains(response, 'Новый текст')
+
+    def test_card_invalidated_by_comment_and_group(self):
+        """Комментарий и изменение группы обновляют карточку поста."""
+        cache.clear()
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'Edward'}),
+        ]
+        for url in urls:
+            self.authorized_client.get(url)
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'Комментарий'}
+        )
+        self.group.title = 'Новое название'
+        self.group.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, 'комментариев: 1')
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Новое название')
+
+    def test_deleted_post_leaves_feed(self):
+        """Удалённый пост не остаётся в ленте из кеша."""
+        self.authorized_client.get(reverse('posts:index'))
+        Post.objects.filter(id=self.post.id).delete()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Тестовый текст')
 
 
 class FollowViewsTest(TestCase):
@@ -461,3 +500,194 @@ class CommentViewTest(TestCase):
         )
         self.assertEqual(Comment.objects.count(), comment_count)
         self.assertEqual(response_guest.status_code, HTTPStatus.OK)
+
+    @override_settings(COMMENTS_PER_PAGE=2)
+    def test_comments_are_paginated(self):
+        """Комментарии выводятся порциями, остальные подгружаются."""
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text=f'Ответ {i}')
+            for i in range(4)
+        )
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        response = self.guest_client.get(url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 2)
+        self.assertTrue(comments.has_next())
+        more_url = reverse('posts:comments', kwargs={'post_id': self.post.id})
+        self.assertContains(response, more_url)
+        seen = [comment.id for comment in comments]
+        cursor = comments.next_cursor
+        while cursor:
+            response = self.guest_client.get(
+                more_url, {'after': cursor, 'format': 'json'}
+            )
+            data = response.json()
+            seen += [comment['id'] for comment in data['comments']]
+            cursor = data['next']
+        self.assertEqual(
+            seen,
+            list(Comment.objects.filter(post=self.post)
+                 .order_by('-created', '-id').values_list('id', flat=True)),
+        )
+        response = self.guest_client.get(
+            more_url, {'after': comments.next_cursor}
+        )
+        self.assertTemplateUsed(response, 'includes/comments.html')
+        self.assertNotContains(response, '<html')
+
+    def test_comments_query_count(self):
+        """Авторы комментариев загружаются тем же запросом."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        with CaptureQueriesContext(connection) as single:
+            self.guest_client.get(url)
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=User.objects.create_user(
+                username=f'reader{i}'), text=f'Ответ {i}')
+            for i in range(5)
+        )
+        with CaptureQueriesContext(connection) as many:
+            self.guest_client.get(url)
+        self.assertEqual(len(many), len(single))
+
+    def test_comments_of_missing_post(self):
+        response = self.guest_client.get(
+            reverse('posts:comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class FeedQueryCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Edward')
+        cls.author = User.objects.create_user(
+            username='Leo', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        Post.objects.create(author=cls.author, group=cls.group, text='Пост')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'slug'}),
+            reverse('posts:profile', kwargs={'username': 'Leo'}),
+            reverse('posts:follow_index'),
+        ]
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.authorized_client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return len(context)
+
+    def test_feed_query_count_does_not_depend_on_posts(self):
+        """Число запросов ленты не зависит от количества постов."""
+        single = {url: self.count_queries(url) for url in self.urls}
+        Post.objects.bulk_create(
+            Post(author=self.author, group=self.group, text=f'Пост {i}')
+            for i in range(settings.NUMBER_OF_POSTS)
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), single[url])
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Edward')
+        cls.author = User.objects.create_user(username='Leo')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.urls = [
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:profile', kwargs={'username': 'Leo'}),
+            reverse('posts:group_list', kwargs={'slug': 'slug'}),
+        ]
+
+    def revalidate(self, url, etag):
+        return self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_page_not_modified(self):
+        """Неизменившаяся страница отдаётся ответом 304 без рендеринга."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.authorized_client.get(url)['ETag']
+                with self.assertTemplateNotUsed('base.html'):
+                    response = self.revalidate(url, etag)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+
+    def test_comment_changes_etag(self):
+        """Новый комментарий меняет версию всех страниц с постом."""
+        etags = {url: self.authorized_client.get(url)['ETag']
+                 for url in self.urls}
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.revalidate(url, etag).status_code, HTTPStatus.OK
+                )
+        etags = {url: self.authorized_client.get(url)['ETag']
+                 for url in self.urls}
+        comment.delete()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.revalidate(url, etag).status_code, HTTPStatus.OK
+                )
+
+    def test_renames_change_etag(self):
+        """Имя автора и название группы меняют версии страниц с ними."""
+        group_url = reverse('posts:group_list', kwargs={'slug': 'slug'})
+        profile_url = reverse('posts:profile', kwargs={'username': 'Leo'})
+        etag = self.authorized_client.get(group_url)['ETag']
+        self.author.first_name = 'Лев'
+        self.author.save()
+        self.assertEqual(
+            self.revalidate(group_url, etag).status_code, HTTPStatus.OK
+        )
+        etag = self.authorized_client.get(profile_url)['ETag']
+        self.group.slug = 'other'
+        self.group.save()
+        self.assertEqual(
+            self.revalidate(profile_url, etag).status_code, HTTPStatus.OK
+        )
+
+    def test_follow_state_changes_profile_etag(self):
+        """Подписка зрителя меняет версию профиля автора."""
+        url = reverse('posts:profile', kwargs={'username': 'Leo'})
+        etag = self.authorized_client.get(url)['ETag']
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Отписаться')
+
+    def test_post_detail_last_modified(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
@@ -0,0 +1,162 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import writebehind
+from posts.models import (
+    Comment, Follow, Post, SearchDocument, TimelineEntry
+)
+
+User = get_user_model()
+
+
+class WriteBehindTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Edward')
+        cls.author = User.objects.create_user(username='Leo')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        overridden = override_settings(
+            WRITE_BEHIND=True,
+            WRITE_BEHIND_DIR=self.directory,
+            WRITE_BEHIND_INTERVAL=0,
+        )
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}
+        )
+
+    def test_comment_is_journaled_and_visible_to_author(self):
+        """Комментарий подтверждается до записи в базу и виден автору."""
+        response = self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'Отложенный комментарий'},
+        )
+        self.assertRedirects(response, self.post_url)
+        self.assertFalse(Comment.objects.exists())
+        journal = os.path.join(self.directory, f'{os.getpid()}.journal')
+        with open(journal, encoding='utf-8') as stream:
+            self.assertEqual(json.loads(stream.read())['op'], 'comment')
+        self.assertContains(
+            self.client.get(self.post_url), 'Отложенный комментарий'
+        )
+        self.assertNotContains(
+            Client().get(self.post_url), 'Отложенный комментарий'
+        )
+
+        writebehind.flush()
+        comment = Comment.objects.get()
+        self.assertEqual(comment.author, self.user)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertTrue(SearchDocument.objects.filter(
+            kind=SearchDocument.COMMENT, object_id=comment.id
+        ).exists())
+        self.assertContains(
+            self.client.get(self.post_url), 'Отложенный комментарий', count=1
+        )
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_follows_are_batched(self):
+        """Подписки применяются пачкой, последняя запись побеждает."""
+        follow = reverse('posts:profile_follow', kwargs={'username': 'Leo'})
+        unfollow = reverse(
+            'posts:profile_unfollow', kwargs={'username': 'Leo'}
+        )
+        self.client.get(follow)
+        self.client.get(unfollow)
+        self.client.get(follow)
+        self.assertFalse(Follow.objects.exists())
+        self.assertTrue(writebehind.pending_following(
+            self.client.get(self.post_url).wsgi_request, self.author.id
+        ))
+        writebehind.flush()
+        self.assertTrue(
+            Follow.objects.filter(user=self.user, author=self.author).exists()
+        )
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.author.profile.followers_count, 1)
+
+        self.client.get(unfollow)
+        writebehind.flush()
+        self.assertFalse(Follow.objects.exists())
+        self.author.profile.refresh_from_db()
+        self.assertEqual(self.author.profile.followers_count, 0)
+
+    @override_settings(WRITE_BEHIND_ATTEMPTS=2)
+    def test_failing_segment_is_moved_aside(self):
+        """Сегмент с постоянной ошибкой не задерживает следующие."""
+        broken = os.path.join(self.directory, f'{os.getpid()}.1.segment')
+        with open(broken, 'w', encoding='utf-8') as stream:
+            stream.write(json.dumps({'id': 'a', 'at': 0, 'op': 'comment'}))
+            stream.write('\n')
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'После сломанного'},
+        )
+        with self.assertRaises(KeyError):
+            writebehind.flush()
+        self.assertFalse(Comment.objects.exists())
+        with self.assertLogs('posts.writebehind', 'ERROR'):
+            writebehind.flush()
+        self.assertEqual(
+            os.listdir(self.directory), [os.path.basename(broken) + '.failed']
+        )
+        self.assertTrue(Comment.objects.filter(text='После сломанного'))
+        self.assertEqual(writebehind.recover(), 0)
+
+    def test_batched_follow_runs_follow_signals(self):
+        """Отложенная подписка обновляет ленту, как обычная."""
+        self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'Leo'})
+        )
+        writebehind.flush()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user, post=self.post
+        ).exists())
+
+    def test_concurrent_follow_is_not_signalled_twice(self):
+        """Пара, которую уже записал другой процесс, не учитывается снова."""
+        other = User.objects.create_user(username='Pushkin')
+        Follow.objects.create(user=self.user, author=self.author)
+        inserted = writebehind._insert_follows(
+            [(self.user.id, self.author.id), (other.id, self.author.id)]
+        )
+        self.assertEqual(
+            [(follow.user_id, follow.author_id) for follow in inserted],
+            [(other.id, self.author.id)]
+        )
+        self.assertEqual(Follow.objects.count(), 2)
+
+    def test_recover_is_idempotent(self):
+        """Журнал завершившегося процесса применяется ровно один раз."""
+        entry = {
+            'id': 'a', 'at': 0, 'op': 'comment', 'post': self.post.id,
+            'author': self.user.id, 'text': 'После сбоя',
+            'created': timezone.now().isoformat(),
+        }
+        path = os.path.join(self.directory, '999999999.journal')
+        with open(path, 'w', encoding='utf-8') as stream:
+            stream.write(json.dumps(entry) + '\n')
+            stream.write('{"id": "b", "op": "comm')
+        with self.assertLogs('posts.writebehind', 'WARNING'):
+            self.assertEqual(writebehind.recover(), 1)
+        writebehind.apply([entry])
+        self.assertEqual(Comment.objects.filter(text='После сбоя').count(), 1)
+        self.assertEqual(os.listdir(self.directory), [])
@@ -0,0 +1,196 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+Миниатюры создаются пулом потоков сразу после сохранения поста: по
+одной на каждую ширину из POST_IMAGE_WIDTHS в каждом поддерживаемом
+формате из POST_IMAGE_FORMATS. Адреса и размеры записываются в сам
+пост, поэтому шаблоны выводят готовые srcset (или оригинал, пока
+миниатюры не готовы) и не обращаются к Pillow при GET-запросах.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image
+
+from core import cache, instrumentation, metrics
+from . import counters
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {
+    'AVIF': 'avif',
+    'WEBP': 'webp',
+    'JPEG': 'jpg',
+    'PNG': 'png',
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def queue_depth():
+    """Число миниатюр, ожидающих генерации в этом процессе."""
+    return _pending
+
+
+def supported_formats():
+    """Форматы из настроек, которые умеет записывать установленный Pillow."""
+    Image.init()
+    return [
+        name for name in settings.POST_IMAGE_FORMATS
+        if name in Image.SAVE and name in EXTENSIONS
+    ]
+
+
+def _crop_box(size, ratio):
+    """Центральная область картинки с заданным соотношением сторон."""
+    width, height = size
+    if width / height > ratio:
+        cropped = round(height * ratio)
+        left = (width - cropped) // 2
+        return left, 0, left + cropped, height
+    cropped = round(width / ratio)
+    top = (height - cropped) // 2
+    return 0, top, width, top + cropped
+
+
+def _render(image, size, image_format):
+    width, height = size
+    box = _crop_box(image.size, width / height)
+    rendition = image.crop(box).resize(size, Image.LANCZOS)
+    if image_format == 'JPEG':
+        rendition = rendition.convert('RGB')
+    elif rendition.mode not in ('RGB', 'RGBA'):
+        rendition = rendition.convert('RGBA')
+    buffer = BytesIO()
+    rendition.save(
+        buffer, image_format, quality=settings.POST_IMAGE_QUALITY
+    )
+    return ContentFile(buffer.getvalue())
+
+
+def _renditions(post):
+    base_width, base_height = map(
+        int, settings.POST_THUMBNAIL_GEOMETRY.split('x')
+    )
+    stem = os.path.splitext(os.path.basename(post.image.name))[0]
+    with post.image.open('rb') as source:
+        image = Image.open(source)
+        image.load()
+    files = []
+    sources = []
+    for image_format in supported_formats():
+        srcset = []
+        for width in sorted(settings.POST_IMAGE_WIDTHS):
+            size = (width, round(width * base_height / base_width))
+            name = default_storage.save(
+                f'posts/renditions/{post.id}/{stem}-{width}.'
+                f'{EXTENSIONS[image_format]}',
+                _render(image, size, image_format),
+            )
+            files.append(name)
+            srcset.append(f'{default_storage.url(name)} {width}w')
+        sources.append({
+            'type': Image.MIME.get(image_format, 'image/*'),
+            'srcset': ', '.join(srcset),
+        })
+    if not sources:
+        raise ValueError(
+            'Pillow не поддерживает ни один из POST_IMAGE_FORMATS'
+        )
+    # Последний формат — запасной: его выводит сам тег img.
+    fallback = sources.pop()
+    picture = {
+        'sizes': settings.POST_IMAGE_SIZES,
+        'sources': sources,
+        'srcset': fallback['srcset'],
+        'files': files,
+    }
+    return {
+        'thumbnail_url': default_storage.url(files[-1]),
+        'thumbnail_width': size[0],
+        'thumbnail_height': size[1],
+        'renditions': json.dumps(picture),
+    }
+
+
+def generate(post_id):
+    """Создаёт миниатюры картинки поста и сохраняет их в посте."""
+    post = Post.objects.filter(pk=post_id).only(
+        'id', 'image', 'renditions'
+    ).first()
+    if post is None:
+        return
+    old_files = post.picture['files'] if post.picture else []
+    fields = {
+        'thumbnail_url': '',
+        'thumbnail_width': None,
+        'thumbnail_height': None,
+        'renditions': '',
+    }
+    if post.image:
+        started = time.perf_counter()
+        with instrumentation.timed('thumbnails'):
+            fields = _renditions(post)
+        metrics.observe(
+            'yatube_thumbnail_seconds', time.perf_counter() - started,
+            settings.METRICS_LATENCY_BUCKETS,
+        )
+    # Новая дата изменения меняет версию карточки поста.
+    Post.objects.filter(pk=post_id).update(edited=timezone.now(), **fields)
+    counters.posts_touched([post_id])
+    cache.invalidate('feed:index')
+    new_files = json.loads(fields['renditions'] or '{}').get('files', [])
+    for name in set(old_files) - set(new_files):
+        default_storage.delete(name)
+
+
+def _run(post_id):
+    global _pending
+    try:
+        generate(post_id)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру поста %s', post_id)
+    finally:
+        with _executor_lock:
+            _pending -= 1
+            metrics.set_gauge('yatube_thumbnail_queue_depth', _pending)
+        close_old_connections()
+
+
+def _submit(post_id):
+    global _pending
+    if not settings.THUMBNAIL_ASYNC:
+        generate(post_id)
+        return
+    with _executor_lock:
+        _pending += 1
+        metrics.set_gauge('yatube_thumbnail_queue_depth', _pending)
+    _get_executor().submit(_run, post_id)
+
+
+def schedule(post):
+    """Ставит миниатюру в очередь после фиксации транзакции с постом."""
+    transaction.on_commit(lambda: _submit(post.id))
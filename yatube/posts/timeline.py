@@ -0,0 +1,156 @@
+"""Лента подписок с раскладкой постов по подписчикам при записи.
+
+Пост автора раскладывается в ленты всех его подписчиков при публикации
+(fan-out-on-write). Для авторов, у которых подписчиков больше
+settings.TIMELINE_FANOUT_LIMIT, записи не раскладываются: их посты
+подмешиваются в ленту при чтении (fan-out-on-read).
+
+Подписка заполняет ленту последними постами автора независимо от его
+популярности, а когда после отписки автор перестаёт быть популярным,
+его посты раскладываются по лентам всех оставшихся подписчиков: иначе
+посты, опубликованные без раскладки, пропали бы из их лент.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Follow, Post, PostQuerySet, Profile, TimelineEntry
+from .utils import paginate
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def is_celebrity(author_id):
+    """Подписчиков слишком много для раскладки при записи."""
+    return Profile.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+def celebrity_ids(user):
+    """Авторы из подписок пользователя, чьи посты читаются напрямую."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__profile__followers_count__gt=(
+                settings.TIMELINE_FANOUT_LIMIT
+            ),
+        ).values_list('author_id', flat=True)
+    )
+
+
+def _entries(post, user_ids):
+    return (
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post.id,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in user_ids
+    )
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).iterator()
+    for batch in _batches(_entries(post, followers),
+                          settings.TIMELINE_BATCH_SIZE):
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def _backfill(user_ids, author_id):
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).only('id', 'author_id', 'pub_date')
+    if settings.TIMELINE_BACKFILL_POSTS is not None:
+        posts = posts[:settings.TIMELINE_BACKFILL_POSTS]
+    posts = list(posts)
+    entries = (
+        entry
+        for users in _batches(user_ids, settings.TIMELINE_BATCH_SIZE)
+        for post in posts
+        for entry in _entries(post, users)
+    )
+    for batch in _batches(entries, settings.TIMELINE_BATCH_SIZE):
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def add_follow(user_id, author_id):
+    """Заполняет ленту подписчика постами нового автора."""
+    _backfill([user_id], author_id)
+
+
+def remove_follow(user_id, author_id):
+    """Убирает из ленты подписчика посты автора, от которого он отписался."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+    # Счётчик подписчиков уже уменьшен: автор только что стал обычным.
+    if Profile.objects.filter(
+        user_id=author_id,
+        followers_count=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists():
+        _backfill(
+            Follow.objects.filter(author_id=author_id).values_list(
+                'user_id', flat=True
+            ).iterator(),
+            author_id,
+        )
+
+
+def rebuild(user):
+    """Пересобирает ленту пользователя с нуля по текущим подпискам."""
+    TimelineEntry.objects.filter(user=user).delete()
+    authors = Follow.objects.filter(user=user).values_list(
+        'author_id', flat=True
+    )
+    for author_id in authors:
+        add_follow(user.id, author_id)
+
+
+def source(user):
+    """Записи, из которых строится лента подписок пользователя.
+
+    Если пользователь подписан только на обычных авторов, это записи
+    ленты: страница читается одним проходом по индексу
+    (user, -pub_date, -id). Иначе — посты, к которым подмешаны посты
+    популярных авторов.
+    """
+    celebrities = celebrity_ids(user)
+    if celebrities:
+        entries = TimelineEntry.objects.filter(user=user).values('post_id')
+        return Post.objects.feed().filter(
+            Q(id__in=entries) | Q(author_id__in=celebrities)
+        )
+    return TimelineEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    ).only(
+        'id', 'pub_date',
+        *(f'post__{name}' for name in PostQuerySet.FEED_FIELDS)
+    )
+
+
+def posts_of(rows):
+    """Посты страницы, построенной по source()."""
+    return [
+        row.post if isinstance(row, TimelineEntry) else row for row in rows
+    ]
+
+
+def timeline_page(request, user):
+    """Страница ленты подписок пользователя."""
+    page_obj = paginate(request, source(user), 'follow_index')
+    page_obj.object_list = posts_of(page_obj)
+    return page_obj
@@ -0,0 +1,309 @@
+"""Потоковая выгрузка и загрузка групп, пользователей, постов, комментариев
+и подписок в NDJSON и CSV.
+
+Выгрузка читает таблицы итератором, загрузка копит записи пачками и
+пишет их через bulk_create, поэтому память не зависит от объёма данных.
+bulk_create не отправляет сигналы post_save, так что профили и строки
+каталога для новых пользователей и групп создаются сразу, а счётчики,
+ленты подписок и поисковый индекс пересобираются один раз после
+загрузки.
+
+Посты и комментарии сохраняют свои id, пользователи и группы
+связываются по username и slug. Запись, чей id, username или slug уже
+есть в базе, не загружается и считается пропущенной, как и комментарии
+к посту, не загруженному из-за такого совпадения: иначе они достались
+бы чужому посту. Файлы картинок переносятся отдельно вместе с
+каталогом MEDIA_ROOT, миниатюры создаёт generate_thumbnails.
+"""
+import csv
+import json
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core import cache
+from . import counters, directory, search, timeline
+from .models import Comment, Follow, Group, GroupStats, Post, Profile, User
+
+# Порядок важен: записи ссылаются только на виды, идущие раньше.
+KINDS = ('groups', 'users', 'posts', 'comments', 'follows')
+MODELS = {
+    'groups': Group,
+    'users': User,
+    'posts': Post,
+    'comments': Comment,
+    'follows': Follow,
+}
+
+# Поля, по которым запись из файла совпадает с записью в базе.
+KEYS = {
+    'groups': ('slug',),
+    'users': ('username',),
+    'posts': ('id',),
+    'comments': ('id',),
+    'follows': ('user_id', 'author_id'),
+}
+
+# Колонки CSV, в которых пустая строка означает отсутствие значения.
+OPTIONAL = {
+    'posts': ('id', 'group'),
+    'comments': ('id',),
+}
+
+FIELDS = {
+    'groups': (
+        Group.objects.order_by('id'),
+        [('slug', 'slug'), ('title', 'title'),
+         ('description', 'description')],
+    ),
+    'users': (
+        User.objects.order_by('id'),
+        [('username', 'username'), ('first_name', 'first_name'),
+         ('last_name', 'last_name'), ('email', 'email')],
+    ),
+    'posts': (
+        Post.objects.order_by('id'),
+        [('id', 'id'), ('author', 'author__username'),
+         ('group', 'group__slug'), ('text', 'text'),
+         ('pub_date', 'pub_date'), ('image', 'image')],
+    ),
+    'comments': (
+        Comment.objects.order_by('id'),
+        [('id', 'id'), ('post', 'post_id'), ('author', 'author__username'),
+         ('text', 'text'), ('created', 'created')],
+    ),
+    'follows': (
+        Follow.objects.order_by('id'),
+        [('user', 'user__username'), ('author', 'author__username')],
+    ),
+}
+
+
+def columns(kind):
+    return [name for name, _ in FIELDS[kind][1]]
+
+
+def _dump(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def export_rows(kind, chunk_size=2000):
+    """Записи одного вида в виде словарей, по одной за раз."""
+    queryset, fields = FIELDS[kind]
+    names = [name for name, _ in fields]
+    lookups = [lookup for _, lookup in fields]
+    rows = queryset.values_list(*lookups).iterator(chunk_size=chunk_size)
+    for values in rows:
+        yield dict(zip(names, map(_dump, values)))
+
+
+def write_ndjson(stream, kinds, chunk_size=2000):
+    total = 0
+    for kind in kinds:
+        for row in export_rows(kind, chunk_size):
+            stream.write(json.dumps({'type': kind, **row}, ensure_ascii=False))
+            stream.write('\n')
+            total += 1
+    return total
+
+
+def write_csv(stream, kind, chunk_size=2000):
+    writer = csv.DictWriter(stream, fieldnames=columns(kind))
+    writer.writeheader()
+    total = 0
+    for row in export_rows(kind, chunk_size):
+        writer.writerow(row)
+        total += 1
+    return total
+
+
+def read_ndjson(stream):
+    for line in stream:
+        if line.strip():
+            row = json.loads(line)
+            yield row.pop('type'), row
+
+
+def read_csv(stream, kind):
+    optional = OPTIONAL.get(kind, ())
+    for row in csv.DictReader(stream):
+        yield kind, {
+            name: None if value == '' and name in optional else value
+            for name, value in row.items()
+        }
+
+
+def _date(value):
+    return (value and parse_datetime(value)) or timezone.now()
+
+
+def _pk(value):
+    # В CSV id приходит строкой, а сверяется с числами из базы.
+    return None if value is None else int(value)
+
+
+def _ids(model, field, values):
+    return dict(
+        model.objects.filter(**{f'{field}__in': set(values)})
+        .values_list(field, 'id')
+    )
+
+
+class Importer:
+    """Копит записи по видам и пишет их пачками через bulk_create."""
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.buffers = {kind: [] for kind in KINDS}
+        self.loaded = Counter()
+        self.skipped = Counter()
+        self.conflicts = Counter()
+        self.refused_posts = set()
+
+    def add(self, kind, row):
+        if kind not in self.buffers:
+            raise ValueError(f'Неизвестный вид записи: {kind}')
+        self.buffers[kind].append(row)
+        if len(self.buffers[kind]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        # Сбрасываются все буферы по порядку KINDS, чтобы записи,
+        # на которые ссылается пачка, уже были в базе.
+        for kind in KINDS:
+            rows, self.buffers[kind] = self.buffers[kind], []
+            if not rows:
+                continue
+            objects = getattr(self, f'_build_{kind}')(rows)
+            with transaction.atomic():
+                objects = self._new(kind, objects)
+                # Без ignore_conflicts: запись, появившаяся в базе
+                # после проверки, прерывает загрузку, а не теряется.
+                MODELS[kind].objects.bulk_create(objects)
+                after = getattr(self, f'_after_{kind}', None)
+                if after is not None:
+                    after(objects)
+            self.loaded[kind] += len(objects)
+            self.skipped[kind] += len(rows) - len(objects)
+
+    def _new(self, kind, objects):
+        """Объекты, ключей которых нет ни в базе, ни раньше в пачке."""
+        fields = KEYS[kind]
+        existing = set(MODELS[kind].objects.filter(**{
+            f'{field}__in': {getattr(obj, field) for obj in objects}
+            for field in fields
+        }).values_list(*fields))
+        new, seen = [], set()
+        for obj in objects:
+            key = tuple(getattr(obj, field) for field in fields)
+            if key in existing:
+                self.conflicts[kind] += 1
+                if kind == 'posts':
+                    self.refused_posts.add(obj.id)
+            elif key not in seen:
+                if None not in key:
+                    seen.add(key)
+                new.append(obj)
+        return new
+
+    def _after_groups(self, groups):
+        ids = _ids(Group, 'slug', (group.slug for group in groups))
+        GroupStats.objects.bulk_create(
+            GroupStats(group_id=ids[group.slug], title=group.title)
+            for group in groups
+        )
+
+    def _after_users(self, users):
+        ids = _ids(User, 'username', (user.username for user in users))
+        Profile.objects.bulk_create(
+            Profile(user_id=ids[user.username]) for user in users
+        )
+
+    def _after_posts(self, posts):
+        counters.posts_changed(
+            (post.author_id for post in posts),
+            (post.group_id for post in posts),
+        )
+
+    def _after_comments(self, comments):
+        counters.posts_touched({comment.post_id for comment in comments})
+
+    def _build_groups(self, rows):
+        return [
+            Group(slug=row['slug'], title=row['title'],
+                  description=row.get('description') or '')
+            for row in rows
+        ]
+
+    def _build_users(self, rows):
+        password = make_password(None)
+        return [
+            User(username=row['username'], password=password,
+                 first_name=row.get('first_name') or '',
+                 last_name=row.get('last_name') or '',
+                 email=row.get('email') or '')
+            for row in rows
+        ]
+
+    def _build_posts(self, rows):
+        authors = _ids(User, 'username', (row['author'] for row in rows))
+        groups = _ids(
+            Group, 'slug', (row['group'] for row in rows if row.get('group'))
+        )
+        return [
+            Post(id=_pk(row.get('id')), author_id=authors[row['author']],
+                 group_id=groups.get(row.get('group')), text=row['text'],
+                 pub_date=_date(row.get('pub_date')),
+                 image=row.get('image') or '')
+            for row in rows if row['author'] in authors
+        ]
+
+    def _build_comments(self, rows):
+        authors = _ids(User, 'username', (row['author'] for row in rows))
+        posts = set(Post.objects.filter(
+            id__in={int(row['post']) for row in rows}
+        ).values_list('id', flat=True)) - self.refused_posts
+        return [
+            Comment(id=_pk(row.get('id')), post_id=int(row['post']),
+                    author_id=authors[row['author']], text=row['text'],
+                    created=_date(row.get('created')))
+            for row in rows
+            if row['author'] in authors and int(row['post']) in posts
+        ]
+
+    def _build_follows(self, rows):
+        users = _ids(
+            User, 'username',
+            [row['user'] for row in rows] + [row['author'] for row in rows]
+        )
+        return [
+            Follow(user_id=users[row['user']], author_id=users[row['author']])
+            for row in rows
+            if row['user'] in users and row['author'] in users
+            and row['user'] != row['author']
+        ]
+
+
+def reset_sequences():
+    """Сдвигает счётчики id после вставки записей с явными id."""
+    statements = connection.ops.sequence_reset_sql(no_style(), [Post, Comment])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def rebuild_derived():
+    """Пересчитывает то, что при обычном сохранении делают сигналы."""
+    counters.reconcile()
+    directory.rebuild()
+    users = User.objects.filter(follower__isnull=False).distinct()
+    for user in users.iterator():
+        timeline.rebuild(user)
+    search.rebuild()
+    cache.invalidate('feed:index')
@@ -0,0 +1,163 @@
+"""Популярные посты и группы.
+
+Счета копятся по событиям без просмотра таблиц: комментарий добавляет
+посту и его группе 1, новый пост — своей группе 1, а самому посту —
+охват автора 1 + log2(1 + подписчики), подписка — автору 1. Вес
+события умножается на 2 ** (t / TRENDING_HALF_LIFE) от начала текущей
+эпохи (прямое затухание, см. TrendingScore), так что вклад события
+вдвое меньше вклада такого же события, случившегося на период
+полураспада позже. Эпоха длится ERA_HALF_LIVES периодов, чтобы
+множитель не переполнялся; при смене эпохи счета прежней эпохи один
+раз делятся на 2 ** ERA_HALF_LIVES.
+
+top() отдаёт TRENDING_SIZE лучших постов и групп из общего кеша.
+Рейтинг пересчитывается раз в TRENDING_INTERVAL секунд (или командой
+refresh_trending): из лучших по счёту постов с учётом недавних подписок
+на их авторов выбираются первые. Поэтому страница популярного стоит
+как чтение из кеша.
+"""
+import math
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Case, F, Value, When
+
+from core.cache import get_or_compute, invalidate
+from .models import GroupStats, Post, Profile, TrendingScore
+
+CACHE_KEY = 'trending'
+ERA_HALF_LIVES = 64
+
+
+def _era(now):
+    return int(now // (settings.TRENDING_HALF_LIFE * ERA_HALF_LIVES))
+
+
+def _decayed(weight, at, era):
+    """Вес события в момент at в единицах эпохи era."""
+    start = era * settings.TRENDING_HALF_LIFE * ERA_HALF_LIVES
+    return weight * 2.0 ** ((at - start) / settings.TRENDING_HALF_LIFE)
+
+
+def _add(kind, amounts, era):
+    """Прибавляет к счетам amounts {object_id: вес в единицах эпохи}."""
+    amounts = {
+        object_id: amount for object_id, amount in amounts.items()
+        if object_id is not None
+    }
+    if not amounts:
+        return
+    TrendingScore.objects.bulk_create(
+        (
+            TrendingScore(kind=kind, object_id=object_id, era=era)
+            for object_id in amounts
+        ),
+        ignore_conflicts=True,
+    )
+    for object_id, amount in amounts.items():
+        # Счёт прошлой эпохи приводится к текущей, более старый забыт.
+        TrendingScore.objects.filter(kind=kind, object_id=object_id).update(
+            era=era,
+            score=Case(
+                When(era=era, then=F('score')),
+                When(era=era - 1, then=F('score') * 2.0 ** -ERA_HALF_LIVES),
+                default=Value(0.0),
+            ) + amount,
+        )
+
+
+def post_created(post):
+    era = _era(time.time())
+    followers = Profile.objects.filter(user_id=post.author_id).values_list(
+        'followers_count', flat=True
+    ).first() or 0
+    at = post.pub_date.timestamp()
+    _add(TrendingScore.POST, {
+        post.id: _decayed(1 + math.log2(1 + followers), at, era),
+    }, era)
+    _add(TrendingScore.GROUP, {post.group_id: _decayed(1, at, era)}, era)
+
+
+def comments_added(comments):
+    era = _era(time.time())
+    groups = dict(Post.objects.filter(
+        id__in={comment.post_id for comment in comments}
+    ).values_list('id', 'group_id'))
+    posts = defaultdict(float)
+    post_groups = defaultdict(float)
+    for comment in comments:
+        amount = _decayed(1, comment.created.timestamp(), era)
+        posts[comment.post_id] += amount
+        post_groups[groups.get(comment.post_id)] += amount
+    _add(TrendingScore.POST, posts, era)
+    _add(TrendingScore.GROUP, post_groups, era)
+
+
+def follow_added(author_id):
+    now = time.time()
+    era = _era(now)
+    _add(TrendingScore.AUTHOR, {author_id: _decayed(1, now, era)}, era)
+
+
+def remove(kind, object_id):
+    TrendingScore.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def _rescale(era):
+    TrendingScore.objects.filter(era__lt=era - 1).delete()
+    TrendingScore.objects.filter(era=era - 1).update(
+        era=era, score=F('score') * 2.0 ** -ERA_HALF_LIVES
+    )
+
+
+def _top(kind, era, limit):
+    return list(
+        TrendingScore.objects.filter(kind=kind, era=era)
+        .order_by('-score')
+        .values_list('object_id', 'score')[:limit]
+    )
+
+
+def compute():
+    """Рейтинг: {'posts': [Post, ...], 'groups': [GroupStats, ...]}."""
+    era = _era(time.time())
+    _rescale(era)
+    size = settings.TRENDING_SIZE
+    scores = dict(
+        _top(TrendingScore.POST, era, size * settings.TRENDING_CANDIDATES)
+    )
+    posts = list(Post.objects.feed().filter(id__in=scores))
+    reach = dict(TrendingScore.objects.filter(
+        kind=TrendingScore.AUTHOR,
+        era=era,
+        object_id__in={post.author_id for post in posts},
+    ).values_list('object_id', 'score'))
+    posts.sort(
+        key=lambda post: (
+            scores[post.id]
+            + settings.TRENDING_FOLLOW_WEIGHT * reach.get(post.author_id, 0),
+            post.id,
+        ),
+        reverse=True,
+    )
+    groups = _top(TrendingScore.GROUP, era, size)
+    stats = GroupStats.objects.select_related('group').in_bulk(
+        [group_id for group_id, _ in groups]
+    )
+    return {
+        'posts': posts[:size],
+        'groups': [
+            stats[group_id] for group_id, _ in groups if group_id in stats
+        ],
+    }
+
+
+def top():
+    return get_or_compute(CACHE_KEY, compute, settings.TRENDING_INTERVAL)
+
+
+def refresh():
+    """Пересчитывает рейтинг сейчас, не дожидаясь TRENDING_INTERVAL."""
+    invalidate(CACHE_KEY)
+    return top()
@@ -9,12 +9,30 @@ urlpatterns = [
     path('index/', views.index, name='index'),
     path('groups/', views.groups, name='groups'),
     path('group/<slug:slug>/', views.group_list, name='group_list'),
+    path('feeds/<str:kind>/', views.syndication_feed, name='feed'),
+    path(
+        'group/<slug:slug>/feeds/<str:kind>/',
+        views.syndication_feed,
+        name='group_feed'
+    ),
+    path(
+        'profile/<str:username>/feeds/<str:kind>/',
+        views.syndication_feed,
+        name='profile_feed'
+    ),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment', views.add_comment, name='add_comment'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='comments'
+    ),
     path('create/', views.post_create, name='post_create'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('trending/', views.trending_posts, name='trending'),
+    path('search/', views.search_posts, name='search'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+
+from core.cache import get_or_compute
+from .models import Comment
+from .paginators import CursorPaginator
+
+
+def paginate(request, queryset, view_name, count=None, cache_key=None):
+    """Разбивает ленту на страницы способом, выбранным для представления.
+
+    Способ задаётся в settings.FEED_PAGINATION: 'page' — постраничная
+    навигация по номерам, 'cursor' — навигация по курсору (pub_date, id).
+    Известное заранее число записей count избавляет от запроса COUNT(*).
+    Первая страница ленты с ключом cache_key берётся из общего кеша.
+    """
+    mode = settings.FEED_PAGINATION.get(view_name, 'page')
+    per_page = settings.NUMBER_OF_POSTS
+    if mode == 'cursor':
+        paginator = CursorPaginator(queryset, per_page)
+        after = request.GET.get('after')
+        before = request.GET.get('before')
+        if cache_key and not (after or before):
+            rows = first_rows(paginator.queryset, cache_key)
+            return paginator.build_page(
+                rows[:per_page], len(rows) > per_page, False
+            )
+        return paginator.get_page(after=after, before=before)
+    paginator = Paginator(queryset.order_by('-pub_date', '-id'), per_page)
+    if count is not None:
+        paginator.count = count
+    page_obj = paginator.get_page(request.GET.get('page'))
+    if cache_key and page_obj.number == 1:
+        page_obj.object_list = first_rows(
+            paginator.object_list, cache_key
+        )[:per_page]
+    return page_obj
+
+
+def first_rows(queryset, cache_key):
+    """Первые записи ленты (на одну больше страницы) из общего кеша."""
+    limit = settings.NUMBER_OF_POSTS + 1
+    return get_or_compute(
+        cache_key,
+        lambda: list(queryset[:limit]),
+        settings.FEED_CACHE_TIMEOUT,
+    )
+
+
+def comments_page(post_id, after=None):
+    """Порция комментариев поста вместе с авторами одним запросом."""
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        ordering=('-created', '-id'),
+    )
+    return paginator.get_page(after=after)
@@ -1,22 +1,34 @@
-from django.contrib.auth.decorators import login_required
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from core.concurrency import gather
+from core.db import primary
+from core.fragments import is_shell, shell_page
 # from django.views.decorators.cache import cache_page
 
+from . import (
+    conditional, directory, graph, search, syndication, thumbnails,
+    timeline, trending, writebehind,
+)
 from .forms import CommentForm, PostForm
-from .models import Group, Comment, Post, User, Follow
+from .models import Group, GroupStats, Post, User, Follow
+from .paginators import CursorPaginator
+from .utils import comments_page, paginate
 
 
 # Главная страница
+@shell_page
 def index(request):
     template = 'posts/index.html'
     title = 'Последние обновления на сайте'
     text = 'Добро пожаловать в Yatube! Говорим обо всем на свете'
-    posts = Post.objects.all()
-    paginator = Paginator(posts, settings.NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.feed()
+    page_obj = paginate(request, posts, 'index', cache_key='feed:index')
     context = {
         'title': title,
         'text': text,
@@ -26,13 +38,19 @@ def index(request):
 
 
 # Страница группы с сортировкой по 10 постов
+@shell_page
+@condition(etag_func=conditional.group_list_etag)
 def group_list(request, slug):
-    group = get_object_or_404(Group, slug=slug)
+    group = get_object_or_404(
+        Group.objects.select_related('stats'), slug=slug
+    )
     template = 'posts/group_list.html'
-    posts = group.posts.all()
-    paginator = Paginator(posts, settings.NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.feed().filter(group=group)
+    stats = getattr(group, 'stats', None)
+    page_obj = paginate(
+        request, posts, 'group_list',
+        count=stats.posts_count if stats else None,
+    )
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -45,53 +63,102 @@ def groups(request):
     template = 'posts/groups.html'
     title = 'Информация о группах проекта Yatube'
     text = 'Список тематических групп'
-    groups = Group.objects.all()
+    sort = request.GET.get('sort')
+    if sort not in directory.ORDERINGS:
+        sort = 'title'
+    paginator = CursorPaginator(
+        GroupStats.objects.select_related('group'),
+        settings.GROUPS_PER_PAGE,
+        ordering=directory.ORDERINGS[sort],
+    )
+    page_obj = paginator.get_page(
+        after=request.GET.get('after'), before=request.GET.get('before')
+    )
     context = {
         'title': title,
         'text': text,
-        'groups': groups,
+        'sort': sort,
+        'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
 # Страница профиля
+@shell_page
+@condition(etag_func=conditional.profile_etag)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(author_id=author.id)
-    following = request.user.is_authenticated and author.following.exists()
-    paginator = Paginator(posts, settings.NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    author = get_object_or_404(
+        User.objects.select_related('profile'),
+        username=username
+    )
+    posts = Post.objects.feed().filter(author=author)
+    page_obj = paginate(
+        request, posts, 'profile', count=author.profile.posts_count
+    )
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following,
         'user': request.user
     }
     return render(request, template, context)
 
 
 # Страница одного поста
+@shell_page
+@condition(
+    etag_func=conditional.post_detail_etag,
+    last_modified_func=conditional.post_detail_last_modified,
+)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    quantity = post.author.posts.count()
-    user = request.user
-    form = CommentForm(request.POST or None)
+    post, comments = gather(
+        lambda: get_object_or_404(
+            Post.objects.select_related('author__profile', 'group'),
+            id=post_id
+        ),
+        lambda: comments_page(post_id, request.GET.get('comments_after')),
+    )
+    if not (is_shell(request) or comments.has_previous()):
+        comments.object_list = writebehind.pending_comments(
+            request, post_id, comments
+        ) + list(comments)
+    quantity = post.author.profile.posts_count
     context = {
-        'user': user,
+        'user': request.user,
         'post': post,
         'quantity': quantity,
-        'form': form,
+        'comments': comments,
     }
-    comments = Comment.objects.filter(post_id=post_id)
-    if comments:
-        context.update({'comments': comments})
     return render(request, 'posts/post_detail.html', context)
 
 
+# Следующая порция комментариев для кнопки «Показать ещё»
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    comments = comments_page(post_id, request.GET.get('after'))
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.id,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created,
+                }
+                for comment in comments
+            ],
+            'next': comments.next_cursor,
+        })
+    context = {
+        'post': post,
+        'comments': comments,
+    }
+    return render(request, 'includes/comments.html', context)
+
+
 # Создать пост
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -101,6 +168,8 @@ def post_create(request):
         form = form.save(commit=False)
         form.author = request.user
         form.save()
+        if form.image:
+            thumbnails.schedule(form)
         return redirect('posts:profile', form.author)
     context = {
         'form': form,
@@ -119,7 +188,9 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
         return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
@@ -131,9 +202,12 @@ def post_edit(request, post_id):
 
 # Оставить комментарий
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     form = CommentForm(request.POST or None)
-    if form.is_valid():
+    if form.is_valid() and settings.WRITE_BEHIND:
+        writebehind.comment(request, post_id, form.cleaned_data['text'])
+    elif form.is_valid():
         post = Post.objects.get(pk=post_id)
         comment = form.save(commit=False)
         comment.author = request.user
@@ -145,21 +219,27 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    authors = Follow.objects.filter(user=request.user)
-    following_authors = User.objects.filter(following__in=authors)
-    posts = Post.objects.filter(author__in=following_authors)
-    paginator = Paginator(posts, settings.NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = timeline.timeline_page(request, request.user)
+    suggested = graph.suggestions(request.user.id)
+    authors = User.objects.select_related('profile').in_bulk(suggested)
     context = {
         'page_obj': page_obj,
+        'suggestions': [
+            authors[user_id] for user_id in suggested if user_id in authors
+        ],
     }
     return render(request, template, context)
 
 
+@primary
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
+    if settings.WRITE_BEHIND:
+        if request.user != author:
+            writebehind.follow(request, author.id)
+        return redirect('posts:profile', username=username)
     follow = Follow.objects.filter(user=request.user, author=author)
     if request.user != author and not follow:
         Follow.objects.create(
@@ -171,11 +251,58 @@ def profile_follow(request, username):
         return redirect('posts:profile', username=username)
 
 
+@primary
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
+    if settings.WRITE_BEHIND:
+        writebehind.unfollow(request, author.id)
+        return redirect('posts:profile', username=username)
     Follow.objects.filter(
         user=request.user,
         author=author
     ).delete()
     return redirect('posts:profile', username=username)
+
+
+# Популярные посты и группы
+@shell_page
+def trending_posts(request):
+    template = 'posts/trending.html'
+    ranking = trending.top()
+    context = {
+        'title': 'Популярное',
+        'text': 'Популярное сейчас',
+        'posts': ranking['posts'],
+        'groups': ranking['groups'],
+    }
+    return render(request, template, context)
+
+
+# Ленты для агрегаторов: общая, группы и автора
+@condition(etag_func=conditional.syndication_etag)
+def syndication_feed(request, kind, slug=None, username=None):
+    if kind not in syndication.FORMATS:
+        raise Http404('Неизвестный формат ленты')
+    content_type, generate = syndication.FORMATS[kind]
+    feed = syndication.Feed(request, kind, slug=slug, username=username)
+    response = StreamingHttpResponse(generate(feed), content_type)
+    patch_cache_control(
+        response, public=True, max_age=settings.SYNDICATION_CACHE_TIMEOUT
+    )
+    return response
+
+
+# Поиск по постам и комментариям
+def search_posts(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        page_obj = search.search_page(query, request.GET.get('after'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
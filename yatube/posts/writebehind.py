@@ -0,0 +1,409 @@
+"""Отложенная пакетная запись комментариев и подписок.
+
+С WRITE_BEHIND представления add_comment, profile_follow и
+profile_unfollow не пишут в базу сами. Запись дописывается в журнал
+процесса (файл <pid>.journal в WRITE_BEHIND_DIR, сброшенный на диск
+через fsync) до ответа пользователю. Фоновый поток раз в
+WRITE_BEHIND_INTERVAL секунд или при накоплении WRITE_BEHIND_BATCH
+записей применяет журнал одной транзакцией: комментарии и подписки —
+через bulk_create, отписки — одним DELETE. Счётчики, ленты подписок и
+поисковый индекс обновляются в той же транзакции; для новых подписок
+отправляется post_save, так что их, как и отписки, обрабатывают те же
+сигналы, что и при обычном сохранении.
+
+Перед применением журнал переименовывается в сегмент, и новые записи
+идут в новый файл; сегмент удаляется после фиксации транзакции.
+Сегмент, который не удалось применить WRITE_BEHIND_ATTEMPTS раз подряд,
+переименовывается в <имя>.failed и больше не задерживает следующие:
+его нужно разобрать вручную.
+Журналы и сегменты завершившихся процессов применяет recover() (при
+запуске фонового потока и командой flush_writes). Повторное применение
+безопасно: подписки уникальны, а комментарий с тем же постом, автором и
+временем создания второй раз не добавляется.
+
+Свои отложенные записи пользователь видит сразу: до применения они
+хранятся в его сессии, страница поста добавляет их к комментариям, а
+кнопка подписки учитывает их состояние. Оболочки для общего кеша
+(EDGE_CACHE_PAGES) одинаковы для всех и отложенных комментариев не
+показывают.
+"""
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from functools import reduce
+from operator import or_
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from core import cache, metrics
+from . import counters, search, trending
+from .models import Comment, Follow, Post, User
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'pending_writes'
+
+_lock = threading.Lock()
+_journal = None
+_journal_key = None
+_written = 0
+_wake = threading.Event()
+_flusher = None
+_attempts = Counter()
+
+
+def _path(*parts):
+    name = '.'.join(map(str, parts))
+    return os.path.join(settings.WRITE_BEHIND_DIR, name)
+
+
+def _append(entry):
+    """Дописывает запись в журнал процесса и сбрасывает её на диск."""
+    global _journal, _journal_key, _written
+    line = (json.dumps(entry, ensure_ascii=False) + '\n').encode()
+    key = (os.getpid(), settings.WRITE_BEHIND_DIR)
+    with _lock:
+        if _journal_key != key:
+            # Процесс, созданный fork, пишет в собственный журнал.
+            os.makedirs(settings.WRITE_BEHIND_DIR, exist_ok=True)
+            _journal = open(_path(os.getpid(), 'journal'), 'ab')
+            _journal_key = key
+            _written = 0
+        _journal.write(line)
+        _journal.flush()
+        if settings.WRITE_BEHIND_FSYNC:
+            os.fsync(_journal.fileno())
+        _written += 1
+        written = _written
+    _start_flusher()
+    if written >= settings.WRITE_BEHIND_BATCH:
+        _wake.set()
+
+
+def _remember(request, entry):
+    pending = request.session.get(PENDING_KEY, [])
+    request.session[PENDING_KEY] = pending + [entry]
+
+
+def _enqueue(request, entry):
+    entry = {'id': uuid4().hex, 'at': time.time(), **entry}
+    _append(entry)
+    _remember(request, entry)
+
+
+def comment(request, post_id, text):
+    _enqueue(request, {
+        'op': 'comment',
+        'post': post_id,
+        'author': request.user.pk,
+        'text': text,
+        'created': timezone.now().isoformat(),
+    })
+
+
+def follow(request, author_id):
+    _enqueue(request, {
+        'op': 'follow', 'user': request.user.pk, 'author': author_id,
+    })
+
+
+def unfollow(request, author_id):
+    _enqueue(request, {
+        'op': 'unfollow', 'user': request.user.pk, 'author': author_id,
+    })
+
+
+def pending(request):
+    """Отложенные записи пользователя, которые ещё могут быть не в базе."""
+    if not settings.WRITE_BEHIND or not hasattr(request, 'session'):
+        return []
+    entries = request.session.get(PENDING_KEY)
+    if not entries:
+        return []
+    deadline = time.time() - settings.WRITE_BEHIND_PENDING_SECONDS
+    fresh = [entry for entry in entries if entry['at'] > deadline]
+    if len(fresh) != len(entries):
+        request.session[PENDING_KEY] = fresh
+    return fresh
+
+
+def pending_comments(request, post_id, comments):
+    """Отложенные комментарии к посту, которых ещё нет среди comments."""
+    shown = {(comment.author_id, comment.created) for comment in comments}
+    result = []
+    for entry in pending(request):
+        if entry['op'] != 'comment' or entry['post'] != post_id:
+            continue
+        created = _date(entry['created'])
+        if (entry['author'], created) not in shown:
+            result.append(Comment(
+                post_id=post_id, author=request.user,
+                text=entry['text'], created=created,
+            ))
+    return sorted(result, key=lambda comment: comment.created, reverse=True)
+
+
+def pending_following(request, author_id):
+    """Состояние подписки из последней отложенной записи или None."""
+    state = None
+    for entry in pending(request):
+        if entry['op'] in ('follow', 'unfollow') and (
+            entry['author'] == author_id
+        ):
+            state = entry['op'] == 'follow'
+    return state
+
+
+def _date(value):
+    return datetime.fromisoformat(value)
+
+
+def _read(path):
+    entries = []
+    with open(path, 'rb') as journal:
+        for number, line in enumerate(journal, 1):
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # Запись, оборванная сбоем процесса, не была подтверждена.
+                logger.warning('Пропущена запись %s:%s', path, number)
+    return entries
+
+
+def _apply_comments(entries):
+    posts = set(Post.objects.filter(
+        id__in={entry['post'] for entry in entries}
+    ).values_list('id', flat=True))
+    authors = set(User.objects.filter(
+        id__in={entry['author'] for entry in entries}
+    ).values_list('id', flat=True))
+    entries = [
+        entry for entry in entries
+        if entry['post'] in posts and entry['author'] in authors
+    ]
+    if not entries:
+        return
+    dates = {_date(entry['created']) for entry in entries}
+    existing = set(Comment.objects.filter(
+        post_id__in=posts, created__in=dates
+    ).values_list('post_id', 'author_id', 'created'))
+    new = {}
+    for entry in entries:
+        key = (entry['post'], entry['author'], _date(entry['created']))
+        if key not in existing:
+            new[key] = entry['text']
+    Comment.objects.bulk_create(
+        Comment(post_id=post_id, author_id=author_id, created=created,
+                text=text)
+        for (post_id, author_id, created), text in new.items()
+    )
+    # bulk_create на SQLite не возвращает id, а они нужны индексу.
+    saved = [
+        comment for comment in Comment.objects.filter(
+            post_id__in={post_id for post_id, _, _ in new},
+            created__in={created for _, _, created in new},
+        )
+        if (comment.post_id, comment.author_id, comment.created) in new
+    ]
+    search.index_comments(saved)
+    for post_id, count in Counter(
+        comment.post_id for comment in saved
+    ).items():
+        counters.comment_added(post_id, count)
+    counters.posts_touched({comment.post_id for comment in saved})
+    if saved:
+        trending.comments_added(saved)
+    metrics.inc('yatube_created_total', len(saved), kind='comment')
+
+
+def _insert_follows(pairs):
+    """Вставляет подписки; возвращает только вставленные этим вызовом."""
+    follows = [
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_id in pairs
+    ]
+    try:
+        with transaction.atomic():
+            Follow.objects.bulk_create(follows)
+        return follows
+    except IntegrityError:
+        # Часть пар после проверки записал другой процесс: по одной.
+        inserted = []
+        for follow in follows:
+            try:
+                with transaction.atomic():
+                    Follow.objects.bulk_create([follow])
+            except IntegrityError:
+                continue
+            inserted.append(follow)
+        return inserted
+
+
+def _apply_follows(states):
+    users = {user_id for pair in states for user_id in pair}
+    valid = set(User.objects.filter(id__in=users).values_list('id', flat=True))
+    existing = set(Follow.objects.filter(
+        user_id__in={user_id for user_id, _ in states},
+        author_id__in={author_id for _, author_id in states},
+    ).values_list('user_id', 'author_id'))
+    added = [
+        pair for pair, following in states.items()
+        if following and pair not in existing
+        and pair[0] != pair[1] and set(pair) <= valid
+    ]
+    # bulk_create не отправляет post_save: без него подписка обошла бы
+    # обработчики, которые отписке достаются через post_delete.
+    for instance in _insert_follows(added):
+        post_save.send(
+            sender=Follow, instance=instance, created=True,
+            update_fields=None, raw=False, using=Follow.objects.db,
+        )
+    removed = [
+        pair for pair, following in states.items()
+        if not following and pair in existing
+    ]
+    if removed:
+        # Счётчики и ленты обновляют сигналы post_delete.
+        Follow.objects.filter(reduce(or_, (
+            Q(user_id=user_id, author_id=author_id)
+            for user_id, author_id in removed
+        ))).delete()
+
+
+def apply(entries):
+    """Применяет записи журнала одной транзакцией."""
+    comments = [entry for entry in entries if entry['op'] == 'comment']
+    states = {}
+    for entry in entries:
+        if entry['op'] in ('follow', 'unfollow'):
+            pair = (entry['user'], entry['author'])
+            states[pair] = entry['op'] == 'follow'
+    with transaction.atomic():
+        if comments:
+            _apply_comments(comments)
+        if states:
+            _apply_follows(states)
+    if comments:
+        cache.invalidate('feed:index')
+
+
+def _apply_segment(path):
+    apply(_read(path))
+    os.remove(path)
+
+
+def _rotate():
+    """Переименовывает журнал процесса в сегмент для применения."""
+    global _journal, _journal_key, _written
+    key = (os.getpid(), settings.WRITE_BEHIND_DIR)
+    with _lock:
+        if _journal_key != key or not _written:
+            return
+        _journal.close()
+        _journal = _journal_key = None
+        _written = 0
+        os.rename(
+            _path(os.getpid(), 'journal'),
+            _path(os.getpid(), time.time_ns(), 'segment'),
+        )
+
+
+def flush():
+    """Применяет записи этого процесса; возвращает число сегментов."""
+    _rotate()
+    segments = sorted(glob.glob(_path(os.getpid(), '*', 'segment')))
+    for path in segments:
+        try:
+            _apply_segment(path)
+        except Exception:
+            _attempts[path] += 1
+            if _attempts[path] < settings.WRITE_BEHIND_ATTEMPTS:
+                # Следующие сегменты ждут: порядок записей важен.
+                raise
+            del _attempts[path]
+            os.rename(path, f'{path}.failed')
+            logger.exception(
+                'Сегмент %s не применён за %s попыток и отложен в %s.failed',
+                path, settings.WRITE_BEHIND_ATTEMPTS, path,
+            )
+            metrics.inc('yatube_write_behind_failed_total')
+        else:
+            _attempts.pop(path, None)
+    return len(segments)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def recover():
+    """Применяет журналы и сегменты завершившихся процессов."""
+    if not os.path.isdir(settings.WRITE_BEHIND_DIR):
+        return 0
+    recovered = 0
+    for name in sorted(os.listdir(settings.WRITE_BEHIND_DIR)):
+        pid = name.split('.', 1)[0]
+        if (
+            name.endswith('.failed') or not pid.isdigit()
+            or int(pid) == os.getpid() or _alive(int(pid))
+        ):
+            continue
+        # Переименование забирает файл: другой процесс его уже не найдёт.
+        claimed = _path(os.getpid(), time.time_ns(), 'segment')
+        try:
+            os.rename(os.path.join(settings.WRITE_BEHIND_DIR, name), claimed)
+        except FileNotFoundError:
+            continue
+        recovered += 1
+        try:
+            _apply_segment(claimed)
+        except Exception:
+            # Сегмент теперь принадлежит этому процессу: flush() повторит
+            # его и при необходимости отложит.
+            logger.exception('Не удалось применить сегмент %s', claimed)
+    return recovered
+
+
+def _run():
+    try:
+        recover()
+    except Exception:
+        logger.exception('Не удалось применить журналы других процессов')
+    while True:
+        _wake.wait(settings.WRITE_BEHIND_INTERVAL)
+        _wake.clear()
+        try:
+            flush()
+        except Exception:
+            logger.exception('Не удалось применить отложенные записи')
+        finally:
+            close_old_connections()
+
+
+def _start_flusher():
+    global _flusher
+    if not settings.WRITE_BEHIND_INTERVAL:
+        return
+    with _lock:
+        if _flusher is None or _flusher.pid != os.getpid():
+            _flusher = threading.Thread(
+                target=_run, name='writebehind', daemon=True
+            )
+            _flusher.pid = os.getpid()
+            _flusher.start()
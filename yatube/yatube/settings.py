@@ -33,12 +33,18 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.UsersConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
+    'rest_framework',
+    'django_filters',
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.db.ReplicaMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -67,6 +73,14 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# ASGI (yatube.asgi): запросы обрабатываются в пуле из ASGI_THREADS
+# потоков. Независимые запросы к базе внутри страницы выполняются
+# параллельно в пуле из CONCURRENT_QUERIES_THREADS потоков; соединения
+# этих потоков стоит держать открытыми (CONN_MAX_AGE).
+ASGI_THREADS = int(os.getenv('YATUBE_ASGI_THREADS', 8))
+CONCURRENT_QUERIES = os.getenv('YATUBE_CONCURRENT_QUERIES') == '1'
+CONCURRENT_QUERIES_THREADS = 8
+
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
@@ -77,6 +91,22 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения: YATUBE_DB_REPLICAS — файлы SQLite через запятую
+# (локально их наполняет команда sync_replicas). Пользователь читает из
+# основной базы REPLICA_STICKY_SECONDS секунд после своей записи.
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+    filter(None, os.getenv('YATUBE_DB_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, name),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+REPLICA_STICKY_SECONDS = 10
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -122,13 +152,184 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 NUMBER_OF_POSTS = 10
 
+# Комментарии на странице поста выводятся порциями, следующие
+# подгружаются кнопкой «Показать ещё».
+COMMENTS_PER_PAGE = 20
+
+# Каталог групп листается по курсору; у каждой группы выводятся
+# самые активные авторы.
+GROUPS_PER_PAGE = 20
+GROUP_TOP_AUTHORS = 3
+
+# Популярное: вклад события в счёт вдвое меньше через
+# TRENDING_HALF_LIFE секунд; рейтинг из TRENDING_SIZE постов и групп
+# пересчитывается раз в TRENDING_INTERVAL секунд среди
+# TRENDING_SIZE * TRENDING_CANDIDATES лучших по счёту постов.
+# Недавние подписки на автора добавляются к счёту его постов с весом
+# TRENDING_FOLLOW_WEIGHT.
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_INTERVAL = 60
+TRENDING_SIZE = 10
+TRENDING_CANDIDATES = 5
+TRENDING_FOLLOW_WEIGHT = 0.5
+
+# Граф подписок в памяти процесса: наложение изменений пересобирается
+# в массивы после FOLLOW_GRAPH_OVERLAY записей, граф целиком строится
+# заново раз в FOLLOW_GRAPH_REBUILD секунд. Журнал изменений хранится
+# в общем кеше FOLLOW_GRAPH_LOG_TIMEOUT секунд. Рекомендации берутся
+# из подписок первых FOLLOW_GRAPH_FANOUT авторов пользователя.
+FOLLOW_GRAPH_OVERLAY = 10000
+FOLLOW_GRAPH_REBUILD = 10 * 60
+FOLLOW_GRAPH_LOG_TIMEOUT = 60 * 60
+FOLLOW_GRAPH_FANOUT = 200
+FOLLOW_SUGGESTIONS = 5
+
+# Ленты RSS, Atom и JSON Feed: число постов и время хранения ленты
+# в общих кешах (Cache-Control: public, max-age).
+SYNDICATION_ITEMS = 20
+SYNDICATION_CACHE_TIMEOUT = 60
+
+# Пагинация лент: 'page' — по номерам страниц, 'cursor' — по курсору
+# (pub_date, id), время выборки которого не зависит от глубины страницы.
+FEED_PAGINATION = {
+    'index': 'page',
+    'group_list': 'page',
+    'profile': 'page',
+    'follow_index': 'page',
+}
+
+# Лента подписок: посты авторов, у которых подписчиков больше
+# TIMELINE_FANOUT_LIMIT, не раскладываются по лентам, а читаются напрямую.
+TIMELINE_FANOUT_LIMIT = 10000
+# Сколько последних постов автора добавить в ленту при подписке и когда
+# автор перестаёт быть популярным (None — все).
+TIMELINE_BACKFILL_POSTS = None
+TIMELINE_BATCH_SIZE = 1000
+
+# Миниатюры картинок постов готовятся пулом потоков после загрузки:
+# каждая ширина из POST_IMAGE_WIDTHS в каждом формате из POST_IMAGE_FORMATS,
+# который поддерживает Pillow. Последний формат выводится тегом img.
+POST_THUMBNAIL_GEOMETRY = '960x339'
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+POST_IMAGE_SIZES = '(max-width: 992px) 100vw, 960px'
+POST_IMAGE_QUALITY = 80
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+
+# API только для чтения: JWT для мобильных клиентов, сессия — для
+# браузера. Страницы выбираются по курсору, как в лентах сайта.
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': (
+        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ),
+    'DEFAULT_PERMISSION_CLASSES': (
+        'rest_framework.permissions.IsAuthenticatedOrReadOnly',
+    ),
+    'DEFAULT_FILTER_BACKENDS': (
+        'django_filters.rest_framework.DjangoFilterBackend',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': NUMBER_OF_POSTS,
+}
+
+# Публичные страницы без данных о пользователе для общего кеша (CDN):
+# персональные фрагменты загружаются скриптом ('js') или через ESI ('esi').
+EDGE_CACHE_PAGES = False
+EDGE_CACHE_TIMEOUT = 60
+EDGE_FRAGMENTS = 'js'
+EDGE_FRAGMENTS_MAX = 10
+
+# Замеры запросов: заголовок Server-Timing и лог yatube.slow_requests
+# для запросов дольше INSTRUMENTATION_SLOW_REQUEST_MS или с одним SQL,
+# повторённым INSTRUMENTATION_DUPLICATE_QUERIES раз (доля записей —
+# INSTRUMENTATION_SAMPLE_RATE). Выключенные замеры ничего не стоят.
+INSTRUMENTATION_ENABLED = os.getenv('YATUBE_INSTRUMENTATION') == '1'
+INSTRUMENTATION_SERVER_TIMING = True
+INSTRUMENTATION_SLOW_REQUEST_MS = 500
+INSTRUMENTATION_DUPLICATE_QUERIES = 5
+INSTRUMENTATION_SAMPLE_RATE = 1.0
+
+# Метрики для Prometheus по адресу /metrics/. Процессы сервера пишут их
+# в свои файлы в METRICS_DIR (без каталога — только память процесса);
+# METRICS_ALLOWED_IPS ограничивает, кто может читать метрики.
+METRICS_ENABLED = os.getenv('YATUBE_METRICS') == '1'
+METRICS_DIR = os.getenv('YATUBE_METRICS_DIR', '')
+METRICS_ALLOWED_IPS = []
+METRICS_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+METRICS_QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+# Отложенная запись комментариев и подписок: записи попадают в журнал
+# в WRITE_BEHIND_DIR и применяются пачками раз в WRITE_BEHIND_INTERVAL
+# секунд (0 — без фонового потока, только вызовом flush()). Свои
+# отложенные записи пользователь видит WRITE_BEHIND_PENDING_SECONDS секунд.
+# Сегмент, не применённый за WRITE_BEHIND_ATTEMPTS попыток, переименовывается
+# в <имя>.failed.
+WRITE_BEHIND = os.getenv('YATUBE_WRITE_BEHIND') == '1'
+WRITE_BEHIND_DIR = os.getenv(
+    'YATUBE_WRITE_BEHIND_DIR', os.path.join(BASE_DIR, 'journal')
+)
+WRITE_BEHIND_INTERVAL = 0.5
+WRITE_BEHIND_BATCH = 500
+WRITE_BEHIND_FSYNC = True
+WRITE_BEHIND_PENDING_SECONDS = 60
+WRITE_BEHIND_ATTEMPTS = 5
+
+# Полнотекстовый поиск: 'sqlite' — FTS5, 'postgresql' — tsvector,
+# 'memory' — индекс в памяти процесса, 'auto' — по используемой БД.
+# Индекс в памяти применяет журнал изменений из общего кеша (записи
+# хранятся SEARCH_LOG_TIMEOUT секунд) и целиком перечитывается из базы
+# раз в SEARCH_MEMORY_REBUILD секунд.
+SEARCH_BACKEND = 'auto'
+SEARCH_MAX_RESULTS = 1000
+SEARCH_LOG_TIMEOUT = 60 * 60
+SEARCH_MEMORY_REBUILD = 10 * 60
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
+# Карточки постов кешируются по версии поста, поэтому срок хранения
+# ограничивает только объём кеша, а не свежесть данных.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Кеш, общий для всех процессов сервера: 'file' — каталог на диске,
+# 'redis' — Redis или совместимый сервер (пакет django-redis),
+# 'locmem' — память процесса (только для разработки и тестов).
+CACHE_BACKEND = os.getenv(
+    'YATUBE_CACHE_BACKEND', 'locmem' if DEBUG else 'file'
+)
+CACHE_LOCATION = os.getenv('YATUBE_CACHE_LOCATION', '')
+
+CACHE_BACKENDS = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_LOCATION or os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'redis': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': CACHE_LOCATION or 'redis://127.0.0.1:6379/1',
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE_BACKEND],
 }
+
+# Защита от одновременного пересчёта: устаревшее значение хранится ещё
+# CACHE_STALE_GRACE секунд и отдаётся, пока один процесс его пересчитывает.
+CACHE_STALE_GRACE = 60
+CACHE_LOCK_TIMEOUT = 10
+CACHE_LOCK_WAIT = 0.5
+
+# Первая страница главной ленты кешируется целиком и помечается
+# устаревшей при изменении постов и комментариев.
+FEED_CACHE_TIMEOUT = 20
@@ -3,6 +3,8 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import metrics_export
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -10,6 +12,9 @@ urlpatterns = [
     path('auth/', include('django.contrib.auth.urls')),
     path('', include('posts.urls', namespace='posts')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/', include('api.urls', namespace='api')),
+    path('fragments/', include('core.urls', namespace='core')),
+    path('metrics/', metrics_export, name='metrics'),
 ]
 
 handler404 = 'core.views.page_not_found'